@@ -0,0 +1,11 @@
+import pytest
+
+from apps.expenses.utils.util_categories import categories
+
+
+@pytest.fixture(autouse=True)
+def reset_category_registry():
+    """El registro de categorías vive en memoria: cada test empieza sin copia (se deshacen sus transacciones)"""
+    categories.invalidate()
+    yield
+    categories.invalidate()
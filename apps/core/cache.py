@@ -0,0 +1,64 @@
+"""
+Backends de caché propios del proyecto
+
+BoundedFileBasedCache es un FileBasedCache de Django con expulsión LRU:
+el FileBasedCache original borra entradas al azar cuando se alcanza
+MAX_ENTRIES, aquí se borran las menos usadas recientemente. El orden de uso
+se guarda en el mtime de cada fichero, así que funciona igual con varios
+workers de gunicorn compartiendo el mismo directorio.
+
+Configuración:
+    CACHES = {
+        'dashboard': {
+            'BACKEND': 'apps.core.cache.BoundedFileBasedCache',
+            'LOCATION': '/app/cache/dashboard',
+            'OPTIONS': {'MAX_ENTRIES': 2000, 'CULL_FREQUENCY': 4},
+        }
+    }
+"""
+
+import os
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+_MISSING = object()
+
+
+class BoundedFileBasedCache(FileBasedCache):
+    """FileBasedCache con tamaño máximo (MAX_ENTRIES) y expulsión LRU"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+
+        # Marcar la entrada como usada recientemente
+        try:
+            os.utime(self._key_to_file(key, version))
+        except OSError:
+            pass
+        return value
+
+    def _cull(self):
+        """
+        Borra las entradas menos usadas cuando se alcanza MAX_ENTRIES
+
+        Se elimina num_entries / CULL_FREQUENCY entradas, empezando por las
+        de mtime más antiguo. CULL_FREQUENCY = 0 vacía toda la caché.
+        """
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        def last_used(fname):
+            try:
+                return os.stat(fname).st_mtime
+            except FileNotFoundError:
+                return 0
+
+        filelist.sort(key=last_used)
+        for fname in filelist[:int(num_entries / self._cull_frequency)]:
+            self._delete(fname)
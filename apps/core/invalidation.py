@@ -0,0 +1,282 @@
+"""
+Bus de invalidación entre procesos con LISTEN/NOTIFY de PostgreSQL
+
+Las cachés en memoria de cada proceso (registro de categorías, versiones
+de datos por usuario, ...) se quedan desfasadas cuando otro worker de
+gunicorn u otro contenedor escribe. En lugar de añadir Redis, los cambios
+se publican en un canal de PostgreSQL:
+
+- publish(topic, key) invalida al momento las cachés del propio proceso y
+  ejecuta pg_notify en la transacción actual: PostgreSQL solo entrega la
+  notificación al confirmarse, y nunca si se deshace.
+- Un hilo por worker (start_listener, lanzado desde config/gunicorn.conf.py)
+  mantiene su propia conexión con LISTEN y llama a los manejadores
+  registrados con subscribe(topic, handler).
+
+Si el listener no está conectado (SQLite, runserver, caída de la base de
+datos) is_listening() devuelve False y las cachés vuelven a revalidarse
+por TTL. Al reconectar se invalida todo: las notificaciones enviadas
+mientras tanto se han perdido.
+
+Configuración:
+    INVALIDATION_BUS = True        # publicar y escuchar (solo con PostgreSQL)
+    INVALIDATION_BUS_MAX_AGE = 60  # segundos máximos sin revalidar con el bus activo
+"""
+
+import json
+import logging
+import select
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'hormigah_invalidation'
+
+# Segundos entre comprobaciones de la conexión del listener y máximo entre reintentos
+LISTEN_TIMEOUT = 30
+RECONNECT_MAX_DELAY = 60
+
+_handlers = defaultdict(list)
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def bus_enabled():
+    """Indica si el bus está activado y la base de datos es PostgreSQL"""
+    return getattr(settings, 'INVALIDATION_BUS', True) and connection.vendor == 'postgresql'
+
+
+def _bus_max_age():
+    return getattr(settings, 'INVALIDATION_BUS_MAX_AGE', 60)
+
+
+def max_age(ttl):
+    """
+    Segundos que una caché local puede servir sin revalidar
+
+    Args:
+        ttl: TTL de la caché cuando no hay bus
+
+    Returns:
+        float: INVALIDATION_BUS_MAX_AGE con el listener conectado, si no ttl
+    """
+    if is_listening():
+        return max(ttl, _bus_max_age())
+    return ttl
+
+
+def subscribe(topic, handler):
+    """
+    Registra un manejador para un tema
+
+    El manejador recibe la clave publicada (o None para invalidarlo todo).
+    Se llama desde el hilo del listener, así que debe ser rápido y seguro
+    entre hilos.
+
+    Args:
+        topic: Nombre del tema (p. ej. 'categories')
+        handler: Función handler(key)
+    """
+    _handlers[topic].append(handler)
+
+
+def _dispatch(topic, key):
+    """Llama a los manejadores de un tema sin dejar que un error corte el resto"""
+    for handler in _handlers.get(topic, ()):
+        try:
+            handler(key)
+        except Exception:
+            logger.exception('Error invalidando %s:%s', topic, key)
+
+
+def _dispatch_all():
+    """Invalida todas las cachés registradas (tras perder notificaciones)"""
+    for topic in list(_handlers):
+        _dispatch(topic, None)
+
+
+def publish(topic, key=None):
+    """
+    Publica una invalidación para este proceso y, al confirmar la transacción, para el resto
+
+    Args:
+        topic: Nombre del tema
+        key: Clave afectada (p. ej. user_id) o None para todo el tema
+    """
+    _dispatch(topic, key)
+
+    if not bus_enabled():
+        return
+    payload = json.dumps({'topic': topic, 'key': key})
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+
+def handle_payload(payload):
+    """
+    Aplica una notificación recibida del canal
+
+    Args:
+        payload: Texto JSON con topic y key
+    """
+    try:
+        message = json.loads(payload)
+        topic, key = message['topic'], message.get('key')
+    except (ValueError, KeyError, TypeError):
+        logger.warning('Notificación de invalidación no válida: %r', payload)
+        return
+    _dispatch(topic, key)
+
+
+class InvalidationListener(threading.Thread):
+    """
+    Hilo que escucha el canal con una conexión propia (fuera del pool de Django)
+
+    Reconecta con espera exponencial si la conexión se pierde.
+    """
+
+    def __init__(self, alias='default'):
+        super().__init__(name='invalidation-listener', daemon=True)
+        self.alias = alias
+        self.connected = threading.Event()
+        self.stopping = threading.Event()
+
+    def _connect(self):
+        wrapper = connections[self.alias]
+        params = wrapper.get_connection_params()
+        conn = wrapper.Database.connect(**params)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        return conn
+
+    def _wait(self, conn, timeout):
+        """Espera notificaciones hasta timeout segundos y las aplica"""
+        if hasattr(conn, 'notifies') and callable(conn.notifies):
+            # psycopg 3
+            for notify in conn.notifies(timeout=timeout):
+                handle_payload(notify.payload)
+                if self.stopping.is_set():
+                    break
+        else:
+            # psycopg2
+            if select.select([conn], [], [], timeout)[0]:
+                conn.poll()
+                while conn.notifies:
+                    handle_payload(conn.notifies.pop(0).payload)
+
+    def run(self):
+        delay = 1
+        while not self.stopping.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                self.connected.set()
+                # Lo publicado mientras no se escuchaba se ha perdido
+                _dispatch_all()
+                delay = 1
+                while not self.stopping.is_set():
+                    self._wait(conn, LISTEN_TIMEOUT)
+                    # Comprobar que la conexión sigue viva aunque no lleguen mensajes
+                    with conn.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+            except Exception as e:
+                if not self.stopping.is_set():
+                    logger.warning('Listener de invalidación desconectado: %s', e)
+            finally:
+                self.connected.clear()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self.stopping.wait(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def stop(self):
+        self.stopping.set()
+
+
+def start_listener():
+    """
+    Arranca el listener de este proceso (una sola vez)
+
+    No hace nada si el bus está desactivado o la base de datos no es PostgreSQL.
+
+    Returns:
+        InvalidationListener o None
+    """
+    global _listener
+    if not bus_enabled():
+        return None
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = InvalidationListener()
+            _listener.start()
+    return _listener
+
+
+def is_listening():
+    """Indica si este proceso está recibiendo las invalidaciones del resto"""
+    return _listener is not None and _listener.connected.is_set()
+
+
+class LocalCache:
+    """
+    Caché en memoria del proceso invalidada por el bus
+
+    Solo sirve valores mientras el listener está conectado y como mucho
+    durante INVALIDATION_BUS_MAX_AGE segundos; sin bus, get() devuelve
+    siempre None y cada lectura va a la base de datos.
+
+    set() recibe la generación leída antes de consultar la base de datos:
+    si entre medias llegó una invalidación, el valor ya puede estar
+    desfasado y no se guarda. Tampoco se guardan valores leídos dentro de
+    una transacción, que podría deshacerse.
+    """
+
+    def __init__(self, topic, max_entries=10000):
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        subscribe(topic, self.evict)
+
+    def get(self, key):
+        if not is_listening():
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > _bus_max_age():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation):
+        if not is_listening() or connection.in_atomic_block:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, key=None):
+        """Elimina una clave (o todas con key=None)"""
+        with self._lock:
+            self.generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
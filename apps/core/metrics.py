@@ -0,0 +1,177 @@
+"""
+Métricas de la aplicación en formato Prometheus
+
+Define las métricas de peticiones, consultas SQL, webhooks y cachés, y las
+funciones para registrarlas desde el resto del código. Se exponen en
+/metrics (ver apps.core.views.metrics).
+
+Con varios workers de gunicorn cada proceso tiene sus propios contadores:
+si está definida la variable de entorno PROMETHEUS_MULTIPROC_DIR,
+prometheus_client los guarda en ficheros mmap de ese directorio y /metrics
+los suma. El directorio debe vaciarse antes de arrancar gunicorn (ver
+docker-compose.prod.yml y config/gunicorn.conf.py).
+
+Si prometheus_client no está instalado, las funciones de registro no
+hacen nada y /metrics responde 503.
+"""
+
+import os
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram, multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+# Buckets en segundos para latencias de peticiones HTTP
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Buckets en bytes para el tamaño de las respuestas (1 KB a 50 MB)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 512 * 1024, 1024 ** 2, 5 * 1024 ** 2, 20 * 1024 ** 2, 50 * 1024 ** 2)
+
+if prometheus_client is not None:
+    HTTP_REQUESTS = Counter(
+        'hormigah_http_requests_total',
+        'Peticiones HTTP por vista, método y código de estado',
+        ['view', 'method', 'status']
+    )
+    HTTP_LATENCY = Histogram(
+        'hormigah_http_request_duration_seconds',
+        'Duración de las peticiones HTTP por vista',
+        ['view', 'method'],
+        buckets=LATENCY_BUCKETS
+    )
+    HTTP_RESPONSE_SIZE = Histogram(
+        'hormigah_http_response_size_bytes',
+        'Tamaño de las respuestas no streaming por vista',
+        ['view'],
+        buckets=SIZE_BUCKETS
+    )
+    DB_QUERIES = Histogram(
+        'hormigah_db_queries_per_request',
+        'Consultas SQL por petición',
+        ['view'],
+        buckets=(1, 2, 5, 10, 20, 50, 100, 250)
+    )
+    DB_DURATION = Histogram(
+        'hormigah_db_duration_seconds',
+        'Tiempo total en base de datos por petición',
+        ['view'],
+        buckets=LATENCY_BUCKETS
+    )
+    WEBHOOK_DELIVERIES = Counter(
+        'hormigah_webhook_deliveries_total',
+        'Intentos de envío de webhooks a n8n por resultado (sent, retry, dead)',
+        ['webhook', 'outcome']
+    )
+    WEBHOOK_LATENCY = Histogram(
+        'hormigah_webhook_delivery_duration_seconds',
+        'Duración de cada intento de envío de webhook',
+        ['webhook'],
+        buckets=LATENCY_BUCKETS
+    )
+    CACHE_REQUESTS = Counter(
+        'hormigah_cache_requests_total',
+        'Lecturas de caché por resultado (hit o miss)',
+        ['cache', 'result']
+    )
+
+
+def metrics_available():
+    """Indica si prometheus_client está instalado"""
+    return prometheus_client is not None
+
+
+def observe_request(view, method, status, duration, queries, db_duration, response_bytes=None):
+    """
+    Registra una petición HTTP ya respondida
+
+    Args:
+        view: Nombre de la vista (view_name de la URL)
+        method: Método HTTP
+        status: Código de estado de la respuesta
+        duration: Segundos totales de la petición
+        queries: Consultas SQL ejecutadas
+        db_duration: Segundos en base de datos
+        response_bytes: Tamaño de la respuesta (None si es streaming)
+    """
+    if prometheus_client is None:
+        return
+    HTTP_REQUESTS.labels(view, method, str(status)).inc()
+    HTTP_LATENCY.labels(view, method).observe(duration)
+    DB_QUERIES.labels(view).observe(queries)
+    DB_DURATION.labels(view).observe(db_duration)
+    if response_bytes is not None:
+        HTTP_RESPONSE_SIZE.labels(view).observe(response_bytes)
+
+
+def record_webhook(webhook, outcome, duration):
+    """
+    Registra un intento de envío de webhook
+
+    Args:
+        webhook: Nombre del webhook (p. ej. 'budget-alert')
+        outcome: 'sent', 'retry' o 'dead'
+        duration: Segundos que tardó el intento
+    """
+    if prometheus_client is None:
+        return
+    WEBHOOK_DELIVERIES.labels(webhook, outcome).inc()
+    WEBHOOK_LATENCY.labels(webhook).observe(duration)
+
+
+def record_cache(cache, hit):
+    """Registra una lectura de caché (hit=True si se encontró la entrada)"""
+    if prometheus_client is None:
+        return
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+class WebhookOutboxCollector:
+    """
+    Webhooks de la cola por estado, leídos de la base de datos al hacer scrape
+
+    Es un valor actual (no un contador), así que no depende de qué proceso
+    haya encolado o enviado cada webhook.
+    """
+
+    def collect(self):
+        # Importar aquí: apps.core no debe depender de expenses al cargarse
+        from django.db.models import Count
+        from apps.expenses.models import WebhookOutbox
+
+        gauge = GaugeMetricFamily(
+            'hormigah_webhook_outbox',
+            'Webhooks en la cola por estado',
+            labels=['status']
+        )
+        counts = dict(
+            WebhookOutbox.objects.values('status').annotate(total=Count('id')).values_list('status', 'total')
+        )
+        for status, _ in WebhookOutbox.STATUS_CHOICES:
+            gauge.add_metric([status], counts.get(status, 0))
+        yield gauge
+
+
+class _DefaultCollectors:
+    """Métricas del registro global del proceso (modo de un solo proceso)"""
+
+    def collect(self):
+        return prometheus_client.REGISTRY.collect()
+
+
+def generate_latest():
+    """
+    Métricas de todos los procesos en el formato de texto de Prometheus
+
+    Returns:
+        tuple: (contenido en bytes, content type)
+    """
+    registry = prometheus_client.CollectorRegistry()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(_DefaultCollectors())
+    registry.register(WebhookOutboxCollector())
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
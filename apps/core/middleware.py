@@ -0,0 +1,221 @@
+"""
+Middleware de métricas por petición
+
+RequestMetricsMiddleware mide, para una muestra de las peticiones:
+- Vista resuelta (view_name de la URL)
+- Tiempo total, tiempo en base de datos y tiempo de renderizado de plantillas
+- Número de consultas SQL y consultas duplicadas (mismo SQL y parámetros)
+- Tamaño de la respuesta
+
+Las métricas se escriben como una línea JSON en el logger
+'apps.core.request_metrics' y, si se activa, se devuelven en la cabecera
+Server-Timing (visible en la pestaña de red del navegador). La cabecera
+llega a cualquier cliente, así que solo se activa en desarrollo.
+
+Configuración:
+    REQUEST_METRICS_SAMPLE_RATE = 0.1      # fracción de peticiones medidas (0 = desactivado)
+    REQUEST_METRICS_SERVER_TIMING = False  # añadir la cabecera Server-Timing (solo desarrollo)
+
+PrometheusMetricsMiddleware registra en cambio todas las peticiones
+(sin muestreo) en los contadores e histogramas de apps.core.metrics.
+
+Las respuestas en streaming se miden hasta que la vista devuelve la
+respuesta: las consultas hechas al recorrer el stream no se cuentan.
+"""
+
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+from .metrics import metrics_available, observe_request
+
+logger = logging.getLogger('apps.core.request_metrics')
+
+# Métricas de la petición en curso (None si no se está midiendo)
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Acumulador de las consultas y el renderizado de una petición
+
+    Args:
+        track_duplicates: Detectar consultas duplicadas (guarda cada SQL con
+                          sus parámetros, así que solo se usa en peticiones muestreadas)
+    """
+
+    def __init__(self, track_duplicates=True):
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.queries = 0
+        self.track_duplicates = track_duplicates
+        self.seen = set()
+        self.duplicates = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Wrapper para connection.execute_wrapper: cronometra cada consulta"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            if self.track_duplicates:
+                key = (sql, repr(params))
+                if key in self.seen:
+                    self.duplicates += 1
+                else:
+                    self.seen.add(key)
+
+
+def _timed_render(render):
+    """Envuelve Template.render para sumar su duración a la petición medida"""
+
+    def wrapper(self, *args, **kwargs):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.render_time += time.perf_counter() - start
+
+    wrapper._request_metrics = True
+    return wrapper
+
+
+def instrument_templates():
+    """
+    Cronometra el renderizado de plantillas de Django
+
+    Se envuelve el Template del backend (el que usan render() y
+    render_to_string), no el de django.template.base, para no contar
+    dos veces los {% include %}.
+    """
+    if not getattr(DjangoTemplate.render, '_request_metrics', False):
+        DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+
+def view_label(request):
+    """Nombre de la vista para etiquetar métricas ('unmatched' si no hubo ruta, p. ej. 404)"""
+    resolver_match = getattr(request, 'resolver_match', None)
+    return resolver_match.view_name if resolver_match else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    """
+    Mide consultas, tiempos y tamaño de una muestra de las peticiones
+
+    Debe ir el primero de MIDDLEWARE para que el tiempo total incluya al
+    resto de middlewares.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 0.0)
+        self.server_timing = getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', False)
+        if self.sample_rate > 0:
+            instrument_templates()
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        total = time.perf_counter() - start
+
+        record = self.build_record(request, response, metrics, total)
+        logger.info(json.dumps(record))
+
+        if self.server_timing:
+            response['Server-Timing'] = self.server_timing_header(record)
+        return response
+
+    @staticmethod
+    def build_record(request, response, metrics, total):
+        """
+        Métricas de la petición en un dict serializable a JSON
+
+        Returns:
+            dict: Línea de log estructurada (tiempos en milisegundos)
+        """
+        if response.streaming:
+            response_bytes = None
+        else:
+            response_bytes = len(response.content)
+
+        return {
+            'event': 'request_metrics',
+            'method': request.method,
+            'path': request.path,
+            'view': view_label(request),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'render_ms': round(metrics.render_time * 1000, 2),
+            'queries': metrics.queries,
+            'duplicate_queries': metrics.duplicates,
+            'response_bytes': response_bytes,
+            'streaming': response.streaming,
+        }
+
+    @staticmethod
+    def server_timing_header(record):
+        """Cabecera Server-Timing con base de datos, plantillas y total"""
+        return ', '.join([
+            f'db;dur={record["db_ms"]};desc="{record["queries"]} queries"',
+            f'render;dur={record["render_ms"]}',
+            f'total;dur={record["total_ms"]}',
+        ])
+
+
+class PrometheusMetricsMiddleware:
+    """
+    Registra cada petición en las métricas Prometheus (apps.core.metrics)
+
+    Cuenta consultas y tiempo en base de datos sin guardar el SQL, para que
+    el coste por petición sea mínimo. Se desactiva si prometheus_client no
+    está instalado o si METRICS_ENABLED es False.
+    """
+
+    def __init__(self, get_response):
+        if not metrics_available() or not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics(track_duplicates=False)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+
+        observe_request(
+            view_label(request),
+            request.method,
+            response.status_code,
+            time.perf_counter() - start,
+            metrics.queries,
+            metrics.db_time,
+            None if response.streaming else len(response.content)
+        )
+        return response
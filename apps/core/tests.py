@@ -1,3 +1,241 @@
-from django.test import TestCase
+"""
+Tests para las utilidades compartidas de core
 
-# Create your tests here.
+Cubre el backend de caché en disco con expulsión LRU, el middleware
+de métricas por petición, el endpoint /metrics de Prometheus, la
+configuración de conexiones a PostgreSQL y el bus de invalidación
+"""
+import json
+import logging
+import os
+import time
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from apps.core import invalidation
+from apps.core.cache import BoundedFileBasedCache
+from apps.core.middleware import RequestMetrics
+from apps.expenses.utils.util_webhooks import enqueue_webhook
+from config.settings.database import postgres_database
+
+
+class TestBoundedFileBasedCache:
+    """Tests para BoundedFileBasedCache"""
+    
+    def _make_cache(self, tmp_path, max_entries=4, cull_frequency=2):
+        return BoundedFileBasedCache(str(tmp_path), {
+            'OPTIONS': {'MAX_ENTRIES': max_entries, 'CULL_FREQUENCY': cull_frequency}
+        })
+    
+    def _age(self, cache, key, seconds):
+        """Retrasa el último uso de una entrada para no depender de la resolución del reloj"""
+        fname = cache._key_to_file(key)
+        past = time.time() - seconds
+        os.utime(fname, (past, past))
+    
+    def test_get_and_set(self, tmp_path):
+        """Test básico de lectura y escritura"""
+        cache = self._make_cache(tmp_path)
+        cache.set('a', {'total': 1})
+        
+        assert cache.get('a') == {'total': 1}
+        assert cache.get('missing', 'default') == 'default'
+    
+    def test_cull_evicts_least_recently_used(self, tmp_path):
+        """Test que al llenarse se expulsan las entradas menos usadas"""
+        cache = self._make_cache(tmp_path)
+        for age, key in enumerate(['d', 'c', 'b', 'a'], start=1):
+            cache.set(key, key)
+            self._age(cache, key, age * 10)
+        
+        # 'a' es la más antigua, pero al leerla pasa a ser la más reciente
+        assert cache.get('a') == 'a'
+        
+        # Llena la caché: se expulsan 4 / 2 = 2 entradas, las menos usadas ('b' y 'c')
+        cache.set('e', 'e')
+        
+        assert cache.get('a') == 'a'
+        assert cache.get('d') == 'd'
+        assert cache.get('e') == 'e'
+        assert cache.get('b') is None
+        assert cache.get('c') is None
+
+
+@pytest.mark.django_db
+class TestRequestMetricsMiddleware:
+    """Tests para RequestMetricsMiddleware"""
+    
+    def _login(self):
+        User.objects.create_user(username="testuser", password="testpass123")
+        client = Client()
+        client.login(username="testuser", password="testpass123")
+        return client
+    
+    def test_sampled_request_logs_json_and_server_timing(self, settings, caplog):
+        """Test que una petición medida escribe una línea JSON y la cabecera Server-Timing"""
+        settings.REQUEST_METRICS_SAMPLE_RATE = 1.0
+        settings.REQUEST_METRICS_SERVER_TIMING = True
+        client = self._login()
+        
+        with caplog.at_level(logging.INFO, logger='apps.core.request_metrics'):
+            response = client.get(reverse('expenses:dashboard'))
+        
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['view'] == 'expenses:dashboard'
+        assert record['status'] == 200
+        assert record['queries'] > 0
+        assert record['render_ms'] > 0
+        assert record['response_bytes'] == len(response.content)
+        assert f'desc="{record["queries"]} queries"' in response['Server-Timing']
+    
+    def test_server_timing_off_by_default(self, settings, caplog):
+        """Test que sin activarla no se envía Server-Timing, aunque la petición se mida"""
+        settings.REQUEST_METRICS_SAMPLE_RATE = 1.0
+        client = self._login()
+        
+        with caplog.at_level(logging.INFO, logger='apps.core.request_metrics'):
+            response = client.get(reverse('expenses:dashboard'))
+        
+        assert caplog.records
+        assert 'Server-Timing' not in response
+    
+    def test_not_sampled_request_is_untouched(self, settings, caplog):
+        """Test que con muestreo 0 no se mide ni se añade la cabecera"""
+        settings.REQUEST_METRICS_SAMPLE_RATE = 0
+        client = self._login()
+        
+        with caplog.at_level(logging.INFO, logger='apps.core.request_metrics'):
+            response = client.get(reverse('expenses:dashboard'))
+        
+        assert 'Server-Timing' not in response
+        assert not caplog.records
+    
+    def test_duplicate_queries_are_counted(self):
+        """Test que el mismo SQL con los mismos parámetros cuenta como duplicado"""
+        metrics = RequestMetrics()
+        execute = lambda sql, params, many, context: None
+        
+        for params in [(1,), (2,), (1,)]:
+            metrics(execute, 'SELECT * FROM t WHERE id = %s', params, False, {})
+        
+        assert metrics.queries == 3
+        assert metrics.duplicates == 1
+
+
+@pytest.mark.django_db
+class TestPrometheusMetrics:
+    """Tests para el endpoint /metrics"""
+    
+    def test_metrics_include_requests_and_outbox(self):
+        """Test que /metrics expone las peticiones por vista y la cola de webhooks"""
+        enqueue_webhook('budget-alert', {})
+        client = Client()
+        client.get(reverse('login'))
+        
+        response = client.get(reverse('metrics'))
+        
+        assert response.status_code == 200
+        body = response.content.decode()
+        assert 'hormigah_http_requests_total{method="GET",status="200",view="login"}' in body
+        assert 'hormigah_db_queries_per_request_bucket' in body
+        assert 'hormigah_webhook_outbox{status="pending"} 1.0' in body
+    
+    def test_metrics_token(self, settings):
+        """Test que con METRICS_TOKEN se exige la cabecera Bearer"""
+        settings.METRICS_TOKEN = 'secreto'
+        client = Client()
+        
+        assert client.get(reverse('metrics')).status_code == 401
+        response = client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secreto')
+        assert response.status_code == 200
+
+
+class TestDatabaseSettings:
+    """Tests para la configuración de conexiones (config/settings/database.py)"""
+    
+    def test_without_pool_uses_persistent_connections(self, monkeypatch):
+        """Test que sin pool se reutilizan las conexiones con health checks"""
+        monkeypatch.setenv('DB_POOL', 'False')
+        monkeypatch.setenv('DB_CONN_MAX_AGE', '120')
+        
+        database = postgres_database('db', 'user', 'pass', 'localhost', '5432')
+        
+        assert database['CONN_MAX_AGE'] == 120
+        assert database['CONN_HEALTH_CHECKS'] is True
+        assert 'pool' not in database.get('OPTIONS', {})
+    
+    @pytest.mark.django_db(transaction=True)
+    def test_benchmark_command_runs(self, capsys):
+        """Test que el benchmark de conexiones mide los modos disponibles"""
+        call_command('benchmark_db_connections', threads=2, requests=5, modes=['connect', 'persistent'])
+        
+        output = capsys.readouterr().out
+        assert '== connect' in output
+        assert '== persistent' in output
+        assert '10 peticiones' in output
+
+
+class TestInvalidationBus:
+    """Tests para el bus de invalidación (sin PostgreSQL: solo la parte local)"""
+    
+    @pytest.fixture
+    def listening(self, monkeypatch):
+        """Simula un listener conectado"""
+        monkeypatch.setattr(invalidation, 'is_listening', lambda: True)
+    
+    def test_publish_dispatches_locally(self, monkeypatch):
+        """Test que publicar invalida al momento en el propio proceso"""
+        received = []
+        monkeypatch.setattr(invalidation, '_handlers', {'test': [received.append]})
+        
+        invalidation.publish('test', 7)
+        invalidation.handle_payload(json.dumps({'topic': 'test', 'key': 8}))
+        invalidation.handle_payload('no es json')
+        
+        assert received == [7, 8]
+    
+    def test_listener_not_started_without_postgres(self):
+        """Test que con SQLite no se arranca el hilo y las cachés usan su TTL"""
+        assert invalidation.start_listener() is None
+        assert invalidation.is_listening() is False
+        assert invalidation.max_age(5) == 5
+    
+    def test_local_cache_only_serves_while_listening(self):
+        """Test que sin bus la caché local no guarda nada"""
+        cache = invalidation.LocalCache('test-off')
+        cache.set('a', 1, cache.generation)
+        assert cache.get('a') is None
+    
+    def test_local_cache_evict_and_generation(self, listening):
+        """Test que una invalidación descarta la clave y los valores leídos antes de ella"""
+        cache = invalidation.LocalCache('test-on', max_entries=2)
+        cache.set('a', 1, cache.generation)
+        assert cache.get('a') == 1
+        
+        # Valor leído de la base de datos antes de una invalidación: no se guarda
+        generation = cache.generation
+        invalidation.handle_payload(json.dumps({'topic': 'test-on', 'key': 'a'}))
+        cache.set('a', 1, generation)
+        assert cache.get('a') is None
+        
+        # Tamaño acotado: se expulsa la menos usada
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key, cache.generation)
+        assert cache.get('a') is None
+        assert cache.get('c') == 'c'
+    
+    @pytest.mark.django_db(transaction=True)
+    def test_data_version_bump_evicts_user_stamp(self, listening, django_assert_num_queries):
+        """Test que subir la versión de datos descarta la versión recordada del usuario"""
+        from apps.expenses.utils.util_cache import bump_data_version, get_data_stamp
+        user = User.objects.create_user(username="bus")
+        get_data_stamp(user)
+        version, _ = get_data_stamp(user)
+        
+        with django_assert_num_queries(0):
+            assert get_data_stamp(user)[0] == version
+        
+        bump_data_version(user.pk)
+        assert get_data_stamp(user)[0] == version + 1
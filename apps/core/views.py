@@ -1,3 +1,35 @@
-from django.shortcuts import render
+"""
+Vistas compartidas del proyecto
 
-# Create your views here.
+- metrics: métricas en formato Prometheus para el scrape
+"""
+
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from .metrics import generate_latest, metrics_available
+
+
+@require_GET
+def metrics(request):
+    """
+    Expone las métricas de la aplicación en el formato de texto de Prometheus
+
+    Si METRICS_TOKEN está definido, exige la cabecera
+    'Authorization: Bearer <METRICS_TOKEN>'. Nginx no publica /metrics:
+    Prometheus la consulta dentro de la red de docker (web:8000).
+    """
+    if not metrics_available():
+        return HttpResponse('prometheus_client no está instalado', status=503, content_type='text/plain')
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        expected = f'Bearer {token}'
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return HttpResponse('No autorizado', status=401, content_type='text/plain')
+
+    content, content_type = generate_latest()
+    return HttpResponse(content, content_type=content_type)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Category, Expense, Budget
+from django.utils import timezone
+from .models import Category, Expense, Budget, BudgetAlertState, MonthlyUserSpend, ReportSnapshot, WebhookOutbox
 
 
 @admin.register(Category)
@@ -36,3 +37,74 @@ class BudgetAdmin(admin.ModelAdmin):
     fields = ['user', 'monthly_limit', 'warning_percentage', 'critical_percentage', 'email_alerts_enabled']
     readonly_fields = ['created_at', 'updated_at']
     autocomplete_fields = ['user']  # Para búsqueda rápida de usuarios
+
+
+@admin.register(MonthlyUserSpend)
+class MonthlyUserSpendAdmin(admin.ModelAdmin):
+    """Admin de solo lectura para los agregados mensuales"""
+    list_display = ['user', 'month', 'total', 'count', 'updated_at']
+    list_filter = ['month']
+    search_fields = ['user__username']
+    ordering = ['-month']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+
+@admin.register(WebhookOutbox)
+class WebhookOutboxAdmin(admin.ModelAdmin):
+    """Admin para revisar la cola de webhooks y reenviar los descartados"""
+    list_display = ['id', 'webhook', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'webhook']
+    ordering = ['-created_at']
+    readonly_fields = ['webhook', 'payload', 'attempts', 'last_error', 'created_at', 'sent_at']
+    actions = ['requeue']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description="Volver a poner en cola")
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status=WebhookOutbox.STATUS_SENT).update(
+            status=WebhookOutbox.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} webhooks vueltos a poner en cola")
+
+
+
+@admin.register(BudgetAlertState)
+class BudgetAlertStateAdmin(admin.ModelAdmin):
+    """Admin de solo lectura para el estado de las alertas de presupuesto"""
+    list_display = ['user', 'month', 'level', 'triggered', 'triggered_at', 'updated_at']
+    list_filter = ['level', 'triggered', 'month']
+    search_fields = ['user__username']
+    ordering = ['-month', 'user', 'level']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+
+@admin.register(ReportSnapshot)
+class ReportSnapshotAdmin(admin.ModelAdmin):
+    """Admin de solo lectura para los reportes mensuales precalculados"""
+    list_display = ['user', 'month', 'size', 'stale', 'built_at']
+    list_filter = ['stale', 'month']
+    search_fields = ['user__username']
+    ordering = ['-month', 'user']
+    exclude = ['payload']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
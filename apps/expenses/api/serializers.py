@@ -7,12 +7,92 @@ en formato JSON para que n8n pueda consumir los datos fácilmente.
 
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from django.db.models import Sum
+from django.utils.dateparse import parse_date, parse_datetime
 from apps.expenses.models import Expense, Budget, Category
-from datetime import datetime, timedelta
+from apps.expenses.utils.util_export import category_to_dict
+from apps.expenses.utils.util_reports import (
+    build_history_summaries,
+    format_history,
+    iter_expenses_by_user,
+    window_info
+)
+from datetime import datetime, time, timedelta
 from django.utils import timezone
 
 
+def _parse_or_none(parser, value):
+    """Aplica un parser de django.utils.dateparse devolviendo None si el valor no es válido"""
+    try:
+        return parser(value)
+    except ValueError:
+        return None
+
+
+def parse_history_window(query_params):
+    """
+    Interpreta los parámetros que acotan complete_history
+    
+    Parámetros admitidos:
+    - from / to: fechas ISO (YYYY-MM-DD), ambas incluidas
+    - months=N: los N meses naturales completos anteriores al mes actual
+      (months=1 es el mes pasado). No se puede combinar con from / to
+    - updated_since: fecha u hora ISO; solo se envían los gastos creados o
+      editados desde entonces
+    
+    Args:
+        query_params: QueryDict de la petición
+        
+    Returns:
+        dict: start, end (date o None) y updated_since (datetime o None)
+        
+    Raises:
+        ValidationError: si algún parámetro no es válido
+    """
+    errors = {}
+    window = {'start': None, 'end': None, 'updated_since': None}
+    
+    for param, key in (('from', 'start'), ('to', 'end')):
+        value = query_params.get(param)
+        if value:
+            window[key] = _parse_or_none(parse_date, value) if len(value) == 10 else None
+            if window[key] is None:
+                errors[param] = 'Fecha no válida, usa el formato YYYY-MM-DD'
+    
+    months = query_params.get('months')
+    if months:
+        if query_params.get('from') or query_params.get('to'):
+            errors['months'] = 'No se puede combinar con from / to'
+        elif not months.isdigit() or not 1 <= int(months) <= 120:
+            errors['months'] = 'Debe ser un número entre 1 y 120'
+        else:
+            current_month = timezone.localdate().replace(day=1)
+            window['end'] = current_month - timedelta(days=1)
+            start = current_month
+            for _ in range(int(months)):
+                start = (start - timedelta(days=1)).replace(day=1)
+            window['start'] = start
+    
+    updated_since = query_params.get('updated_since')
+    if updated_since:
+        parsed = _parse_or_none(parse_datetime, updated_since)
+        if parsed is None:
+            day = _parse_or_none(parse_date, updated_since) if len(updated_since) == 10 else None
+            parsed = datetime.combine(day, time.min) if day else None
+        if parsed is None:
+            errors['updated_since'] = 'Fecha no válida, usa el formato ISO 8601'
+        else:
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            window['updated_since'] = parsed
+    
+    if window['start'] and window['end'] and window['start'] > window['end']:
+        errors['from'] = 'Debe ser anterior o igual a to'
+    
+    if errors:
+        raise serializers.ValidationError(errors)
+    return window
+
+
 class CategorySerializer(serializers.ModelSerializer):
     """
     Serializer para las categorías de gastos
@@ -22,11 +102,26 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'icon', 'color', 'description']
 
 
+class RegistryCategoryField(serializers.Field):
+    """
+    Categoría anidada leída del registro en memoria (mismo formato que CategorySerializer)
+    
+    Usa category_id, así que serializar gastos no consulta la tabla de categorías.
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'category_id')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, value):
+        return category_to_dict(value)
+
+
 class ExpenseSerializer(serializers.ModelSerializer):
     """
     Serializer para los gastos individuales
     """
-    category = CategorySerializer(read_only=True)
+    category = RegistryCategoryField()
     
     class Meta:
         model = Expense
@@ -58,113 +153,86 @@ class UserActiveSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email']
 
 
-class UserCompleteSerializer(serializers.ModelSerializer):
+class BatchReportRequestSerializer(serializers.Serializer):
     """
-    Serializer completo para un usuario con todo su historial
-    Este es el serializer principal que contiene todos los datos
-    que la IA necesita para generar reportes mensuales
+    Valida el cuerpo de POST /api/users/complete/batch/
+    Se debe indicar una lista de IDs o all_active=true, pero no ambos
+    """
+    
+    MAX_USERS = 1000
+    
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=MAX_USERS
+    )
+    all_active = serializers.BooleanField(default=False)
+    
+    def validate(self, attrs):
+        """Comprueba que se ha elegido exactamente una forma de seleccionar usuarios"""
+        if bool(attrs.get('user_ids')) == attrs['all_active']:
+            raise serializers.ValidationError('Indica user_ids o all_active=true (solo uno de los dos)')
+        return attrs
+
+
+class UserReportSerializer(serializers.ModelSerializer):
+    """
+    Serializer con los datos de usuario y presupuesto de un reporte
+    Sin historial: el endpoint batch lo calcula aparte para todos los usuarios
     """
     
     # Campos relacionados
     budget = BudgetSerializer(read_only=True)
     
-    # Campos calculados (se definen en to_representation)
-    complete_history = serializers.SerializerMethodField()
-    
     class Meta:
         model = User
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name', 
-            'date_joined', 'budget', 'complete_history'
+            'date_joined', 'budget'
         ]
+
+
+class UserCompleteSerializer(UserReportSerializer):
+    """
+    Serializer completo para un usuario con todo su historial
+    Este es el serializer principal que contiene todos los datos
+    que la IA necesita para generar reportes mensuales
+    """
+    
+    # Campos calculados (se definen en to_representation)
+    complete_history = serializers.SerializerMethodField()
+    
+    class Meta(UserReportSerializer.Meta):
+        fields = UserReportSerializer.Meta.fields + ['complete_history']
     
     def get_complete_history(self, user):
         """
-        Calcula y retorna el historial completo de gastos del usuario
+        Calcula y retorna el historial de gastos del usuario
+        
+        Los totales de toda la vida (primer y último gasto, total y número de
+        gastos) se calculan siempre. Los gastos, resúmenes mensuales y por
+        categorías se limitan a la ventana recibida en el contexto
+        ('history_window', ver parse_history_window).
+        
+        Los resúmenes se agrupan en SQL y se suman como Decimal (ver
+        util_reports), igual que en el endpoint batch.
         
         Args:
             user: Instancia del modelo User
             
         Returns:
-            dict: Historial completo con gastos, resúmenes y estadísticas
+            dict: Historial con gastos, resúmenes y estadísticas
         """
         
-        # Obtener todos los gastos del usuario
-        expenses = Expense.objects.filter(user=user).select_related('category').order_by('-date')
-        
-        if not expenses.exists():
-            return {
-                'first_expense': None,
-                'last_expense': None,
-                'total_months_active': 0,
-                'total_expenses': 0,
-                'total_expense_count': 0,
-                'all_expenses': [],
-                'monthly_summaries': {},
-                'categories_summary': {}
-            }
-        
-        # Datos básicos
-        first_expense = expenses.last().date
-        last_expense = expenses.first().date
-        total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or 0
-        total_expense_count = expenses.count()
-        
-        # Calcular meses activos
-        months_diff = (last_expense.year - first_expense.year) * 12 + (last_expense.month - first_expense.month)
-        total_months_active = months_diff + 1
-        
-        # Serializar todos los gastos
-        all_expenses = ExpenseSerializer(expenses, many=True).data
-        
-        # Calcular resúmenes mensuales
-        monthly_summaries = {}
-        for expense in expenses:
-            month_key = f"{expense.date.year}-{expense.date.month:02d}"
-            
-            if month_key not in monthly_summaries:
-                monthly_summaries[month_key] = {
-                    'total': 0,
-                    'count': 0,
-                    'categories': {}
-                }
-            
-            monthly_summaries[month_key]['total'] += float(expense.amount)
-            monthly_summaries[month_key]['count'] += 1
-            
-            # Agrupar por categorías dentro del mes
-            cat_name = expense.category.name
-            if cat_name not in monthly_summaries[month_key]['categories']:
-                monthly_summaries[month_key]['categories'][cat_name] = 0
-            monthly_summaries[month_key]['categories'][cat_name] += float(expense.amount)
-        
-        # Calcular resumen por categorías (histórico total)
-        categories_summary = {}
-        for expense in expenses:
-            cat_name = expense.category.name
-            if cat_name not in categories_summary:
-                categories_summary[cat_name] = {
-                    'total': 0,
-                    'count': 0,
-                    'percentage': 0
-                }
-            
-            categories_summary[cat_name]['total'] += float(expense.amount)
-            categories_summary[cat_name]['count'] += 1
+        window = self.context.get('history_window') or {}
+        summary = build_history_summaries([user.id], window.get('start'), window.get('end')).get(user.id)
         
-        # Calcular porcentajes
-        for cat_name in categories_summary:
-            categories_summary[cat_name]['percentage'] = round(
-                (categories_summary[cat_name]['total'] / float(total_expenses)) * 100, 2
+        expenses = []
+        if summary is not None:
+            groups = iter_expenses_by_user(
+                [user.id], window.get('start'), window.get('end'), window.get('updated_since')
             )
+            expenses = next((group for _, group in groups), [])
         
-        return {
-            'first_expense': first_expense.isoformat(),
-            'last_expense': last_expense.isoformat(),
-            'total_months_active': total_months_active,
-            'total_expenses': float(total_expenses),
-            'total_expense_count': total_expense_count,
-            'all_expenses': all_expenses,
-            'monthly_summaries': monthly_summaries,
-            'categories_summary': categories_summary
-        } 
\ No newline at end of file
+        return format_history(summary, expenses, window_info(window))
@@ -6,7 +6,7 @@ obtener los datos de usuarios y generar reportes.
 """
 
 from django.urls import path
-from .views import ActiveUsersView, UserCompleteView
+from .views import ActiveUsersView, UserCompleteBatchView, UserCompleteView, UserExpensesExportView
 
 # Namespace para la API
 app_name = 'expenses_api'
@@ -20,6 +20,14 @@ urlpatterns = [
         name='active-users'
     ),
     
+    # Endpoint para obtener datos completos de muchos usuarios (NDJSON)
+    # POST /api/users/complete/batch/
+    path(
+        'users/complete/batch/',
+        UserCompleteBatchView.as_view(),
+        name='users-complete-batch'
+    ),
+    
     # Endpoint para obtener datos completos de un usuario
     # GET /api/users/{user_id}/complete/
     path(
@@ -27,4 +35,12 @@ urlpatterns = [
         UserCompleteView.as_view(),
         name='user-complete'
     ),
+    
+    # Endpoint para exportar los gastos de un usuario en streaming (NDJSON)
+    # GET /api/users/{user_id}/expenses/export/
+    path(
+        'users/<int:id>/expenses/export/',
+        UserExpensesExportView.as_view(),
+        name='user-expenses-export'
+    ),
 ] 
\ No newline at end of file
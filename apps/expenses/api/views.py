@@ -5,18 +5,69 @@ Este módulo contiene las vistas que manejan los endpoints de la API
 para que n8n pueda obtener los datos necesarios para los reportes.
 """
 
-from rest_framework import generics, status
+from rest_framework import generics, serializers, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
 from django.contrib.auth.models import User
-from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from datetime import timedelta
 from apps.expenses.models import Expense, Budget
-from .serializers import UserActiveSerializer, UserCompleteSerializer
+from apps.expenses.utils.util_categories import categories
+from apps.expenses.utils.util_conditional import (
+    daily_last_modified,
+    get_global_stamp,
+    get_user_stamp,
+    make_etag,
+    not_modified,
+    query_fingerprint,
+    set_validators,
+    today_stamp
+)
+from apps.expenses.utils.util_export import iter_ndjson, iter_user_expenses
+from apps.expenses.utils.util_report_snapshots import get_snapshot, snapshot_month, snapshot_response
+from apps.expenses.utils.util_reports import iter_complete_histories
+from .serializers import (
+    BatchReportRequestSerializer,
+    UserActiveSerializer,
+    UserCompleteSerializer,
+    UserReportSerializer,
+    parse_history_window
+)
 from .authentication import BearerTokenAuthentication
 
 
+def get_active_users():
+    """
+    Retorna los usuarios que cumplen los criterios de "activo"
+    
+    Compartido por ActiveUsersView y por el endpoint batch con all_active.
+    Usa los datos desnormalizados de UserActivity (fecha del último gasto y
+    alertas activadas), así que no recorre los gastos: el coste depende del
+    número de usuarios, no del de gastos.
+    
+    Returns:
+        QuerySet: Usuarios activos (sin ordenar)
+    """
+    
+    # Fecha límite para considerar gastos recientes (últimos 30 días)
+    thirty_days_ago = timezone.now().date() - timedelta(days=30)
+    
+    # Filtrar usuarios que:
+    # 1. Tienen presupuesto configurado
+    # 2. Tienen alertas por email activadas
+    # 3. Han registrado gastos en los últimos 30 días
+    return User.objects.filter(
+        # Tiene presupuesto configurado
+        budget__isnull=False,
+        # Tiene alertas por email activadas (copia de Budget.email_alerts_enabled)
+        activity__email_alerts_enabled=True,
+        # Ha registrado gastos en los últimos 30 días
+        activity__last_expense_date__gte=thirty_days_ago
+    )
+
+
 class ActiveUsersView(generics.ListAPIView):
     """
     Vista para obtener la lista de usuarios activos
@@ -37,6 +88,10 @@ class ActiveUsersView(generics.ListAPIView):
         },
         ...
     ]
+    
+    Admite If-None-Match / If-Modified-Since: el ETag sale de las versiones
+    de datos de todos los usuarios (una consulta agregada) y del día, así
+    que si no ha cambiado nada se responde 304 sin consultar los usuarios.
     """
     
     serializer_class = UserActiveSerializer
@@ -51,23 +106,7 @@ class ActiveUsersView(generics.ListAPIView):
             QuerySet: Usuarios activos filtrados
         """
         
-        # Fecha límite para considerar gastos recientes (últimos 30 días)
-        thirty_days_ago = timezone.now().date() - timedelta(days=30)
-        
-        # Filtrar usuarios que:
-        # 1. Tienen presupuesto configurado
-        # 2. Tienen alertas por email activadas
-        # 3. Han registrado gastos en los últimos 30 días
-        active_users = User.objects.filter(
-            # Tiene presupuesto configurado
-            budget__isnull=False,
-            # Tiene alertas por email activadas
-            budget__email_alerts_enabled=True,
-            # Ha registrado gastos en los últimos 30 días
-            expenses__date__gte=thirty_days_ago
-        ).distinct().order_by('username')
-        
-        return active_users
+        return get_active_users().order_by('username')
     
     def list(self, request, *args, **kwargs):
         """
@@ -80,13 +119,21 @@ class ActiveUsersView(generics.ListAPIView):
             Response: Lista de usuarios activos en formato JSON
         """
         
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        stamp, last_modified = get_global_stamp()
+        etag = make_etag('active-users', stamp, today_stamp())
+        last_modified = daily_last_modified(last_modified)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        
+        # Una sola consulta: el total se cuenta sobre la lista ya leída
+        users = list(self.get_queryset())
+        serializer = self.get_serializer(users, many=True)
         
         # Agregar información adicional útil para n8n
         response_data = {
             'users': serializer.data,
-            'total_active_users': queryset.count(),
+            'total_active_users': len(users),
             'timestamp': timezone.now().isoformat(),
             'criteria': {
                 'has_budget': True,
@@ -95,7 +142,7 @@ class ActiveUsersView(generics.ListAPIView):
             }
         }
         
-        return Response(response_data, status=status.HTTP_200_OK)
+        return set_validators(Response(response_data, status=status.HTTP_200_OK), etag, last_modified)
 
 
 class UserCompleteView(generics.RetrieveAPIView):
@@ -104,6 +151,25 @@ class UserCompleteView(generics.RetrieveAPIView):
     
     Endpoint: GET /api/users/{user_id}/complete/
     
+    Parámetros opcionales (query string):
+    - from, to: limitar el historial a un rango de fechas (YYYY-MM-DD)
+    - months: los N meses completos anteriores al actual (months=1 = mes pasado)
+    - updated_since: solo los gastos creados o editados desde esa fecha/hora
+    
+    Sin parámetros se devuelve el historial completo. Los totales de toda la
+    vida (first_expense, total_expenses, ...) se incluyen siempre.
+    
+    Admite If-None-Match / If-Modified-Since: el ETag sale de la versión de
+    datos del usuario (una consulta por clave primaria), los parámetros y el
+    día. Si no ha cambiado se responde 304 sin serializar el historial.
+    
+    Las peticiones de un mes cerrado completo (months=1, o from/to de un
+    mes) se sirven del reporte precalculado (ReportSnapshot, ver
+    build_monthly_reports): los bytes guardados, en gzip si el cliente lo
+    acepta. Si un cambio tardío lo desactualizó lo regenera una sola
+    petición y el resto sirve los bytes anteriores; si todavía no existe
+    se calcula en vivo.
+    
     Incluye:
     - Datos del usuario
     - Presupuesto configurado
@@ -118,7 +184,8 @@ class UserCompleteView(generics.RetrieveAPIView):
         "complete_history": {
             "all_expenses": [ ... ],
             "monthly_summaries": { ... },
-            "categories_summary": { ... }
+            "categories_summary": { ... },
+            "window": {"from": ..., "to": ..., "updated_since": ..., "total": ..., "count": ...}
         }
     }
     """
@@ -142,6 +209,17 @@ class UserCompleteView(generics.RetrieveAPIView):
             budget__isnull=False
         ).select_related('budget')
     
+    def get_serializer_context(self):
+        """
+        Añade al contexto la ventana de historial pedida en la query string
+        
+        Returns:
+            dict: Contexto del serializer con 'history_window'
+        """
+        context = super().get_serializer_context()
+        context['history_window'] = getattr(self, 'history_window', None)
+        return context
+    
     def retrieve(self, request, *args, **kwargs):
         """
         Maneja la petición GET y retorna los datos completos del usuario
@@ -153,6 +231,36 @@ class UserCompleteView(generics.RetrieveAPIView):
             Response: Datos completos del usuario en formato JSON
         """
         
+        try:
+            self.history_window = parse_history_window(request.query_params)
+        except serializers.ValidationError as e:
+            return Response(
+                {
+                    'error': 'Parámetros no válidos',
+                    'detail': e.detail
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Mes cerrado completo: servir el reporte precalculado si existe
+        month = snapshot_month(self.history_window)
+        snapshot = get_snapshot(kwargs['id'], month) if month is not None else None
+        if snapshot is not None:
+            return snapshot_response(request, snapshot)
+        
+        etag = last_modified = None
+        stamp = get_user_stamp(kwargs['id'])
+        if stamp is not None:
+            version, last_modified = stamp
+            etag = make_etag(
+                'user-complete', kwargs['id'], query_fingerprint(request.query_params), today_stamp(), version,
+                categories.version()
+            )
+            last_modified = daily_last_modified(last_modified, categories.last_modified())
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+        
         try:
             instance = self.get_object()
             serializer = self.get_serializer(instance)
@@ -163,11 +271,14 @@ class UserCompleteView(generics.RetrieveAPIView):
                 'metadata': {
                     'generated_at': timezone.now().isoformat(),
                     'api_version': '1.0',
-                    'data_complete': True
+                    'data_complete': not any(self.history_window.values())
                 }
             }
             
-            return Response(response_data, status=status.HTTP_200_OK)
+            response = Response(response_data, status=status.HTTP_200_OK)
+            if etag:
+                set_validators(response, etag, last_modified)
+            return response
             
         except User.DoesNotExist:
             return Response(
@@ -184,4 +295,126 @@ class UserCompleteView(generics.RetrieveAPIView):
                     'detail': str(e)
                 },
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            ) 
\ No newline at end of file
+            ) 
+
+
+class UserExpensesExportView(APIView):
+    """
+    Vista para exportar todos los gastos de un usuario en streaming
+    
+    Endpoint: GET /api/users/{user_id}/expenses/export/
+    
+    Devuelve NDJSON (application/x-ndjson): un gasto por línea, con el mismo
+    formato que los elementos de complete_history.all_expenses. Los gastos se
+    leen por lotes y se escriben según se generan, así que la memoria del
+    worker no depende de cuántos gastos tenga el usuario.
+    
+    Respuesta:
+    {"id": 42, "amount": "12.50", "date": "2025-03-05", "category": {...}, ...}
+    {"id": 41, "amount": "3.20", "date": "2025-03-04", "category": {...}, ...}
+    ...
+    """
+    
+    authentication_classes = [BearerTokenAuthentication]
+    permission_classes = [AllowAny]
+    
+    def get(self, request, id):
+        """
+        Maneja la petición GET y devuelve los gastos del usuario en streaming
+        
+        Args:
+            request: HTTP request
+            id: ID del usuario
+            
+        Returns:
+            StreamingHttpResponse: Gastos en formato NDJSON
+        """
+        
+        user = User.objects.filter(id=id, budget__isnull=False).first()
+        if user is None:
+            return Response(
+                {
+                    'error': 'Usuario no encontrado o no tiene presupuesto configurado',
+                    'detail': 'El usuario debe tener un presupuesto configurado para generar reportes'
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        response = StreamingHttpResponse(
+            iter_ndjson(iter_user_expenses(user)),
+            content_type='application/x-ndjson; charset=utf-8'
+        )
+        response['X-Generated-At'] = timezone.now().isoformat()
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+
+class UserCompleteBatchView(APIView):
+    """
+    Vista para obtener los datos completos de muchos usuarios en una llamada
+    
+    Endpoint: POST /api/users/complete/batch/
+    
+    Cuerpo:
+    {"user_ids": [1, 2, 3]}   o   {"all_active": true}
+    
+    Admite los mismos parámetros de ventana que /api/users/{id}/complete/
+    (from, to, months, updated_since) en la query string.
+    
+    Los resúmenes de todos los usuarios se calculan con un número fijo de
+    consultas agrupadas y los gastos se leen en una sola consulta, sin
+    importar cuántos usuarios se pidan. La respuesta es NDJSON
+    (application/x-ndjson): una línea por usuario, ordenadas por id, con el
+    mismo contenido que /api/users/{id}/complete/ sin 'metadata'. Los
+    usuarios que no existen o no tienen presupuesto se omiten.
+    """
+    
+    authentication_classes = [BearerTokenAuthentication]
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        """
+        Maneja la petición POST y devuelve los reportes en streaming
+        
+        Args:
+            request: HTTP request
+            
+        Returns:
+            StreamingHttpResponse: Un usuario por línea en formato NDJSON
+        """
+        
+        request_serializer = BatchReportRequestSerializer(data=request.data)
+        try:
+            request_serializer.is_valid(raise_exception=True)
+            window = parse_history_window(request.query_params)
+        except serializers.ValidationError as e:
+            return Response(
+                {
+                    'error': 'Parámetros no válidos',
+                    'detail': e.detail
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if request_serializer.validated_data['all_active']:
+            users = User.objects.filter(id__in=get_active_users().values('id'))
+        else:
+            users = User.objects.filter(
+                id__in=request_serializer.validated_data['user_ids'],
+                budget__isnull=False
+            )
+        users = list(users.select_related('budget').order_by('id'))
+        
+        def reports():
+            for user, history in iter_complete_histories(users, window):
+                yield {**UserReportSerializer(user).data, 'complete_history': history}
+        
+        response = StreamingHttpResponse(
+            iter_ndjson(reports(), lines_per_chunk=1),
+            content_type='application/x-ndjson; charset=utf-8'
+        )
+        response['X-Generated-At'] = timezone.now().isoformat()
+        response['X-Total-Users'] = str(len(users))
+        response['Cache-Control'] = 'no-store'
+        return response
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ExpensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.expenses'
+
+    def ready(self):
+        # Registrar señales (mantenimiento de agregados mensuales)
+        from . import signals  # noqa: F401
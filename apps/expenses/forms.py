@@ -1,5 +1,8 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.utils.choices import BaseChoiceIterator
 from .models import Expense, Category, Budget
+from .utils.util_categories import categories
 from datetime import datetime, date, timedelta
 
 
@@ -17,18 +20,80 @@ class DateInput(forms.DateInput):
         return value.strftime('%Y-%m-%d') if value else ''
 
 
+class CategoryChoiceIterator(BaseChoiceIterator):
+    """
+    Opciones del selector de categorías leídas del registro en memoria
+
+    Se evalúa en cada renderizado, así que refleja las categorías vigentes
+    sin consultar la base de datos.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for info in categories.all():
+            yield (info.id, info.name)
+
+    def __len__(self):
+        return len(categories.all()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(categories.all())
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    """
+    Selector de categoría servido desde el registro de categorías
+
+    Igual que ModelChoiceField, pero ni las opciones ni la validación
+    consultan la tabla de categorías: el valor limpio es una instancia de
+    Category construida desde el registro (válida como ForeignKey).
+    """
+
+    iterator = CategoryChoiceIterator
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', Category.objects.none())
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, Category):
+            value = value.pk
+        try:
+            info = categories.get(int(value))
+        except (TypeError, ValueError):
+            info = None
+        if info is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return info.to_model()
+
+
 class ExpenseForm(forms.ModelForm):
     """
     Formulario para crear y editar gastos
     """
     
+    # Categorías ordenadas por nombre, servidas desde el registro en memoria
+    category = CategoryChoiceField(
+        widget=forms.Select(attrs={
+            'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500'
+        }),
+        label="Categoría"
+    )
+    
     class Meta:
         model = Expense
         fields = ['category', 'amount', 'description', 'date', 'location']
         widgets = {
-            'category': forms.Select(attrs={
-                'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500'
-            }),
             'amount': forms.NumberInput(attrs={
                 'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500',
                 'step': '0.01',
@@ -48,7 +113,6 @@ class ExpenseForm(forms.ModelForm):
             }),
         }
         labels = {
-            'category': 'Categoría',
             'amount': 'Cantidad (€)',
             'description': 'Descripción',
             'date': 'Fecha',
@@ -60,9 +124,6 @@ class ExpenseForm(forms.ModelForm):
         # Establecer fecha de hoy por defecto
         if not self.instance.pk:
             self.fields['date'].initial = date.today()
-        
-        # Ordenar categorías por nombre
-        self.fields['category'].queryset = Category.objects.all().order_by('name') 
 
 
 class ExpenseFilterForm(forms.Form):
@@ -92,8 +153,7 @@ class ExpenseFilterForm(forms.Form):
     )
     
     # Filtro por categoría
-    category = forms.ModelChoiceField(
-        queryset=Category.objects.all(),
+    category = CategoryChoiceField(
         required=False,
         empty_label="Todas las categorías",
         widget=forms.Select(attrs={
@@ -152,11 +212,6 @@ class ExpenseFilterForm(forms.Form):
         label="Monto máximo (€)"
     )
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Ordenar categorías por nombre
-        self.fields['category'].queryset = Category.objects.all().order_by('name')
-        
     def clean(self):
         """
         Validación personalizada para asegurar coherencia en los filtros
@@ -288,4 +343,49 @@ class BudgetForm(forms.ModelForm):
                 'critical_percentage': 'El porcentaje debe estar entre 1 y 100.'
             })
         
-        return cleaned_data 
\ No newline at end of file
+        return cleaned_data 
+
+class ExpenseImportForm(forms.Form):
+    """
+    Formulario para importar gastos desde un extracto bancario (CSV u OFX)
+    """
+
+    FORMAT_CHOICES = [
+        ('auto', 'Detectar por extensión'),
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+    ]
+
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'mt-1 block w-full text-sm text-gray-700',
+            'accept': '.csv,.txt,.ofx,.qfx'
+        }),
+        label="Fichero"
+    )
+
+    file_format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        initial='auto',
+        widget=forms.Select(attrs={
+            'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500'
+        }),
+        label="Formato"
+    )
+
+    default_category = CategoryChoiceField(
+        required=False,
+        empty_label="Ninguna (rechazar filas sin categoría)",
+        widget=forms.Select(attrs={
+            'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500'
+        }),
+        label="Categoría por defecto",
+        help_text="Se usa para las filas sin categoría o con una categoría desconocida"
+    )
+
+    debits_only = forms.BooleanField(
+        required=False,
+        initial=True,
+        label="Importar solo cargos",
+        help_text="Ignora los abonos (importes positivos) del extracto"
+    )
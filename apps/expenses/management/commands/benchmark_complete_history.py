@@ -0,0 +1,110 @@
+"""
+Comando para medir el cálculo de complete_history
+
+Compara la implementación anterior de
+UserCompleteSerializer.get_complete_history (exists/first/last/count,
+serialización completa y dos bucles en Python que convierten cada importe
+a float) con la actual, que agrupa en SQL y suma como Decimal:
+
+    python manage.py benchmark_complete_history --sizes 10000 100000
+
+Se miden dos escenarios por tamaño: el historial completo y solo los
+resúmenes (months=1, lo que pide el workflow mensual). Los gastos se crean
+dentro de una transacción que se deshace al terminar.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+
+from apps.expenses.api.serializers import ExpenseSerializer, UserCompleteSerializer, parse_history_window
+from apps.expenses.models import Category, Expense
+from apps.expenses.utils.util_benchmark import create_benchmark_user, measure, rolled_back
+
+
+def legacy_complete_history(user):
+    """
+    Implementación anterior de get_complete_history, como referencia
+
+    Recorre en Python todos los gastos del usuario para calcular los
+    resúmenes mensuales y por categoría.
+    """
+    expenses = Expense.objects.filter(user=user).select_related('category').order_by('-date')
+    if not expenses.exists():
+        return {}
+
+    first_expense = expenses.last().date
+    last_expense = expenses.first().date
+    total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or 0
+    total_expense_count = expenses.count()
+    all_expenses = ExpenseSerializer(expenses, many=True).data
+
+    monthly_summaries = {}
+    categories_summary = {}
+    for expense in expenses:
+        month_key = expense.date.strftime('%Y-%m')
+        month = monthly_summaries.setdefault(month_key, {'total': 0, 'count': 0, 'categories': {}})
+        month['total'] += float(expense.amount)
+        month['count'] += 1
+        cat_name = expense.category.name
+        month['categories'][cat_name] = month['categories'].get(cat_name, 0) + float(expense.amount)
+
+        category = categories_summary.setdefault(cat_name, {'total': 0, 'count': 0, 'percentage': 0})
+        category['total'] += float(expense.amount)
+        category['count'] += 1
+
+    for category in categories_summary.values():
+        category['percentage'] = round(category['total'] / float(total_expenses) * 100, 2)
+
+    return {
+        'first_expense': first_expense.isoformat(),
+        'last_expense': last_expense.isoformat(),
+        'total_expenses': float(total_expenses),
+        'total_expense_count': total_expense_count,
+        'all_expenses': all_expenses,
+        'monthly_summaries': monthly_summaries,
+        'categories_summary': categories_summary
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo, memoria y consultas de complete_history antes y después de agrupar en SQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10_000, 100_000],
+            help='Número de gastos del usuario en cada medición'
+        )
+
+    def handle(self, *args, **options):
+        categories = list(Category.objects.all()[:10])
+        if not categories:
+            self.stderr.write(self.style.ERROR('No hay categorías. Ejecuta antes las migraciones.'))
+            return
+
+        last_month = {'history_window': parse_history_window({'months': '1'})}
+
+        for size in options['sizes']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {size:,} gastos"))
+            with rolled_back():
+                user = create_benchmark_user(size, categories)
+                self._report('anterior (bucles Python)', lambda: legacy_complete_history(user))
+                self._report('actual, historial completo', lambda: UserCompleteSerializer(user).data)
+                self._report(
+                    'actual, months=1',
+                    lambda: UserCompleteSerializer(user, context=last_month).data
+                )
+
+    def _report(self, label, func):
+        """Ejecuta func e imprime tiempo, pico de tracemalloc y número de consultas"""
+        with CaptureQueriesContext(connection) as queries:
+            _, elapsed, peak_mb, _ = measure(func)
+        self.stdout.write(
+            f"{label:<28} {elapsed:8.2f} s   "
+            f"pico Python {peak_mb:8.1f} MB   "
+            f"{len(queries):3d} consultas"
+        )
@@ -0,0 +1,174 @@
+"""
+Comando para comparar conexión por petición, conexiones persistentes y pool
+
+Simula peticiones concurrentes contra la base de datos 'default': cada
+hilo hace --requests "peticiones" que abren (o toman) una conexión,
+ejecutan la consulta y la cierran (o la devuelven):
+
+    python manage.py benchmark_db_connections --threads 12 --requests 200
+
+Modos:
+- connect: una conexión nueva por petición (CONN_MAX_AGE=0, sin pool)
+- persistent: una conexión por hilo reutilizada (CONN_MAX_AGE > 0)
+- pool: pool de psycopg compartido por los hilos (OPTIONS['pool'])
+
+El modo pool solo está disponible con PostgreSQL y psycopg-pool. Para
+cada modo se informa del throughput y de las latencias p50/p95/p99 por
+petición, que incluyen el tiempo de obtener la conexión.
+"""
+
+import copy
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+from config.settings.database import pool_available
+
+MODES = ('connect', 'persistent', 'pool')
+
+
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de conexión por petición frente a conexiones persistentes y pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=12,
+            help='Peticiones concurrentes (por defecto 12, p. ej. 3 workers x 4)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Peticiones por hilo (por defecto 200)'
+        )
+        parser.add_argument(
+            '--pool-size',
+            type=int,
+            default=None,
+            help='Tamaño máximo del pool (por defecto igual a --threads)'
+        )
+        parser.add_argument(
+            '--query',
+            default='SELECT 1',
+            help="Consulta de cada petición (por defecto 'SELECT 1')"
+        )
+        parser.add_argument(
+            '--modes',
+            nargs='+',
+            choices=MODES,
+            default=list(MODES),
+            help='Modos a medir (por defecto todos)'
+        )
+
+    def handle(self, *args, **options):
+        base = copy.deepcopy(connections.settings['default'])
+        base['OPTIONS'] = {key: value for key, value in base['OPTIONS'].items() if key != 'pool'}
+        is_postgres = base['ENGINE'] == 'django.db.backends.postgresql'
+
+        if options['threads'] < 1 or options['requests'] < 1:
+            raise CommandError('--threads y --requests deben ser mayores que cero')
+
+        for mode in options['modes']:
+            if mode == 'pool' and not (is_postgres and pool_available()):
+                self.stdout.write(self.style.WARNING('pool: requiere PostgreSQL y psycopg[pool], se omite'))
+                continue
+
+            settings_dict = copy.deepcopy(base)
+            settings_dict['CONN_MAX_AGE'] = None if mode == 'persistent' else 0
+            if mode == 'pool':
+                size = options['pool_size'] or options['threads']
+                settings_dict['OPTIONS']['pool'] = {'min_size': size, 'max_size': size, 'timeout': 30}
+
+            latencies, errors, elapsed = self._run(
+                f'benchmark_{mode}', settings_dict, mode, options['threads'], options['requests'], options['query']
+            )
+            self._report(mode, latencies, errors, elapsed)
+
+    def _run(self, alias, settings_dict, mode, threads, requests, query):
+        """
+        Lanza los hilos y recoge las latencias de cada petición
+
+        Returns:
+            tuple: (latencias en segundos ordenadas, errores, segundos totales)
+        """
+        backend = load_backend(settings_dict['ENGINE'])
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads + 1)
+
+        def worker():
+            # Cada hilo usa su propio wrapper, como cada petición en Django
+            wrapper = backend.DatabaseWrapper(settings_dict, alias)
+            local = []
+            try:
+                barrier.wait()
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    try:
+                        with wrapper.cursor() as cursor:
+                            cursor.execute(query)
+                            cursor.fetchall()
+                        if mode != 'persistent':
+                            # Cierra la conexión o la devuelve al pool
+                            wrapper.close()
+                    except Exception as e:
+                        with lock:
+                            errors.append(str(e))
+                        wrapper.close()
+                    local.append(time.perf_counter() - start)
+            finally:
+                wrapper.close()
+                with lock:
+                    latencies.extend(local)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+
+        # Con pool, abrir las conexiones antes de medir (como un worker ya arrancado)
+        if mode == 'pool':
+            warmup = backend.DatabaseWrapper(settings_dict, alias)
+            warmup.pool.open(wait=True)
+
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        if mode == 'pool':
+            backend.DatabaseWrapper(settings_dict, alias).close_pool()
+
+        return sorted(latencies), errors, elapsed
+
+    def _report(self, mode, latencies, errors, elapsed):
+        """Muestra throughput y percentiles de un modo"""
+        to_ms = 1000
+        self.stdout.write(self.style.MIGRATE_HEADING(f'== {mode}'))
+        self.stdout.write(
+            f"  {len(latencies)} peticiones en {elapsed:.2f}s ({len(latencies) / elapsed:.0f} req/s), "
+            f"{len(errors)} errores"
+        )
+        if latencies:
+            self.stdout.write(
+                f"  p50 {percentile(latencies, 50) * to_ms:.2f} ms  "
+                f"p95 {percentile(latencies, 95) * to_ms:.2f} ms  "
+                f"p99 {percentile(latencies, 99) * to_ms:.2f} ms  "
+                f"máx {latencies[-1] * to_ms:.2f} ms"
+            )
+        for error in errors[:5]:
+            self.stderr.write(f"  {error}")
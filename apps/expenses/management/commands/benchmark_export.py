@@ -0,0 +1,79 @@
+"""
+Comando para medir la memoria de la exportación de gastos
+
+Compara, para varios volúmenes de gastos, la serialización completa en
+memoria (ExpenseSerializer(many=True) + JSONRenderer, como hace
+UserCompleteView) con la exportación NDJSON en streaming:
+
+    python manage.py benchmark_export --sizes 10000 100000 1000000
+
+Los gastos se crean con bulk_create dentro de una transacción que se
+deshace al terminar, así que la base de datos queda como estaba.
+
+Para cada variante se informa del tiempo, del pico de memoria Python
+(tracemalloc) y del crecimiento del RSS máximo del proceso. El RSS
+máximo nunca baja, por eso la variante en streaming se mide primero.
+"""
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from apps.expenses.api.serializers import ExpenseSerializer
+from apps.expenses.models import Category, Expense
+from apps.expenses.utils.util_benchmark import create_benchmark_user, measure, rolled_back
+from apps.expenses.utils.util_export import iter_ndjson, iter_user_expenses
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y memoria de la exportación de gastos en memoria frente a streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10_000, 100_000, 1_000_000],
+            help='Número de gastos a generar en cada medición'
+        )
+        parser.add_argument(
+            '--skip-buffered',
+            action='store_true',
+            help='No medir la serialización en memoria (útil para tamaños muy grandes)'
+        )
+
+    def handle(self, *args, **options):
+        categories = list(Category.objects.all()[:10])
+        if not categories:
+            self.stderr.write(self.style.ERROR('No hay categorías. Ejecuta antes las migraciones.'))
+            return
+
+        for size in options['sizes']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {size:,} gastos"))
+            with rolled_back():
+                user = create_benchmark_user(size, categories)
+                self._report('streaming NDJSON', lambda: self._run_streaming(user))
+                if not options['skip_buffered']:
+                    self._report('en memoria (serializer)', lambda: self._run_buffered(user))
+
+    def _run_streaming(self, user):
+        """Consume el generador NDJSON como lo haría el servidor WSGI"""
+        total_bytes = 0
+        for chunk in iter_ndjson(iter_user_expenses(user)):
+            total_bytes += len(chunk)
+        return total_bytes
+
+    def _run_buffered(self, user):
+        """Serializa todos los gastos en memoria, como UserCompleteView"""
+        expenses = Expense.objects.filter(user=user).select_related('category').order_by('-date')
+        body = JSONRenderer().render(ExpenseSerializer(expenses, many=True).data)
+        return len(body)
+
+    def _report(self, label, func):
+        """Ejecuta func e imprime tiempo, pico de tracemalloc y crecimiento de RSS"""
+        total_bytes, elapsed, peak_mb, rss_growth = measure(func)
+        self.stdout.write(
+            f"{label:<26} {elapsed:8.2f} s   "
+            f"pico Python {peak_mb:8.1f} MB   "
+            f"RSS máx +{rss_growth:7.1f} MB   "
+            f"respuesta {total_bytes / 1024 / 1024:8.1f} MB"
+        )
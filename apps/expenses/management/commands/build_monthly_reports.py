@@ -0,0 +1,184 @@
+"""
+Comando para precalcular los reportes mensuales que pide n8n
+
+Genera para cada usuario la respuesta de /api/users/{id}/complete/ del mes
+cerrado y la guarda comprimida en ReportSnapshot. La API la sirve después
+sin serializar, así que el workflow mensual no dispara una serialización
+pesada por usuario en el mismo minuto.
+
+Uso:
+    python manage.py build_monthly_reports                   # mes pasado, usuarios activos
+    python manage.py build_monthly_reports --month 2025-03   # un mes concreto
+    python manage.py build_monthly_reports --all-users       # todos los usuarios con presupuesto
+    python manage.py build_monthly_reports --user-id 3       # limitar a ciertos usuarios
+    python manage.py build_monthly_reports --stale           # solo regenerar los desactualizados
+    python manage.py build_monthly_reports --loop            # proceso continuo (servicio 'reports')
+
+Con --loop el comando queda en marcha como el worker de webhooks (servicio
+'reports' de docker-compose.prod.yml) y cada --interval segundos:
+- genera los reportes del mes pasado que falten para los usuarios activos
+  (el día 1, en cuanto cambia el mes, mucho antes de las 9:00 del workflow)
+- regenera los marcados como desactualizados
+
+Los reportes de usuarios que ya no tienen presupuesto se borran (al borrar
+el presupuesto y, por si acaso, al regenerar los desactualizados).
+"""
+
+import signal
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.expenses.api.views import get_active_users
+from apps.expenses.models import ReportSnapshot
+from apps.expenses.utils.util_report_snapshots import (
+    SNAPSHOT_BATCH_SIZE,
+    build_snapshots,
+    last_closed_month,
+)
+from apps.expenses.utils.util_rollups import month_start
+
+
+class Command(BaseCommand):
+    help = 'Precalcula los reportes mensuales (ReportSnapshot) que sirve /api/users/{id}/complete/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            help='Mes del reporte en formato YYYY-MM (por defecto el mes pasado)'
+        )
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Limitar a este usuario (se puede repetir)'
+        )
+        parser.add_argument(
+            '--all-users',
+            action='store_true',
+            help='Todos los usuarios con presupuesto, no solo los activos'
+        )
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help='Regenerar solo los reportes marcados como desactualizados (de cualquier mes)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Queda en marcha: genera los que falten del mes pasado y regenera los desactualizados'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=300.0,
+            help='Segundos entre pasadas con --loop (por defecto 300)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SNAPSHOT_BATCH_SIZE,
+            help=f'Usuarios por lote (por defecto {SNAPSHOT_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size debe ser mayor que cero')
+
+        if options['loop']:
+            self._loop(options['interval'], options['batch_size'])
+            return
+
+        started = time.perf_counter()
+        if options['stale']:
+            saved = self._rebuild_stale(options['user_ids'], options['batch_size'])
+        else:
+            month = self._parse_month(options['month'])
+            users = self._users(options['user_ids'], options['all_users'])
+            saved = build_snapshots(users, month, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{saved} reportes generados en {time.perf_counter() - started:.1f}s"
+        ))
+
+    def _loop(self, interval, batch_size):
+        """Pasadas periódicas hasta recibir SIGTERM/SIGINT"""
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while not self._stopping:
+            close_old_connections()
+            built = self._build_missing(batch_size)
+            rebuilt = self._rebuild_stale(None, batch_size)
+            if built or rebuilt:
+                self.stdout.write(
+                    f"[{timezone.now():%Y-%m-%d %H:%M:%S}] {built} generados, {rebuilt} regenerados"
+                )
+
+            # Esperar en pasos cortos para responder a SIGTERM enseguida
+            deadline = time.monotonic() + interval
+            while not self._stopping and time.monotonic() < deadline:
+                time.sleep(min(1.0, deadline - time.monotonic()))
+
+    def _stop(self, signum, frame):
+        """Termina tras la pasada en curso al recibir SIGTERM/SIGINT"""
+        self._stopping = True
+
+    def _build_missing(self, batch_size):
+        """Genera los reportes del mes pasado de los usuarios activos que aún no lo tienen"""
+        month = last_closed_month()
+        users = list(
+            User.objects.filter(id__in=get_active_users().values('id'))
+            .exclude(report_snapshots__month=month)
+            .select_related('budget')
+            .order_by('id')
+        )
+        return build_snapshots(users, month, batch_size=batch_size)
+
+    def _parse_month(self, value):
+        """Primer día del mes indicado (YYYY-MM) o del mes pasado"""
+        if not value:
+            return last_closed_month()
+        try:
+            year, month = (int(part) for part in value.split('-'))
+            month = date(year, month, 1)
+        except ValueError:
+            raise CommandError(f'Mes no válido: {value!r}, usa el formato YYYY-MM')
+        if month >= month_start(timezone.localdate()):
+            raise CommandError('Solo se generan reportes de meses cerrados')
+        return month
+
+    def _users(self, user_ids, all_users):
+        """Usuarios con presupuesto a incluir, ordenados por id"""
+        if user_ids:
+            users = User.objects.filter(id__in=user_ids, budget__isnull=False)
+        elif all_users:
+            users = User.objects.filter(budget__isnull=False)
+        else:
+            users = User.objects.filter(id__in=get_active_users().values('id'))
+        return list(users.select_related('budget').order_by('id'))
+
+    def _rebuild_stale(self, user_ids, batch_size):
+        """Regenera los reportes desactualizados, agrupados por mes"""
+        stale = ReportSnapshot.objects.filter(stale=True)
+        if user_ids:
+            stale = stale.filter(user_id__in=user_ids)
+        # Usuarios que ya no tienen presupuesto: no se pueden regenerar
+        stale.filter(user__budget__isnull=True).delete()
+
+        saved = 0
+        for month in stale.values_list('month', flat=True).distinct().order_by('month'):
+            users = list(
+                User.objects.filter(
+                    id__in=stale.filter(month=month).values('user_id'),
+                    budget__isnull=False
+                ).select_related('budget').order_by('id')
+            )
+            saved += build_snapshots(users, month, batch_size=batch_size)
+        return saved
@@ -0,0 +1,124 @@
+"""
+Comando para inspeccionar los planes de ejecución de las consultas críticas
+
+Ejecuta EXPLAIN sobre las consultas de Expense que usan el dashboard,
+el listado de gastos, la alerta de presupuesto y la API de usuarios activos.
+Sirve para comparar los planes antes y después de aplicar los índices
+compuestos de la migración 0004:
+
+    python manage.py migrate expenses 0003
+    python manage.py explain_expense_queries --user-id 1 --analyze
+    python manage.py migrate expenses 0004
+    python manage.py explain_expense_queries --user-id 1 --analyze
+"""
+
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.expenses.models import Expense, MonthlyUserSpend
+
+
+class Command(BaseCommand):
+    help = 'Muestra el plan de ejecución (EXPLAIN) de las consultas críticas de gastos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            help='Usuario sobre el que lanzar las consultas (por defecto, el que más gastos tiene)'
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Ejecuta realmente las consultas (EXPLAIN ANALYZE, BUFFERS). Solo PostgreSQL'
+        )
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user_id'])
+        analyze = options['analyze']
+
+        if analyze and connection.vendor != 'postgresql':
+            raise CommandError('--analyze solo está soportado en PostgreSQL')
+
+        self.stdout.write(f"Usuario: {user.username} (id={user.id})")
+        self.stdout.write(f"Base de datos: {connection.vendor}\n")
+
+        for title, queryset in self._build_queries(user):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {title}"))
+            explain_options = {'analyze': True, 'buffers': True} if analyze else {}
+
+            start = time.perf_counter()
+            plan = queryset.explain(**explain_options)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            self.stdout.write(plan)
+            self.stdout.write(f"-- {elapsed_ms:.2f} ms\n")
+
+    def _get_user(self, user_id):
+        """Obtiene el usuario indicado o el que más gastos tiene"""
+        if user_id:
+            try:
+                return User.objects.get(id=user_id)
+            except User.DoesNotExist:
+                raise CommandError(f'No existe el usuario con id={user_id}')
+
+        top = Expense.objects.values('user').annotate(
+            total=Sum('amount')
+        ).order_by('-total').first()
+        if not top:
+            raise CommandError('No hay gastos en la base de datos')
+        return User.objects.get(id=top['user'])
+
+    def _build_queries(self, user):
+        """
+        Construye los QuerySets equivalentes a los caminos calientes
+
+        Los aggregate() se expresan como values().annotate() porque
+        explain() necesita un QuerySet, el plan resultante es el mismo.
+        """
+        today = timezone.now().date()
+        month_start = today.replace(day=1)
+        thirty_days_ago = today - timedelta(days=30)
+
+        period_expenses = Expense.objects.filter(
+            user=user,
+            date__gte=month_start,
+            date__lte=today
+        )
+
+        return [
+            (
+                'Dashboard: total del período',
+                period_expenses.values('user').annotate(total=Sum('amount')).order_by()
+            ),
+            (
+                'Dashboard: resumen por categorías',
+                period_expenses.values('date', 'category_id').annotate(
+                    total=Sum('amount')
+                ).order_by()
+            ),
+            (
+                'Listado de gastos (primera página)',
+                Expense.objects.filter(user=user).order_by(
+                    '-date', '-created_at'
+                )[:50]
+            ),
+            (
+                'Alerta de presupuesto: total del mes actual (agregados)',
+                MonthlyUserSpend.objects.filter(user=user, month=month_start).values('total')
+            ),
+            (
+                'API: usuarios activos',
+                User.objects.filter(
+                    budget__isnull=False,
+                    budget__email_alerts_enabled=True,
+                    expenses__date__gte=thirty_days_ago
+                ).distinct().order_by('username')
+            ),
+        ]
@@ -0,0 +1,113 @@
+"""
+Comando para importar gastos desde un extracto bancario (CSV u OFX)
+
+Uso:
+    python manage.py import_expenses --user ana extracto.csv
+    python manage.py import_expenses --user 3 movimientos.ofx --debits-only
+    python manage.py import_expenses --user ana banco.csv --default-category Otros --encoding latin-1
+
+Los gastos se insertan por lotes con bulk_create; los agregados, la caché
+y las alertas de presupuesto se actualizan una vez por lote. Los
+movimientos ya guardados (misma fecha, importe y descripción) se omiten,
+salvo con --allow-duplicates.
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.expenses.models import Category
+from apps.expenses.utils.util_import import (
+    IMPORT_BATCH_SIZE,
+    ImportRowError,
+    detect_format,
+    import_expenses,
+    iter_import_rows
+)
+
+
+class Command(BaseCommand):
+    help = 'Importa gastos de un extracto bancario CSV u OFX en lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Ruta del fichero a importar')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Usuario destino (nombre de usuario o ID)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['auto', 'csv', 'ofx'],
+            default='auto',
+            help='Formato del fichero (por defecto se deduce de la extensión)'
+        )
+        parser.add_argument(
+            '--default-category',
+            help='Categoría para las filas sin categoría reconocida'
+        )
+        parser.add_argument(
+            '--debits-only',
+            action='store_true',
+            help='Importar solo cargos (importes negativos) e ignorar abonos'
+        )
+        parser.add_argument(
+            '--allow-duplicates',
+            action='store_true',
+            help='Importar también los movimientos que ya existen (misma fecha, importe y descripción)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f'Gastos por lote (por defecto {IMPORT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--encoding',
+            default='utf-8-sig',
+            help='Codificación del fichero (por defecto utf-8-sig)'
+        )
+
+    def handle(self, *args, **options):
+        user_ref = options['user']
+        lookup = {'id': user_ref} if user_ref.isdigit() else {'username': user_ref}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"El usuario {user_ref!r} no existe")
+
+        default_category = None
+        if options['default_category']:
+            default_category = Category.objects.filter(name__iexact=options['default_category']).first()
+            if default_category is None:
+                raise CommandError(f"La categoría {options['default_category']!r} no existe")
+
+        file_format = options['format']
+        if file_format == 'auto':
+            file_format = detect_format(options['path'])
+
+        start = time.perf_counter()
+        try:
+            with open(options['path'], encoding=options['encoding'], newline='') as stream:
+                result = import_expenses(
+                    user,
+                    iter_import_rows(stream, file_format),
+                    default_category=default_category,
+                    debits_only=options['debits_only'],
+                    batch_size=options['batch_size'],
+                    skip_duplicates=not options['allow_duplicates']
+                )
+        except (OSError, UnicodeDecodeError, ImportRowError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for line, error in result['errors']:
+            self.stderr.write(f"  línea {line}: {error}")
+
+        rate = result['created'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} gastos importados en {elapsed:.2f}s ({rate:,.0f}/s), "
+            f"{result['skipped']} abonos omitidos, {result['duplicates']} ya importados, "
+            f"{result['error_count']} filas con errores"
+        ))
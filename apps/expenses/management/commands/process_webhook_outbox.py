@@ -0,0 +1,108 @@
+"""
+Comando que envía los webhooks pendientes de WebhookOutbox a n8n
+
+Pensado para ejecutarse como proceso aparte (servicio 'worker' de
+docker-compose), de forma que las peticiones de los usuarios nunca
+esperan a n8n:
+
+    python manage.py process_webhook_outbox              # bucle continuo
+    python manage.py process_webhook_outbox --once       # un lote y termina
+    python manage.py process_webhook_outbox --requeue-dead
+    python manage.py process_webhook_outbox --metrics-port 9100   # métricas Prometheus
+
+Se pueden lanzar varios workers a la vez: cada lote se reclama con
+SELECT ... FOR UPDATE SKIP LOCKED.
+"""
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.core.metrics import metrics_available
+from apps.expenses.models import WebhookOutbox
+from apps.expenses.utils.util_webhooks import process_webhook_outbox
+
+
+class Command(BaseCommand):
+    help = 'Envía a n8n los webhooks pendientes, con reintentos y backoff exponencial'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesa los webhooks pendientes una vez y termina'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando no hay webhooks pendientes (por defecto 2)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Webhooks reclamados por lote (por defecto 50)'
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=0,
+            help='Puerto en el que exponer las métricas Prometheus del worker (0 = no exponer)'
+        )
+        parser.add_argument(
+            '--requeue-dead',
+            action='store_true',
+            help='Vuelve a poner en cola los webhooks descartados y termina'
+        )
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            requeued = WebhookOutbox.objects.filter(status=WebhookOutbox.STATUS_DEAD).update(
+                status=WebhookOutbox.STATUS_PENDING,
+                attempts=0,
+                next_attempt_at=timezone.now()
+            )
+            self.stdout.write(self.style.SUCCESS(f"{requeued} webhooks vueltos a poner en cola"))
+            return
+
+        if options['metrics_port']:
+            self._start_metrics_server(options['metrics_port'])
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while not self._stopping:
+            close_old_connections()
+            results = process_webhook_outbox(options['batch_size'])
+            if results:
+                summary = ', '.join(f"{status}: {count}" for status, count in sorted(results.items()))
+                self.stdout.write(f"[{timezone.now():%Y-%m-%d %H:%M:%S}] {summary}")
+
+            if options['once']:
+                break
+            # Lote lleno: probablemente quedan más, seguir sin esperar
+            if sum(results.values()) < options['batch_size']:
+                time.sleep(options['interval'])
+
+    def _stop(self, signum, frame):
+        """Termina tras el lote en curso al recibir SIGTERM/SIGINT"""
+        self._stopping = True
+
+    def _start_metrics_server(self, port):
+        """
+        Expone /metrics del worker en un hilo aparte
+
+        El worker corre en su propio contenedor, así que no comparte los
+        ficheros de métricas con gunicorn: Prometheus lo consulta por separado.
+        """
+        if not metrics_available():
+            self.stderr.write('prometheus_client no está instalado: métricas desactivadas')
+            return
+        from prometheus_client import start_http_server
+        start_http_server(port)
+        self.stdout.write(f"Métricas Prometheus en el puerto {port}")
@@ -0,0 +1,59 @@
+"""
+Comando para reconstruir y verificar los agregados mensuales de gastos
+
+También recalcula los datos de actividad de cada usuario (fecha del último
+gasto y alertas activadas), para datos cargados sin señales.
+
+Uso:
+    python manage.py rebuild_spend_rollups               # reconstruir todo y verificar
+    python manage.py rebuild_spend_rollups --verify-only # solo comprobar diferencias
+    python manage.py rebuild_spend_rollups --user-id 3   # limitar a ciertos usuarios
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.expenses.utils.util_cache import rebuild_user_activity
+from apps.expenses.utils.util_rollups import rebuild_rollups, verify_rollups
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye MonthlyUserSpend, MonthlyUserCategorySpend y UserActivity desde los gastos y verifica los agregados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Limitar a este usuario (se puede repetir)'
+        )
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='No reconstruir, solo comparar los agregados con los gastos'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Tamaño de lote para las inserciones (por defecto 1000)'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+
+        if not options['verify_only']:
+            monthly, by_category = rebuild_rollups(user_ids, batch_size=options['batch_size'])
+            activities = rebuild_user_activity(user_ids)
+            self.stdout.write(
+                f"Reconstruidos {monthly} agregados mensuales, {by_category} por categoría "
+                f"y {activities} registros de actividad"
+            )
+
+        mismatches = verify_rollups(user_ids)
+        if mismatches:
+            for key, expected, stored in mismatches[:20]:
+                self.stderr.write(f"  {key}: esperado={expected} guardado={stored}")
+            raise CommandError(f"{len(mismatches)} agregados no coinciden con los gastos")
+
+        self.stdout.write(self.style.SUCCESS('Agregados verificados: coinciden con los gastos'))
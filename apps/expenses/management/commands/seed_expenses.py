@@ -0,0 +1,253 @@
+"""
+Comando para generar datos sintéticos a escala de producción
+
+Crea N usuarios con presupuesto y gastos repartidos según distribuciones
+configurables, usando bulk_create. Pensado para pruebas de carga
+(scripts/loadtest.py) y para medir consultas con volúmenes realistas.
+
+Uso:
+    python manage.py seed_expenses --users 1000 --expenses-per-user 800
+    python manage.py seed_expenses --users 50 --distribution pareto --days 1095
+    python manage.py seed_expenses --delete            # borrar los usuarios generados
+
+Los usuarios se llaman <prefijo>-00001, <prefijo>-00002... y comparten la
+contraseña indicada con --password.
+"""
+
+import math
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.expenses.models import Budget, Category, Expense
+from apps.expenses.utils.util_cache import rebuild_user_activity
+from apps.expenses.utils.util_rollups import rebuild_rollups
+
+# Categorías que se crean si la base de datos no tiene ninguna
+DEFAULT_CATEGORIES = [
+    ('Café', '#8B4513'),
+    ('Comida', '#FF6B6B'),
+    ('Delivery', '#F59E0B'),
+    ('Transporte', '#3B82F6'),
+    ('Snacks', '#10B981'),
+    ('Suscripciones', '#8B5CF6'),
+    ('Ocio', '#EC4899'),
+    ('Otros', '#6B7280'),
+]
+
+DISTRIBUTIONS = ('constant', 'uniform', 'lognormal', 'pareto')
+
+LOCATIONS = ['Centro', 'Oficina', 'Casa', 'Estación', 'Centro comercial', None, None, None]
+
+
+def expense_counts(distribution, mean, users, rng):
+    """
+    Número de gastos de cada usuario según la distribución elegida
+
+    - constant: todos los usuarios tienen mean gastos
+    - uniform: entre 0 y 2 * mean
+    - lognormal: la mayoría cerca de la media con algunos usuarios muy activos
+    - pareto: cola larga, pocos usuarios concentran muchos gastos
+
+    Args:
+        distribution: Una de DISTRIBUTIONS
+        mean: Media de gastos por usuario
+        users: Número de usuarios
+        rng: random.Random
+
+    Returns:
+        list: Gastos por usuario
+    """
+    if distribution == 'constant':
+        return [mean] * users
+    if distribution == 'uniform':
+        return [rng.randint(0, 2 * mean) for _ in range(users)]
+    if distribution == 'lognormal':
+        sigma = 1.0
+        mu = math.log(max(mean, 1)) - sigma ** 2 / 2
+        return [int(rng.lognormvariate(mu, sigma)) for _ in range(users)]
+    # Pareto con alpha 1.5: media = alpha / (alpha - 1) * xm
+    alpha = 1.5
+    xm = mean * (alpha - 1) / alpha
+    return [int(xm * rng.paretovariate(alpha)) for _ in range(users)]
+
+
+class Command(BaseCommand):
+    help = 'Genera usuarios, presupuestos y gastos sintéticos con bulk_create para pruebas de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100,
+            help='Usuarios a crear (por defecto 100)'
+        )
+        parser.add_argument(
+            '--expenses-per-user',
+            type=int,
+            default=500,
+            help='Media de gastos por usuario (por defecto 500)'
+        )
+        parser.add_argument(
+            '--distribution',
+            choices=DISTRIBUTIONS,
+            default='lognormal',
+            help='Reparto de gastos entre usuarios (por defecto lognormal)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=730,
+            help='Días hacia atrás en los que se reparten los gastos (por defecto 730)'
+        )
+        parser.add_argument(
+            '--categories',
+            help='Nombres de categorías separados por comas (por defecto todas las existentes)'
+        )
+        parser.add_argument(
+            '--budget-ratio',
+            type=float,
+            default=0.8,
+            help='Fracción de usuarios con presupuesto y alertas activadas (por defecto 0.8)'
+        )
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help="Prefijo de los nombres de usuario (por defecto 'seed')"
+        )
+        parser.add_argument(
+            '--password',
+            default='seed-pass-123',
+            help='Contraseña de todos los usuarios generados'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Semilla aleatoria para generar siempre los mismos datos'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Gastos por bulk_create (por defecto 5000)'
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Borra los usuarios con el prefijo indicado y termina'
+        )
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+
+        if options['delete']:
+            users = User.objects.filter(username__startswith=f'{prefix}-')
+            user_ids = list(users.values_list('id', flat=True))
+            # Borrar los gastos con SQL directo: el borrado por ORM lanzaría
+            # las señales de agregados por cada gasto
+            Expense.objects.filter(user_id__in=user_ids)._raw_delete(Expense.objects.db)
+            users.delete()
+            self.stdout.write(self.style.SUCCESS(f"{len(user_ids)} usuarios '{prefix}-*' borrados"))
+            return
+
+        rng = random.Random(options['seed'])
+        categories = self._get_categories(options['categories'])
+        # Pesos tipo Zipf: unas pocas categorías concentran la mayoría de gastos
+        weights = [1 / (rank + 1) for rank in range(len(categories))]
+        rng.shuffle(weights)
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = self._create_users(prefix, options['users'], options['password'])
+            self._create_budgets(users, options['budget_ratio'], rng)
+
+            counts = expense_counts(
+                options['distribution'], options['expenses_per_user'], len(users), rng
+            )
+            created = self._create_expenses(
+                users, counts, categories, weights, options['days'], options['batch_size'], rng
+            )
+            rebuild_rollups([user.id for user in users], batch_size=options['batch_size'])
+            rebuild_user_activity([user.id for user in users])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(users)} usuarios y {created} gastos creados en {elapsed:.1f}s "
+            f"(máx. {max(counts, default=0)} gastos por usuario)"
+        ))
+
+    def _get_categories(self, names):
+        """Categorías a usar: las indicadas, las existentes o las de DEFAULT_CATEGORIES"""
+        if names:
+            names = [name.strip() for name in names.split(',') if name.strip()]
+            categories = list(Category.objects.filter(name__in=names))
+            missing = set(names) - {category.name for category in categories}
+            if missing:
+                raise CommandError(f"Categorías inexistentes: {', '.join(sorted(missing))}")
+            return categories
+
+        categories = list(Category.objects.order_by('id'))
+        if not categories:
+            categories = Category.objects.bulk_create(
+                [Category(name=name, color=color) for name, color in DEFAULT_CATEGORIES]
+            )
+            categories = list(Category.objects.order_by('id'))
+        return categories
+
+    def _create_users(self, prefix, count, password):
+        """Crea los usuarios numerados a continuación de los que ya existan"""
+        existing = User.objects.filter(username__startswith=f'{prefix}-').count()
+        # Hashear la contraseña una sola vez: con PBKDF2 es lo más lento de crear usuarios
+        password_hash = make_password(password)
+        usernames = [f'{prefix}-{existing + i + 1:05d}' for i in range(count)]
+        User.objects.bulk_create([
+            User(username=username, email=f'{username}@example.com', password=password_hash)
+            for username in usernames
+        ])
+        return list(User.objects.filter(username__in=usernames).order_by('id'))
+
+    def _create_budgets(self, users, ratio, rng):
+        """Presupuestos de 100 a 600 € para una fracción de los usuarios"""
+        Budget.objects.bulk_create([
+            Budget(
+                user=user,
+                monthly_limit=Decimal(rng.randrange(100, 601, 50)),
+                email_alerts_enabled=True
+            )
+            for user in users
+            if rng.random() < ratio
+        ])
+
+    def _create_expenses(self, users, counts, categories, weights, days, batch_size, rng):
+        """
+        Inserta los gastos en lotes de batch_size
+
+        Los importes siguen una lognormal centrada en unos 4 € (gastos
+        hormiga) y las fechas son más densas en los meses recientes.
+        """
+        today = date.today()
+        created = 0
+        batch = []
+        for user, count in zip(users, counts):
+            for category in rng.choices(categories, weights=weights, k=count):
+                amount = min(rng.lognormvariate(1.4, 0.7), 500)
+                batch.append(Expense(
+                    user_id=user.id,
+                    category_id=category.id,
+                    amount=Decimal(f'{amount + 0.5:.2f}'),
+                    description=f'{category.name} {rng.randint(1, 9999)}',
+                    date=today - timedelta(days=int(days * rng.random() ** 1.5)),
+                    location=rng.choice(LOCATIONS)
+                ))
+                if len(batch) >= batch_size:
+                    Expense.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+        Expense.objects.bulk_create(batch)
+        return created + len(batch)
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    """Calcula los agregados mensuales de los gastos ya existentes"""
+    Expense = apps.get_model('expenses', 'Expense')
+    MonthlyUserSpend = apps.get_model('expenses', 'MonthlyUserSpend')
+    MonthlyUserCategorySpend = apps.get_model('expenses', 'MonthlyUserCategorySpend')
+
+    rows = Expense.objects.annotate(month=TruncMonth('date')).values(
+        'user_id', 'month', 'category_id'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+
+    monthly = {}
+    category_rows = []
+    for row in rows.iterator():
+        key = (row['user_id'], row['month'])
+        total, count = monthly.get(key, (0, 0))
+        monthly[key] = (total + row['total'], count + row['count'])
+        category_rows.append(MonthlyUserCategorySpend(
+            user_id=row['user_id'], month=row['month'], category_id=row['category_id'],
+            total=row['total'], count=row['count']
+        ))
+
+    MonthlyUserSpend.objects.bulk_create([
+        MonthlyUserSpend(user_id=user_id, month=month, total=total, count=count)
+        for (user_id, month), (total, count) in monthly.items()
+    ], batch_size=1000)
+    MonthlyUserCategorySpend.objects.bulk_create(category_rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_expense_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyUserCategorySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mes')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Número de gastos')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_spends', to='expenses.category', verbose_name='Categoría')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_category_spends', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Gasto mensual por categoría',
+                'verbose_name_plural': 'Gastos mensuales por categoría',
+                'ordering': ['-month', '-total'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'category'), name='monthly_user_category_spend_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyUserSpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mes')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Número de gastos')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_spends', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Gasto mensual',
+                'verbose_name_plural': 'Gastos mensuales',
+                'ordering': ['-month'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='monthly_user_spend_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_user_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('webhook', models.CharField(max_length=100, verbose_name='Webhook')),
+                ('payload', models.JSONField(verbose_name='Datos')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('sent', 'Enviado'), ('dead', 'Descartado')], default='pending', max_length=10, verbose_name='Estado')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próximo intento')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Enviado el')),
+            ],
+            options={
+                'verbose_name': 'Webhook pendiente',
+                'verbose_name_plural': 'Webhooks pendientes',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='webhook_outbox_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_webhook_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetAlertState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mes')),
+                ('level', models.CharField(choices=[('warning', 'Alerta'), ('critical', 'Crítico'), ('exceeded', 'Excedido')], max_length=10, verbose_name='Umbral')),
+                ('triggered', models.BooleanField(default=False, verbose_name='Disparada')),
+                ('triggered_at', models.DateTimeField(blank=True, null=True, verbose_name='Disparada el')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_alert_states', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Estado de alerta de presupuesto',
+                'verbose_name_plural': 'Estados de alertas de presupuesto',
+                'ordering': ['-month', 'level'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'level'), name='budget_alert_state_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+
+def backfill_activity(apps, schema_editor):
+    """Crea los registros de actividad que falten y rellena los campos nuevos"""
+    Budget = apps.get_model('expenses', 'Budget')
+    Expense = apps.get_model('expenses', 'Expense')
+    UserActivity = apps.get_model('expenses', 'UserActivity')
+
+    existing = set(UserActivity.objects.values_list('user_id', flat=True))
+    user_ids = set(Expense.objects.values_list('user_id', flat=True).distinct())
+    user_ids |= set(Budget.objects.values_list('user_id', flat=True))
+    UserActivity.objects.bulk_create(
+        [UserActivity(user_id=user_id) for user_id in user_ids - existing], batch_size=1000
+    )
+
+    UserActivity.objects.update(
+        last_expense_date=Subquery(
+            Expense.objects.filter(user_id=OuterRef('user_id')).order_by('-date').values('date')[:1]
+        ),
+        email_alerts_enabled=Exists(
+            Budget.objects.filter(user_id=OuterRef('user_id'), email_alerts_enabled=True)
+        ),
+        updated_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_budget_alert_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useractivity',
+            name='email_alerts_enabled',
+            field=models.BooleanField(default=False, verbose_name='Alertas por email activadas'),
+        ),
+        migrations.AddField(
+            model_name='useractivity',
+            name='last_expense_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Fecha del último gasto'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(condition=models.Q(('email_alerts_enabled', True)), fields=['last_expense_date'], name='activity_alerts_recent_idx'),
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0009_user_activity_last_expense'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mes')),
+                ('payload', models.BinaryField(verbose_name='Reporte (gzip)')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='Tamaño sin comprimir')),
+                ('stale', models.BooleanField(default=False, verbose_name='Desactualizado')),
+                ('built_at', models.DateTimeField(verbose_name='Generado el')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_snapshots', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Reporte mensual',
+                'verbose_name_plural': 'Reportes mensuales',
+                'ordering': ['-month'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='report_snapshot_unique')],
+            },
+        ),
+    ]
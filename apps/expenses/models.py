@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -70,6 +71,19 @@ class Expense(models.Model):
         verbose_name = "Gasto"
         verbose_name_plural = "Gastos"
         ordering = ['-date', '-created_at']  # Más recientes primero
+        indexes = [
+            # Listados por usuario: orden del listado (EXPENSE_LIST_ORDERING), id incluido como desempate
+            models.Index(
+                fields=['user', '-date', '-created_at', '-id'],
+                name='expense_user_date_created_idx'
+            ),
+            # Sumas por rango de fechas: INCLUDE permite index-only scans en PostgreSQL
+            models.Index(
+                fields=['user', 'date'],
+                include=['amount', 'category'],
+                name='expense_user_date_cover_idx'
+            ),
+        ]
 
     def clean(self):
         """Validaciones personalizadas del modelo"""
@@ -177,3 +191,259 @@ class Budget(models.Model):
     
     def __str__(self):
         return f"Presupuesto de {self.user.username}: €{self.monthly_limit}/mes"
+
+
+class MonthlyUserSpend(models.Model):
+    """Total mensual de gastos por usuario (tabla de agregados)"""
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Usuario",
+        related_name="monthly_spends"
+    )
+    
+    # Primer día del mes al que corresponde el agregado
+    month = models.DateField(verbose_name="Mes")
+    
+    total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name="Total"
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name="Número de gastos")
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Actualizado el")
+    
+    class Meta:
+        verbose_name = "Gasto mensual"
+        verbose_name_plural = "Gastos mensuales"
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='monthly_user_spend_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m}: €{self.total}"
+
+
+class MonthlyUserCategorySpend(models.Model):
+    """Total mensual de gastos por usuario y categoría (tabla de agregados)"""
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Usuario",
+        related_name="monthly_category_spends"
+    )
+    
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        verbose_name="Categoría",
+        related_name="monthly_spends"
+    )
+    
+    # Primer día del mes al que corresponde el agregado
+    month = models.DateField(verbose_name="Mes")
+    
+    total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name="Total"
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name="Número de gastos")
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Actualizado el")
+    
+    class Meta:
+        verbose_name = "Gasto mensual por categoría"
+        verbose_name_plural = "Gastos mensuales por categoría"
+        ordering = ['-month', '-total']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month', 'category'],
+                name='monthly_user_category_spend_unique'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.category_id}: €{self.total}"
+
+
+class UserActivity(models.Model):
+    """
+    Estado de actividad por usuario: versión de sus datos para invalidar
+    cachés y datos desnormalizados para listar usuarios activos sin
+    recorrer sus gastos
+    """
+    
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Usuario",
+        related_name="activity"
+    )
+    
+    # Se incrementa en cada cambio de gastos o presupuesto del usuario
+    data_version = models.PositiveBigIntegerField(default=0, verbose_name="Versión de datos")
+    
+    # Fecha del gasto más reciente (se mantiene al crear, editar o borrar gastos)
+    last_expense_date = models.DateField(null=True, blank=True, verbose_name="Fecha del último gasto")
+    
+    # Copia de Budget.email_alerts_enabled (False si no hay presupuesto)
+    email_alerts_enabled = models.BooleanField(default=False, verbose_name="Alertas por email activadas")
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Actualizado el")
+    
+    class Meta:
+        verbose_name = "Actividad de usuario"
+        verbose_name_plural = "Actividad de usuarios"
+        indexes = [
+            # Usuarios activos: alertas activadas y gastos recientes
+            models.Index(
+                fields=['last_expense_date'],
+                condition=models.Q(email_alerts_enabled=True),
+                name='activity_alerts_recent_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Actividad de {self.user_id}: v{self.data_version}"
+
+
+class WebhookOutbox(models.Model):
+    """
+    Webhook pendiente de enviar a n8n (patrón outbox transaccional)
+    
+    Se guarda en la misma transacción que el cambio que lo origina y lo envía
+    el comando process_webhook_outbox, así la petición del usuario nunca
+    espera a n8n y un webhook no se pierde si n8n no responde.
+    """
+    
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_SENT, 'Enviado'),
+        (STATUS_DEAD, 'Descartado'),
+    ]
+    
+    # Ruta del webhook en n8n (se añade a N8N_INTERNAL_URL/webhook/)
+    webhook = models.CharField(max_length=100, verbose_name="Webhook")
+    payload = models.JSONField(verbose_name="Datos")
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="Estado"
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Intentos")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Próximo intento")
+    last_error = models.TextField(blank=True, verbose_name="Último error")
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Creado el")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Enviado el")
+    
+    class Meta:
+        verbose_name = "Webhook pendiente"
+        verbose_name_plural = "Webhooks pendientes"
+        ordering = ['-created_at']
+        indexes = [
+            # Cola del worker: pendientes cuyo próximo intento ya ha llegado
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.webhook} #{self.pk} ({self.get_status_display()})"
+
+
+class BudgetAlertState(models.Model):
+    """
+    Estado de cada umbral de alerta del presupuesto por usuario y mes
+    
+    Un umbral se dispara una sola vez al cruzarlo. Si después el gasto del
+    mes vuelve a quedar por debajo (edición o borrado) se rearma y puede
+    dispararse de nuevo.
+    """
+    
+    LEVEL_WARNING = 'warning'
+    LEVEL_CRITICAL = 'critical'
+    LEVEL_EXCEEDED = 'exceeded'
+    LEVEL_CHOICES = [
+        (LEVEL_WARNING, 'Alerta'),
+        (LEVEL_CRITICAL, 'Crítico'),
+        (LEVEL_EXCEEDED, 'Excedido'),
+    ]
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Usuario",
+        related_name="budget_alert_states"
+    )
+    
+    # Primer día del mes al que corresponde el estado
+    month = models.DateField(verbose_name="Mes")
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES, verbose_name="Umbral")
+    
+    triggered = models.BooleanField(default=False, verbose_name="Disparada")
+    triggered_at = models.DateTimeField(null=True, blank=True, verbose_name="Disparada el")
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Actualizado el")
+    
+    class Meta:
+        verbose_name = "Estado de alerta de presupuesto"
+        verbose_name_plural = "Estados de alertas de presupuesto"
+        ordering = ['-month', 'level']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'level'], name='budget_alert_state_unique'),
+        ]
+    
+    def __str__(self):
+        state = 'disparada' if self.triggered else 'armada'
+        return f"{self.user_id} {self.month:%Y-%m} {self.level}: {state}"
+
+
+class ReportSnapshot(models.Model):
+    """
+    Reporte mensual precalculado de un usuario (respuesta de /api/users/{id}/complete/)
+    
+    Lo genera build_monthly_reports al cerrar el mes y la API sirve sus
+    bytes comprimidos sin volver a serializar. Si un cambio tardío toca el
+    mes (gastos), o el presupuesto o las categorías del usuario, se marca
+    como desactualizado y se regenera en la siguiente petición o ejecución.
+    """
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Usuario",
+        related_name="report_snapshots"
+    )
+    
+    # Primer día del mes del reporte
+    month = models.DateField(verbose_name="Mes")
+    
+    # JSON de la respuesta comprimido con gzip
+    payload = models.BinaryField(verbose_name="Reporte (gzip)")
+    size = models.PositiveIntegerField(default=0, verbose_name="Tamaño sin comprimir")
+    
+    stale = models.BooleanField(default=False, verbose_name="Desactualizado")
+    built_at = models.DateTimeField(verbose_name="Generado el")
+    
+    class Meta:
+        verbose_name = "Reporte mensual"
+        verbose_name_plural = "Reportes mensuales"
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='report_snapshot_unique'),
+        ]
+    
+    def __str__(self):
+        state = ' (desactualizado)' if self.stale else ''
+        return f"{self.user_id} {self.month:%Y-%m}{state}"
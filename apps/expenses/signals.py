@@ -0,0 +1,160 @@
+"""
+Señales de la app expenses
+
+Mantienen las tablas de agregados mensuales sincronizadas con cada
+creación, edición o borrado de Expense, venga de las vistas, del admin
+o del ORM directamente, suben la versión de datos del usuario para
+invalidar sus entradas de caché (y mantienen la fecha de su último gasto
+y sus alertas activadas en UserActivity) y reevalúan las alertas de presupuesto
+de los meses afectados con el total ya actualizado de los agregados.
+
+Las ediciones del usuario (salvo las que solo guardan last_login) también
+suben su versión de datos: sus datos forman parte de las respuestas de la
+API que se validan con ETag.
+
+Las ediciones de Category descartan el registro de categorías del proceso
+(util_categories) y lo notifican al resto por el bus de invalidación.
+
+Los cambios que tocan un mes cerrado (gastos de ese mes, presupuesto,
+categorías o datos del usuario) marcan como desactualizados los reportes
+mensuales precalculados afectados (ReportSnapshot). Borrar el presupuesto
+borra los reportes del usuario.
+"""
+
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Category, Expense, Budget, ReportSnapshot
+from .utils.util_alerts import evaluate_budget_alerts
+from .utils.util_cache import bump_data_version
+from .utils.util_categories import categories
+from .utils.util_report_snapshots import mark_snapshots_stale
+from .utils.util_rollups import apply_expense_change, month_start
+
+ROLLUP_FIELDS = ('user_id', 'category_id', 'date', 'amount')
+
+
+def _snapshot(expense):
+    """Extrae los campos que afectan a los agregados, normalizando date y amount"""
+    snapshot = {field: getattr(expense, field) for field in ROLLUP_FIELDS}
+    for field in ('date', 'amount'):
+        snapshot[field] = Expense._meta.get_field(field).to_python(snapshot[field])
+    return snapshot
+
+
+def _evaluate_alerts(instance, snapshots):
+    """
+    Reevalúa las alertas de cada (usuario, mes) afectado por el cambio
+
+    El total del mes se lee de los agregados, que ya incluyen el delta
+    del cambio: no hay SUM sobre los gastos del mes.
+    """
+    seen = set()
+    for snapshot in snapshots:
+        if snapshot is None:
+            continue
+        key = (snapshot['user_id'], month_start(snapshot['date']))
+        if key in seen:
+            continue
+        seen.add(key)
+
+        if snapshot['user_id'] == instance.user_id:
+            user = instance.user
+        else:
+            user = User.objects.filter(pk=snapshot['user_id']).first()
+        if user is not None:
+            evaluate_budget_alerts(user, snapshot['date'])
+
+
+@receiver(pre_save, sender=Expense)
+def remember_previous_expense(sender, instance, raw=False, **kwargs):
+    """Guarda el estado anterior del gasto para calcular el delta al guardar"""
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_previous = Expense.objects.filter(pk=instance.pk).values(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Expense)
+def update_rollups_on_save(sender, instance, created, raw=False, **kwargs):
+    """Aplica el delta del gasto creado o editado a los agregados"""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_rollup_previous', None)
+    current = _snapshot(instance)
+    apply_expense_change(previous, current)
+    
+    if previous is None or (previous['user_id'] == instance.user_id and previous['date'] <= current['date']):
+        bump_data_version(instance.user_id, expense_date=current['date'])
+    else:
+        # El gasto se movió a una fecha anterior o a otro usuario: puede que
+        # ya no sea el último de su usuario anterior
+        bump_data_version(instance.user_id, refresh_expense_date=True)
+        if previous['user_id'] != instance.user_id:
+            bump_data_version(previous['user_id'], refresh_expense_date=True)
+    
+    if previous is None or any(previous[field] != current[field] for field in ROLLUP_FIELDS):
+        _evaluate_alerts(instance, [current, previous])
+    
+    # Cualquier campo del gasto aparece en el reporte de su mes
+    mark_snapshots_stale(instance.user_id, [current['date']])
+    if previous is not None and (previous['user_id'], month_start(previous['date'])) != (
+        instance.user_id, month_start(current['date'])
+    ):
+        mark_snapshots_stale(previous['user_id'], [previous['date']])
+
+
+@receiver(post_delete, sender=Expense)
+def update_rollups_on_delete(sender, instance, origin=None, **kwargs):
+    """Descuenta el gasto borrado de los agregados"""
+    snapshot = _snapshot(instance)
+    apply_expense_change(snapshot, None)
+    bump_data_version(instance.user_id, create=False, refresh_expense_date=True)
+    mark_snapshots_stale(instance.user_id, [snapshot['date']])
+    
+    # Solo al borrar gastos directamente: en el borrado en cascada de un
+    # usuario o una categoría no hay alertas que rearmar
+    if isinstance(origin, Expense) or (isinstance(origin, QuerySet) and origin.model is Expense):
+        _evaluate_alerts(instance, [snapshot])
+
+
+@receiver(post_save, sender=Budget)
+def invalidate_on_budget_save(sender, instance, raw=False, **kwargs):
+    """El presupuesto aparece en el dashboard: invalidar la caché del usuario"""
+    if raw:
+        return
+    bump_data_version(instance.user_id, alerts_enabled=instance.email_alerts_enabled)
+    mark_snapshots_stale(instance.user_id)
+    
+    # Cambiar el límite o los porcentajes puede cruzar o descruzar umbrales
+    evaluate_budget_alerts(instance.user, budget=instance)
+
+
+@receiver(post_delete, sender=Budget)
+def invalidate_on_budget_delete(sender, instance, **kwargs):
+    """Invalidar la caché del usuario al borrar su presupuesto"""
+    bump_data_version(instance.user_id, create=False, alerts_enabled=False)
+    # Sin presupuesto no hay reportes que servir ni regenerar
+    ReportSnapshot.objects.filter(user_id=instance.user_id).delete()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_registry(sender, **kwargs):
+    """Recargar el registro de categorías en la siguiente lectura, en todos los workers"""
+    categories.publish_change()
+    # Los reportes guardados llevan nombres, iconos y colores de categorías
+    mark_snapshots_stale()
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_user_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Los datos del usuario aparecen en sus respuestas cacheadas (ETags de la API)
+    y en sus reportes, salvo last_login, que se guarda en cada login
+    """
+    if raw or created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    bump_data_version(instance.pk)
+    mark_snapshots_stale(instance.pk)
@@ -0,0 +1,106 @@
+"""
+Tests para las alertas de presupuesto
+
+Cubre el disparo único por umbral, el rearme y el webhook encolado
+"""
+import pytest
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from apps.expenses.models import Category, Expense, Budget, BudgetAlertState, WebhookOutbox
+from apps.expenses.utils.util_alerts import evaluate_budget_alerts
+
+
+@pytest.mark.django_db
+class TestBudgetAlerts:
+    """Tests para la evaluación de umbrales del presupuesto"""
+
+    def setup_method(self):
+        """Configuración inicial para cada test"""
+        self.user = User.objects.create_user(username="testuser", email="test@example.com")
+        self.category = Category.objects.create(name="Café", color="#8B4513")
+        self.budget = Budget.objects.create(
+            user=self.user, monthly_limit=Decimal('100.00'), email_alerts_enabled=True
+        )
+
+    def _spend(self, amount):
+        """Crea un gasto hoy (las alertas se evalúan desde las señales)"""
+        return Expense.objects.create(
+            user=self.user, category=self.category, amount=Decimal(amount), date=date.today()
+        )
+
+    def _alert_types(self):
+        return [outbox.payload['alert_type'] for outbox in WebhookOutbox.objects.order_by('id')]
+
+    def test_critical_alert_fires_once_per_month(self):
+        """Test que seguir gastando sobre el 90% no repite el webhook"""
+        self._spend('91.00')
+        self._spend('2.00')
+        self._spend('3.00')
+
+        assert self._alert_types() == ['budget_90_percent']
+
+    def test_warning_sends_its_own_webhook(self):
+        """Test que el porcentaje de alerta del presupuesto envía su webhook una vez"""
+        self._spend('80.00')
+        self._spend('1.00')
+
+        assert self._alert_types() == ['budget_warning']
+        state = BudgetAlertState.objects.get(user=self.user, level=BudgetAlertState.LEVEL_WARNING)
+        assert state.triggered
+        assert WebhookOutbox.objects.get().payload['message'] == 'Has alcanzado el 80.0% de tu presupuesto mensual'
+
+    def test_exceeded_is_a_separate_threshold(self):
+        """Test que superar el 100% envía su propio webhook, y solo el más alto si se cruzan varios"""
+        self._spend('95.00')
+        self._spend('10.00')
+        assert self._alert_types() == ['budget_90_percent', 'budget_exceeded']
+
+        other = User.objects.create_user(username="other")
+        Expense.objects.create(user=other, category=self.category, amount=Decimal('50.00'), date=date.today())
+        Budget.objects.create(user=other, monthly_limit=Decimal('10.00'), email_alerts_enabled=True)
+        assert WebhookOutbox.objects.filter(payload__user_id=other.id).count() == 1
+        assert evaluate_budget_alerts(other) is None
+
+    def test_dropping_below_rearms_alert(self):
+        """Test que borrar un gasto y volver por debajo del umbral rearma la alerta"""
+        expense = self._spend('95.00')
+        expense.delete()
+
+        state = BudgetAlertState.objects.get(user=self.user, level=BudgetAlertState.LEVEL_CRITICAL)
+        assert not state.triggered
+
+        self._spend('92.00')
+        assert self._alert_types() == ['budget_90_percent', 'budget_90_percent']
+
+    def test_edit_reevaluates_with_delta(self):
+        """Test que editar importe o fecha reevalúa sin sumar los gastos del mes"""
+        expense = self._spend('50.00')
+
+        expense.amount = Decimal('95.00')
+        with CaptureQueriesContext(connection) as queries:
+            expense.save()
+        assert self._alert_types() == ['budget_90_percent']
+        assert not any('SUM(' in query['sql'].upper() for query in queries.captured_queries)
+
+        # Mover el gasto a otro mes deja el actual por debajo: se rearma
+        expense.date = date.today().replace(day=1) - timedelta(days=1)
+        expense.save()
+        state = BudgetAlertState.objects.get(
+            user=self.user, month=date.today().replace(day=1), level=BudgetAlertState.LEVEL_CRITICAL
+        )
+        assert not state.triggered
+        # El mes pasado cruza el umbral, pero no se avisa de meses anteriores
+        assert self._alert_types() == ['budget_90_percent']
+
+    def test_alerts_disabled(self):
+        """Test que sin alertas por email no se evalúa nada"""
+        self.budget.email_alerts_enabled = False
+        self.budget.save()
+
+        self._spend('150.00')
+
+        assert not BudgetAlertState.objects.exists()
+        assert not WebhookOutbox.objects.exists()
@@ -0,0 +1,439 @@
+"""
+Tests para la API REST usada por n8n
+
+Cubre la autenticación Bearer y los endpoints de reportes
+"""
+import gzip
+import json
+import pytest
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User
+from apps.expenses.api.serializers import ExpenseSerializer
+from apps.expenses.management.commands.build_monthly_reports import Command as BuildMonthlyReportsCommand
+from apps.expenses.utils.util_cache import rebuild_user_activity
+from apps.expenses.utils.util_categories import categories
+from apps.expenses.utils.util_report_snapshots import build_snapshots, last_closed_month
+from apps.expenses.models import Category, Expense, Budget, ReportSnapshot, UserActivity
+
+
+@pytest.mark.django_db
+class TestUserExpensesExportView:
+    """Tests para la exportación de gastos en streaming"""
+
+    def setup_method(self):
+        """Configuración inicial para cada test"""
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {settings.N8N_API_TOKEN}')
+        self.user = User.objects.create_user(username="testuser")
+        Budget.objects.create(user=self.user, monthly_limit=Decimal('500.00'))
+        self.category = Category.objects.create(name="Café", color="#8B4513")
+        self.url = reverse('expenses_api:user-expenses-export', kwargs={'id': self.user.id})
+
+    def test_export_requires_token(self):
+        """Test que la exportación requiere el token de la API"""
+        response = Client().get(self.url)
+        assert response.status_code in (401, 403)
+
+    def test_export_user_without_budget(self):
+        """Test que un usuario sin presupuesto devuelve 404"""
+        other = User.objects.create_user(username="other")
+        url = reverse('expenses_api:user-expenses-export', kwargs={'id': other.id})
+        assert self.client.get(url).status_code == 404
+
+    def test_export_streams_ndjson_like_serializer(self):
+        """Test que cada línea coincide con ExpenseSerializer, del más reciente al más antiguo"""
+        for i in range(5):
+            Expense.objects.create(
+                user=self.user, category=self.category,
+                amount=Decimal('1.25') * (i + 1), date=date.today() - timedelta(days=i),
+                description=f"Gasto {i}"
+            )
+
+        response = self.client.get(self.url)
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert response['Content-Type'].startswith('application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        expected = ExpenseSerializer(
+            Expense.objects.filter(user=self.user).select_related('category').order_by('-date'),
+            many=True
+        ).data
+        assert [json.loads(line) for line in lines] == json.loads(json.dumps(expected))
+
+
+@pytest.mark.django_db
+class TestUserCompleteView:
+    """Tests para el historial completo y sus parámetros de ventana"""
+
+    def setup_method(self):
+        """Configuración inicial para cada test"""
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {settings.N8N_API_TOKEN}')
+        self.user = User.objects.create_user(username="testuser")
+        Budget.objects.create(user=self.user, monthly_limit=Decimal('500.00'))
+        self.category = Category.objects.create(name="Café", color="#8B4513")
+        self.url = reverse('expenses_api:user-complete', kwargs={'id': self.user.id})
+        for day, amount in ((date(2025, 1, 10), '10.00'), (date(2025, 2, 5), '20.00'),
+                            (date(2025, 2, 20), '5.00'), (date(2025, 3, 1), '7.00')):
+            Expense.objects.create(user=self.user, category=self.category, amount=Decimal(amount), date=day)
+
+    def test_complete_without_params_returns_full_history(self):
+        """Test que sin parámetros se devuelve todo el historial"""
+        history = self.client.get(self.url).json()['complete_history']
+
+        assert len(history['all_expenses']) == 4
+        assert list(history['monthly_summaries']) == ['2025-03', '2025-02', '2025-01']
+        assert history['total_expenses'] == 42.0
+        assert history['categories_summary']['Café']['percentage'] == 100.0
+
+    def test_complete_date_range_keeps_lifetime_totals(self):
+        """Test que from/to limitan el detalle pero no los totales de toda la vida"""
+        response = self.client.get(self.url, {'from': '2025-02-10', 'to': '2025-03-31'})
+        history = response.json()['complete_history']
+
+        assert [e['date'] for e in history['all_expenses']] == ['2025-03-01', '2025-02-20']
+        # Febrero se corta el día 10: el resumen solo cuenta los días de la ventana
+        assert history['monthly_summaries']['2025-02']['total'] == 5.0
+        assert history['window']['total'] == 12.0
+        assert history['categories_summary']['Café']['count'] == 2
+        assert history['first_expense'] == '2025-01-10'
+        assert history['total_expenses'] == 42.0
+        assert history['total_expense_count'] == 4
+        assert response.json()['metadata']['data_complete'] is False
+
+    def test_complete_updated_since(self):
+        """Test que updated_since solo envía los gastos modificados"""
+        expense = Expense.objects.get(user=self.user, date=date(2025, 1, 10))
+        Expense.objects.exclude(pk=expense.pk).update(updated_at=timezone.now() - timedelta(days=10))
+
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        history = self.client.get(self.url, {'updated_since': since}).json()['complete_history']
+
+        assert [e['id'] for e in history['all_expenses']] == [expense.id]
+        assert len(history['monthly_summaries']) == 3
+
+    def test_complete_summaries_use_exact_decimals(self, django_assert_max_num_queries):
+        """Test que los resúmenes se suman sin errores de coma flotante y con pocas consultas"""
+        other = Category.objects.create(name="Transporte", color="#0000FF")
+        for amount in ('0.10', '0.20'):
+            Expense.objects.create(user=self.user, category=other, amount=Decimal(amount), date=date(2025, 4, 2))
+
+        # Registro de categorías ya cargado, como en un worker en marcha
+        categories.all()
+        # Sin empezar el día 1: un mes cerrado completo se serviría desde ReportSnapshot
+        with django_assert_max_num_queries(6):
+            history = self.client.get(self.url, {'from': '2025-04-02', 'to': '2025-04-30'}).json()['complete_history']
+
+        assert history['categories_summary'] == {'Transporte': {'total': 0.3, 'count': 2, 'percentage': 100.0}}
+        assert history['monthly_summaries']['2025-04']['total'] == 0.3
+
+    def test_complete_conditional_get(self, django_assert_max_num_queries):
+        """Test que el historial responde 304 mientras no cambien los datos del usuario"""
+        response = self.client.get(self.url, {'months': '3'})
+        etag = response['ETag']
+
+        # Solo la lectura de la versión de datos
+        with django_assert_max_num_queries(1):
+            response = self.client.get(self.url, {'months': '3'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        # Otros parámetros son otra respuesta
+        assert self.client.get(self.url, {'months': '6'}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        Expense.objects.create(user=self.user, category=self.category, amount=Decimal('1.00'), date=date.today())
+        assert self.client.get(self.url, {'months': '3'}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_complete_etag_changes_with_user_fields(self):
+        """Test que editar el usuario invalida el ETag, pero no guardar solo last_login"""
+        response = self.client.get(self.url, {'months': '3'})
+        etag = response['ETag']
+
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        assert self.client.get(self.url, {'months': '3'}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        self.user.email = 'nuevo@example.com'
+        self.user.save()
+        response = self.client.get(self.url, {'months': '3'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert response.json()['email'] == 'nuevo@example.com'
+
+    def test_complete_invalid_params(self):
+        """Test que los parámetros inválidos devuelven 400"""
+        assert self.client.get(self.url, {'from': '2025-13-01'}).status_code == 400
+        assert self.client.get(self.url, {'months': '0'}).status_code == 400
+        assert self.client.get(self.url, {'months': '1', 'from': '2025-01-01'}).status_code == 400
+        assert self.client.get(self.url, {'from': '2025-03-01', 'to': '2025-01-01'}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestActiveUsersView:
+    """Tests para el listado de usuarios activos desde UserActivity"""
+
+    def setup_method(self):
+        """Configuración inicial para cada test"""
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {settings.N8N_API_TOKEN}')
+        self.url = reverse('expenses_api:active-users')
+        self.category = Category.objects.create(name="Café", color="#8B4513")
+        self.user = User.objects.create_user(username="activo")
+        Budget.objects.create(user=self.user, monthly_limit=Decimal('500.00'), email_alerts_enabled=True)
+
+    def active_ids(self):
+        return [user['id'] for user in self.client.get(self.url).json()['users']]
+
+    def test_activity_follows_expense_and_budget_changes(self):
+        """Test que la fecha del último gasto y las alertas se mantienen en cada escritura"""
+        old = Expense.objects.create(
+            user=self.user, category=self.category, amount=Decimal('5.00'), date=date.today() - timedelta(days=60)
+        )
+        assert self.active_ids() == []
+
+        recent = Expense.objects.create(
+            user=self.user, category=self.category, amount=Decimal('5.00'), date=date.today()
+        )
+        assert UserActivity.objects.get(user=self.user).last_expense_date == date.today()
+        assert self.active_ids() == [self.user.id]
+
+        # Mover el gasto reciente al pasado o borrarlo recalcula la fecha
+        recent.date = date.today() - timedelta(days=90)
+        recent.save()
+        assert UserActivity.objects.get(user=self.user).last_expense_date == old.date
+        assert self.active_ids() == []
+
+        recent.date = date.today()
+        recent.save()
+        recent.delete()
+        assert UserActivity.objects.get(user=self.user).last_expense_date == old.date
+
+        # Desactivar las alertas o borrar el presupuesto saca al usuario del listado
+        Expense.objects.create(user=self.user, category=self.category, amount=Decimal('1.00'), date=date.today())
+        budget = Budget.objects.get(user=self.user)
+        budget.email_alerts_enabled = False
+        budget.save()
+        assert self.active_ids() == []
+        budget.email_alerts_enabled = True
+        budget.save()
+        assert self.active_ids() == [self.user.id]
+        budget.delete()
+        assert self.active_ids() == []
+
+    def test_active_users_single_query(self, django_assert_max_num_queries):
+        """Test que el listado hace una consulta sin importar cuántos gastos haya"""
+        for i in range(3):
+            user = User.objects.create_user(username=f"usuario{i}")
+            Budget.objects.create(user=user, monthly_limit=Decimal('100.00'), email_alerts_enabled=True)
+            for day in range(10):
+                Expense.objects.create(
+                    user=user, category=self.category, amount=Decimal('1.00'),
+                    date=date.today() - timedelta(days=day)
+                )
+
+        # Sello para el ETag + usuarios activos
+        with django_assert_max_num_queries(2):
+            response = self.client.get(self.url)
+        assert response.json()['total_active_users'] == 3
+
+    def test_active_users_conditional_get(self):
+        """Test que la lista de usuarios activos responde 304 hasta que cambia algún usuario"""
+        Expense.objects.create(user=self.user, category=self.category, amount=Decimal('1.00'), date=date.today())
+
+        response = self.client.get(self.url)
+        assert [user['id'] for user in response.json()['users']] == [self.user.id]
+        etag = response['ETag']
+        assert self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        Budget.objects.get(user=self.user).save()
+        assert self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        etag = self.client.get(self.url)['ETag']
+        self.user.first_name = 'Nuevo'
+        self.user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_rebuild_user_activity(self):
+        """Test que rebuild_user_activity rellena los datos de gastos cargados sin señales"""
+        Expense.objects.bulk_create([
+            Expense(user=self.user, category=self.category, amount=Decimal('2.00'), date=date.today())
+        ])
+        assert self.active_ids() == []
+
+        rebuild_user_activity([self.user.id])
+        assert self.active_ids() == [self.user.id]
+
+
+@pytest.mark.django_db
+class TestUserCompleteBatchView:
+    """Tests para el endpoint batch de reportes"""
+
+    def setup_method(self):
+        """Configuración inicial para cada test"""
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {settings.N8N_API_TOKEN}')
+        self.url = reverse('expenses_api:users-complete-batch')
+        self.category = Category.objects.create(name="Café", color="#8B4513")
+        self.users = []
+        for i in range(4):
+            user = User.objects.create_user(username=f"user{i}")
+            Budget.objects.create(user=user, monthly_limit=Decimal('500.00'), email_alerts_enabled=True)
+            for days_ago in range(i + 1):
+                Expense.objects.create(
+                    user=user, category=self.category, amount=Decimal('2.50'),
+                    date=date.today() - timedelta(days=days_ago)
+                )
+            self.users.append(user)
+
+    def _post(self, body, **params):
+        """Hace el POST y devuelve las líneas NDJSON decodificadas"""
+        url = self.url + ('?' + '&'.join(f'{k}={v}' for k, v in params.items()) if params else '')
+        response = self.client.post(url, body, content_type='application/json')
+        assert response.status_code == 200
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_batch_matches_single_user_endpoint(self):
+        """Test que cada línea coincide con /api/users/{id}/complete/"""
+        reports = self._post({'user_ids': [u.id for u in self.users]})
+
+        assert [r['id'] for r in reports] == [u.id for u in self.users]
+        for report, user in zip(reports, self.users):
+            single = self.client.get(reverse('expenses_api:user-complete', kwargs={'id': user.id})).json()
+            single.pop('metadata')
+            assert report == single
+
+    def test_batch_query_count_is_constant(self, django_assert_max_num_queries):
+        """Test que el número de consultas no crece con el número de usuarios"""
+        categories.all()
+        with django_assert_max_num_queries(7):
+            assert len(self._post({'user_ids': [self.users[0].id]})) == 1
+        with django_assert_max_num_queries(7):
+            assert len(self._post({'all_active': True})) == 4
+
+    def test_batch_invalid_body(self):
+        """Test que hay que indicar user_ids o all_active, pero no ambos"""
+        assert self.client.post(self.url, {}, content_type='application/json').status_code == 400
+        response = self.client.post(
+            self.url, {'user_ids': [1], 'all_active': True}, content_type='application/json'
+        )
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestReportSnapshots:
+    """Tests para los reportes mensuales precalculados"""
+
+    def setup_method(self):
+        """Configuración inicial para cada test"""
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {settings.N8N_API_TOKEN}')
+        self.user = User.objects.create_user(username="testuser")
+        Budget.objects.create(user=self.user, monthly_limit=Decimal('500.00'))
+        self.category = Category.objects.create(name="Café", color="#8B4513")
+        self.url = reverse('expenses_api:user-complete', kwargs={'id': self.user.id})
+        self.month = last_closed_month()
+        self.expense = Expense.objects.create(
+            user=self.user, category=self.category, amount=Decimal('12.50'), date=self.month + timedelta(days=3)
+        )
+
+    def _build(self):
+        """Genera los reportes como el comando mensual"""
+        build_snapshots(list(User.objects.filter(budget__isnull=False).select_related('budget')), self.month)
+
+    def test_missing_snapshot_falls_back_to_live(self):
+        """Test que sin reporte generado se calcula en vivo y no se escribe nada"""
+        response = self.client.get(self.url, {'months': '1'})
+
+        assert response.status_code == 200
+        assert not response.has_header('X-Report-Snapshot')
+        assert response.json()['complete_history']['window']['total'] == 12.5
+        assert not ReportSnapshot.objects.exists()
+
+    def test_last_month_served_from_snapshot(self):
+        """Test que months=1 se sirve desde el reporte guardado, comprimido si el cliente acepta gzip"""
+        self._build()
+        response = self.client.get(self.url, {'months': '1'}, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        assert response['X-Report-Snapshot'] == f"{self.month:%Y-%m}"
+        report = json.loads(gzip.decompress(response.content))
+
+        # Sin gzip se envía el mismo contenido descomprimido
+        plain = self.client.get(self.url, {'months': '1'})
+        assert not plain.has_header('Content-Encoding')
+        assert plain.json() == report
+        assert ReportSnapshot.objects.filter(user=self.user, month=self.month).count() == 1
+
+        # El contenido coincide con el cálculo en vivo del endpoint batch
+        batch = self.client.post(
+            reverse('expenses_api:users-complete-batch') + '?months=1',
+            {'user_ids': [self.user.id]}, content_type='application/json'
+        )
+        live = json.loads(b''.join(batch.streaming_content))
+        assert report.pop('metadata')['api_version'] == '1.0'
+        assert report == live
+        assert report['complete_history']['window']['total'] == 12.5
+
+    def test_late_edit_regenerates_snapshot(self):
+        """Test que un cambio en un mes cerrado marca el reporte como desactualizado"""
+        self._build()
+        response = self.client.get(self.url, {'months': '1'})
+        etag = response['ETag']
+        assert self.client.get(self.url, {'months': '1'}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        # Los gastos del mes en curso no tocan el reporte
+        Expense.objects.create(user=self.user, category=self.category, amount=Decimal('1.00'), date=date.today())
+        assert not ReportSnapshot.objects.get(user=self.user).stale
+
+        self.expense.amount = Decimal('20.00')
+        self.expense.save()
+        assert ReportSnapshot.objects.get(user=self.user).stale
+
+        # La primera petición lo regenera (en PostgreSQL, bloqueando la fila)
+        response = self.client.get(self.url, {'months': '1'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.has_header('X-Report-Snapshot')
+        assert response.json()['complete_history']['window']['total'] == 20.0
+        assert not ReportSnapshot.objects.get(user=self.user).stale
+
+    def test_build_monthly_reports_command(self):
+        """Test que el comando genera los reportes y --stale solo regenera los desactualizados"""
+        other = User.objects.create_user(username="other")
+        Budget.objects.create(user=other, monthly_limit=Decimal('100.00'))
+        out = StringIO()
+
+        call_command('build_monthly_reports', '--all-users', '--batch-size', '1', stdout=out)
+
+        assert "2 reportes generados" in out.getvalue()
+        assert set(ReportSnapshot.objects.values_list('user_id', 'month')) == {
+            (self.user.id, self.month), (other.id, self.month)
+        }
+
+        self.expense.delete()
+        call_command('build_monthly_reports', '--stale', stdout=out)
+        assert "1 reportes generados" in out.getvalue()
+        assert not ReportSnapshot.objects.filter(stale=True).exists()
+
+        with pytest.raises(CommandError):
+            call_command('build_monthly_reports', '--month', f"{date.today():%Y-%m}")
+
+    def test_loop_builds_missing_and_budget_delete_removes(self):
+        """Test que cada pasada de --loop genera solo los que faltan y borrar el presupuesto los elimina"""
+        budget = self.user.budget
+        budget.email_alerts_enabled = True
+        budget.save()
+        Expense.objects.create(user=self.user, category=self.category, amount=Decimal('3.00'), date=date.today())
+        command = BuildMonthlyReportsCommand()
+
+        assert command._build_missing(batch_size=10) == 1
+        assert command._build_missing(batch_size=10) == 0
+        assert ReportSnapshot.objects.filter(user=self.user, month=self.month).exists()
+
+        budget.delete()
+        assert not ReportSnapshot.objects.filter(user=self.user).exists()
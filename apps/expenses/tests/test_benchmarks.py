@@ -0,0 +1,162 @@
+"""
+Benchmarks de las funciones más usadas de utils y del serializer de la API
+
+Miden consultas SQL, tiempo (mejor de varias ejecuciones) y pico de
+memoria con datos pequeños, medianos y grandes, y los comparan con la
+línea base de benchmark_baseline.json. No se ejecutan con el resto de
+tests:
+
+    RUN_BENCHMARKS=1 pytest apps/expenses/tests/test_benchmarks.py
+    RUN_BENCHMARKS=1 BENCHMARK_SAVE=1 pytest apps/expenses/tests/test_benchmarks.py   # nueva línea base
+
+Los tiempos dependen de la máquina y de la base de datos: la línea base
+debe generarse en el mismo entorno en el que se compara. Los márgenes se
+ajustan con BENCHMARK_TIME_TOLERANCE y BENCHMARK_MEMORY_TOLERANCE.
+"""
+import os
+import pytest
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.http import QueryDict
+from django.test import override_settings
+from apps.expenses.api.serializers import UserCompleteSerializer
+from apps.expenses.models import Category, Expense
+from apps.expenses.utils.util_benchmark import (
+    compare_with_baseline,
+    create_benchmark_user,
+    load_baseline,
+    profile_call,
+    save_baseline
+)
+from apps.expenses.utils.util_categories import categories as category_registry
+from apps.expenses.utils.util_chart_data import prepare_chart_data
+from apps.expenses.utils.util_dashboard import calculate_dashboard_metrics, get_period_dates
+from apps.expenses.utils.util_expense_list import get_expense_list_context
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get('RUN_BENCHMARKS'),
+    reason='Benchmarks desactivados (usar RUN_BENCHMARKS=1)'
+)
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+
+# Gastos por usuario en cada tamaño
+SIZES = {'small': 50, 'medium': 2000, 'large': 20000}
+
+CATEGORY_NAMES = ['Café', 'Comida', 'Delivery', 'Transporte', 'Snacks', 'Ocio']
+
+
+@pytest.fixture(scope='module')
+def benchmark_users(django_db_setup, django_db_blocker):
+    """Un usuario por tamaño, creado una vez para todo el módulo"""
+    with django_db_blocker.unblock():
+        categories = [
+            Category.objects.get_or_create(name=f'Benchmark {name}', defaults={'color': '#6B7280'})[0]
+            for name in CATEGORY_NAMES
+        ]
+        users = {size: create_benchmark_user(count, categories, days=365) for size, count in SIZES.items()}
+
+    yield users
+
+    with django_db_blocker.unblock():
+        user_ids = [user.id for user in users.values()]
+        # Borrado directo: el borrado por ORM lanzaría las señales por cada gasto
+        Expense.objects.filter(user_id__in=user_ids)._raw_delete(Expense.objects.db)
+        User.objects.filter(id__in=user_ids).delete()
+        Category.objects.filter(id__in=[category.id for category in categories]).delete()
+
+
+@pytest.fixture(scope='module')
+def benchmark_results():
+    """Resultados del módulo; con BENCHMARK_SAVE=1 se guardan como línea base al terminar"""
+    baseline = load_baseline(BASELINE_PATH)
+    results = {}
+
+    yield baseline, results
+
+    if os.environ.get('BENCHMARK_SAVE'):
+        save_baseline(BASELINE_PATH, {**baseline, **results})
+
+
+def run_benchmark(benchmark_results, name, func, rounds=5):
+    """Perfila func, guarda el resultado y falla si empeora respecto a la línea base"""
+    baseline, results = benchmark_results
+    # Registro de categorías ya cargado, como en un worker en marcha: ni su carga
+    # (una consulta por proceso) ni la comprobación del sello cada
+    # CATEGORY_REGISTRY_TTL segundos forman parte del coste por petición
+    category_registry.all()
+    with override_settings(CATEGORY_REGISTRY_TTL=3600):
+        result = profile_call(func, rounds)
+    results[name] = result
+
+    if os.environ.get('BENCHMARK_SAVE'):
+        return
+    regressions = compare_with_baseline(
+        name,
+        result,
+        baseline,
+        time_tolerance=float(os.environ.get('BENCHMARK_TIME_TOLERANCE', 1.5)),
+        memory_tolerance=float(os.environ.get('BENCHMARK_MEMORY_TOLERANCE', 1.25))
+    )
+    assert not regressions, '\n'.join(regressions)
+
+
+@pytest.mark.django_db
+class TestUtilsBenchmarks:
+    """Benchmarks de dashboard, gráficos, listado y serializer completo"""
+
+    def test_get_period_dates(self, benchmark_results):
+        """get_period_dates no depende del volumen de datos: un solo tamaño"""
+        periods = ['current_month', 'last_month', 'last_7_days', 'last_30_days', 'current_year']
+
+        run_benchmark(
+            benchmark_results,
+            'get_period_dates',
+            lambda: [get_period_dates(period) for period in periods],
+            rounds=20
+        )
+
+    @pytest.mark.parametrize('size', SIZES)
+    def test_calculate_dashboard_metrics(self, benchmark_users, benchmark_results, size):
+        user = benchmark_users[size]
+        start_date, end_date, _ = get_period_dates('current_year')
+
+        def dashboard():
+            metrics = calculate_dashboard_metrics(user, start_date, end_date, 'current_year')
+            # Evaluar también los gastos recientes (QuerySet perezoso)
+            return list(metrics['recent_expenses'])
+
+        run_benchmark(benchmark_results, f'calculate_dashboard_metrics[{size}]', dashboard)
+
+    @pytest.mark.parametrize('size', SIZES)
+    def test_prepare_chart_data(self, benchmark_users, benchmark_results, size):
+        start_date, end_date, _ = get_period_dates('current_year')
+        metrics = calculate_dashboard_metrics(benchmark_users[size], start_date, end_date, 'current_year')
+
+        run_benchmark(
+            benchmark_results,
+            f'prepare_chart_data[{size}]',
+            lambda: prepare_chart_data(metrics['categories_summary'], metrics['daily_totals']),
+            rounds=20
+        )
+
+    @pytest.mark.parametrize('size', SIZES)
+    def test_get_expense_list_context(self, benchmark_users, benchmark_results, size):
+        user = benchmark_users[size]
+
+        def expense_list():
+            context = get_expense_list_context(user, QueryDict('period=current_year'))
+            return list(context['expenses'])
+
+        run_benchmark(benchmark_results, f'get_expense_list_context[{size}]', expense_list)
+
+    @pytest.mark.parametrize('size', SIZES)
+    def test_user_complete_serializer(self, benchmark_users, benchmark_results, size):
+        user = User.objects.select_related('budget').get(id=benchmark_users[size].id)
+
+        run_benchmark(
+            benchmark_results,
+            f'user_complete_serializer[{size}]',
+            lambda: UserCompleteSerializer(user, context={'history_window': None}).data,
+            rounds=3
+        )
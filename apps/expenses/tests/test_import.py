@@ -0,0 +1,169 @@
+"""
+Tests para la importación masiva de gastos
+
+Cubre la lectura de CSV y OFX, la validación de filas, los agregados
+por lote y la vista de subida
+"""
+import io
+import pytest
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from django.urls import reverse
+from apps.expenses.models import Category, Expense, Budget, MonthlyUserSpend, WebhookOutbox
+from apps.expenses.utils.util_import import (
+    import_expenses,
+    iter_csv_rows,
+    iter_ofx_rows,
+    iter_import_rows,
+    parse_amount,
+    parse_date
+)
+from apps.expenses.utils.util_rollups import verify_rollups
+
+SPANISH_CSV = """Fecha;Concepto;Importe;Categoría
+03/01/2025;Café con leche;-1,80;café
+04/01/2025;Nómina;1.500,00;
+05/01/2025;Menú del día;-12,50;Comida
+"""
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250110120000<TRNAMT>-4.20<NAME>PANADERIA<MEMO>Pan y bollos</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250111<TRNAMT>100.00<NAME>BIZUM</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+class TestImportParsing:
+    """Tests para la lectura de importes, fechas y ficheros"""
+
+    def test_parse_amount_and_date_formats(self):
+        """Test que se aceptan los formatos habituales de los bancos"""
+        assert parse_amount('1.234,56') == Decimal('1234.56')
+        assert parse_amount('1,234.56') == Decimal('1234.56')
+        assert parse_amount('-8,90 €') == Decimal('-8.90')
+        assert parse_date('31/01/2025') == date(2025, 1, 31)
+        assert parse_date('2025-01-31') == date(2025, 1, 31)
+        assert parse_date('20250131093000[-5:EST]') == date(2025, 1, 31)
+
+    def test_csv_detects_delimiter_and_headers(self):
+        """Test que el CSV con ';' y cabeceras en español se traduce a columnas comunes"""
+        rows = list(iter_csv_rows(io.StringIO(SPANISH_CSV)))
+
+        assert rows[0] == (2, {'date': '03/01/2025', 'description': 'Café con leche', 'amount': '-1,80', 'category': 'café'})
+        assert [line for line, _ in rows] == [2, 3, 4]
+
+    def test_ofx_reads_transactions_across_chunks(self):
+        """Test que las transacciones OFX se leen aunque caigan entre dos bloques"""
+        rows = list(iter_ofx_rows(io.StringIO(OFX), chunk_size=16))
+
+        assert len(rows) == 2
+        assert rows[0][1]['TRNAMT'] == '-4.20'
+        assert rows[0][1]['MEMO'] == 'Pan y bollos'
+
+
+@pytest.mark.django_db
+class TestImportExpenses:
+    """Tests para la inserción por lotes"""
+
+    def setup_method(self):
+        """Configuración inicial para cada test"""
+        self.user = User.objects.create_user(username="testuser", email="test@example.com")
+        self.coffee = Category.objects.create(name="Café", color="#8B4513")
+        self.food = Category.objects.create(name="Comida", color="#FF0000")
+
+    def test_csv_import_updates_rollups(self):
+        """Test que los agregados mensuales quedan consistentes tras la importación"""
+        result = import_expenses(
+            self.user, iter_import_rows(io.StringIO(SPANISH_CSV), 'csv'), debits_only=True, batch_size=1
+        )
+
+        assert result == {'created': 2, 'skipped': 1, 'duplicates': 0, 'error_count': 0, 'errors': []}
+        assert Expense.objects.get(category=self.coffee).amount == Decimal('1.80')
+        assert MonthlyUserSpend.objects.get(user=self.user, month=date(2025, 1, 1)).total == Decimal('14.30')
+        assert verify_rollups() == []
+
+    def test_invalid_rows_are_reported(self):
+        """Test que las filas no válidas se omiten con su número de línea"""
+        csv_data = "fecha,importe,categoria\n2025-01-01,0,Café\n2025-02-30,3,Café\n2025-01-02,3,Viajes\n2025-01-03,3,Café\n"
+
+        result = import_expenses(self.user, iter_import_rows(io.StringIO(csv_data), 'csv'))
+
+        assert result['created'] == 1
+        assert [line for line, _ in result['errors']] == [2, 3, 4]
+
+    def test_sub_cent_amounts_are_rejected(self):
+        """Test que un importe con más de dos decimales se rechaza en lugar de redondearse"""
+        csv_data = "fecha,importe,categoria\n2025-01-01,0.125,Café\n2025-01-02,2.5,Café\n"
+
+        result = import_expenses(self.user, iter_import_rows(io.StringIO(csv_data), 'csv'))
+
+        assert result['created'] == 1
+        assert result['errors'] == [(2, "El importe tiene más de dos decimales: '0.125'")]
+        assert Expense.objects.get(user=self.user).amount == Decimal('2.50')
+
+    def test_non_finite_and_huge_amounts_are_row_errors(self):
+        """Test que NaN, Infinity, exponentes enormes o demasiados dígitos no abortan la importación"""
+        bad = ('NaN', 'sNaN', 'Infinity', '-Infinity', '1e30', '1' * 40)
+        rows = [(line, {'date': '2025-01-01', 'amount': amount, 'category': 'café'})
+                for line, amount in enumerate(bad, start=2)]
+        rows.append((len(bad) + 2, {'date': '2025-01-01', 'amount': '-3.10', 'category': 'café'}))
+
+        result = import_expenses(self.user, rows)
+
+        assert result['created'] == 1
+        assert [line for line, _ in result['errors']] == list(range(2, len(bad) + 2))
+        assert Expense.objects.get(user=self.user).amount == Decimal('3.10')
+
+    def test_reimport_skips_existing_movements(self):
+        """Test que volver a subir un extracto (o uno solapado) no duplica gastos"""
+        first = "fecha,concepto,importe,categoria\n2025-01-01,Café,1.50,Café\n2025-01-01,Café,1.50,Café\n"
+        # El segundo extracto repite los dos cafés y añade un tercero y otro gasto
+        second = first + "2025-01-01,Café,1.50,Café\n2025-01-02,Menú,9.00,Comida\n"
+
+        result = import_expenses(self.user, iter_import_rows(io.StringIO(first), 'csv'))
+        assert result['created'] == 2
+
+        result = import_expenses(self.user, iter_import_rows(io.StringIO(second), 'csv'), batch_size=1)
+        assert (result['created'], result['duplicates']) == (2, 2)
+        assert Expense.objects.filter(user=self.user).count() == 4
+        assert verify_rollups() == []
+
+        result = import_expenses(self.user, iter_import_rows(io.StringIO(second), 'csv'))
+        assert (result['created'], result['duplicates']) == (0, 4)
+
+    def test_alerts_evaluated_once_per_batch(self):
+        """Test que un lote que cruza el 90% encola un único webhook"""
+        Budget.objects.create(user=self.user, monthly_limit=Decimal('100.00'), email_alerts_enabled=True)
+        today = date.today().isoformat()
+        rows = [(line, {'date': today, 'amount': '30', 'category': 'café'}) for line in range(5)]
+
+        import_expenses(self.user, rows)
+
+        assert WebhookOutbox.objects.get().payload['alert_type'] == 'budget_exceeded'
+
+    def test_import_view_uploads_ofx(self):
+        """Test que la vista importa un OFX subido con la categoría por defecto"""
+        client = Client()
+        self.user.set_password('testpass123')
+        self.user.save()
+        client.login(username='testuser', password='testpass123')
+
+        upload = SimpleUploadedFile('extracto.ofx', OFX.encode('utf-8'))
+        response = client.post(reverse('expenses:import_expenses'), {
+            'file': upload,
+            'file_format': 'auto',
+            'default_category': self.food.id,
+            'debits_only': 'on',
+        })
+
+        assert response.status_code == 200
+        assert response.context['result']['created'] == 1
+        expense = Expense.objects.get(user=self.user)
+        assert expense.description == 'PANADERIA - Pan y bollos'
+        assert expense.category == self.food
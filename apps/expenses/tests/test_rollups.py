@@ -0,0 +1,88 @@
+"""
+Tests para los agregados mensuales de gastos
+
+Cubre el mantenimiento incremental, la reconstrucción y la verificación
+"""
+import pytest
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth.models import User
+from apps.expenses.models import Category, Expense, MonthlyUserSpend, MonthlyUserCategorySpend
+from apps.expenses.utils.util_rollups import (
+    get_month_total,
+    rebuild_rollups,
+    verify_rollups
+)
+
+
+@pytest.mark.django_db
+class TestRollupMaintenance:
+    """Tests para el mantenimiento incremental de los agregados"""
+
+    def setup_method(self):
+        """Configuración inicial para cada test"""
+        self.user = User.objects.create_user(username="testuser")
+        self.category = Category.objects.create(name="Café", color="#8B4513")
+        self.other_category = Category.objects.create(name="Transporte", color="#0000FF")
+
+    def test_create_updates_rollups(self):
+        """Test que crear gastos suma al total del mes"""
+        Expense.objects.create(
+            user=self.user, category=self.category, amount=Decimal('10.50'), date=date(2025, 3, 5)
+        )
+        Expense.objects.create(
+            user=self.user, category=self.category, amount=Decimal('4.50'), date=date(2025, 3, 20)
+        )
+
+        monthly = MonthlyUserSpend.objects.get(user=self.user, month=date(2025, 3, 1))
+        assert monthly.total == Decimal('15.00')
+        assert monthly.count == 2
+        assert get_month_total(self.user, date(2025, 3, 31)) == Decimal('15.00')
+
+    def test_update_moves_amount_between_months_and_categories(self):
+        """Test que editar un gasto mueve el importe de mes y categoría"""
+        expense = Expense.objects.create(
+            user=self.user, category=self.category, amount=Decimal('10.00'), date=date(2025, 3, 5)
+        )
+
+        expense.amount = Decimal('12.00')
+        expense.date = date(2025, 4, 2)
+        expense.category = self.other_category
+        expense.save()
+
+        assert get_month_total(self.user, date(2025, 3, 1)) == Decimal('0')
+        assert get_month_total(self.user, date(2025, 4, 1)) == Decimal('12.00')
+        by_category = MonthlyUserCategorySpend.objects.get(
+            user=self.user, month=date(2025, 4, 1), category=self.other_category
+        )
+        assert by_category.total == Decimal('12.00')
+        assert verify_rollups() == []
+
+    def test_delete_subtracts_from_rollups(self):
+        """Test que borrar un gasto lo descuenta del mes"""
+        expense = Expense.objects.create(
+            user=self.user, category=self.category, amount=Decimal('10.00'), date=date(2025, 3, 5)
+        )
+        Expense.objects.create(
+            user=self.user, category=self.category, amount=Decimal('5.00'), date=date(2025, 3, 6)
+        )
+
+        expense.delete()
+
+        monthly = MonthlyUserSpend.objects.get(user=self.user, month=date(2025, 3, 1))
+        assert monthly.total == Decimal('5.00')
+        assert monthly.count == 1
+
+    def test_rebuild_fixes_drift(self):
+        """Test que la reconstrucción corrige agregados desincronizados"""
+        Expense.objects.create(
+            user=self.user, category=self.category, amount=Decimal('10.00'), date=date(2025, 3, 5)
+        )
+        # Simular deriva: actualización masiva que no dispara señales
+        Expense.objects.filter(user=self.user).update(amount=Decimal('20.00'))
+        assert verify_rollups() != []
+
+        rebuild_rollups()
+
+        assert verify_rollups() == []
+        assert get_month_total(self.user, date(2025, 3, 1)) == Decimal('20.00')
@@ -0,0 +1,49 @@
+"""
+Tests para el comando seed_expenses
+
+Cubre la generación de usuarios y gastos sintéticos y su borrado
+"""
+import pytest
+import random
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from apps.expenses.management.commands.seed_expenses import expense_counts
+from apps.expenses.models import Budget, Category, Expense
+from apps.expenses.utils.util_rollups import verify_rollups
+
+
+class TestExpenseCounts:
+    """Tests para las distribuciones de gastos por usuario"""
+
+    @pytest.mark.parametrize('distribution', ['constant', 'uniform', 'lognormal', 'pareto'])
+    def test_mean_is_close_to_requested(self, distribution):
+        """Test que la media generada se aproxima a la pedida"""
+        counts = expense_counts(distribution, 200, 5000, random.Random(1))
+
+        assert len(counts) == 5000
+        assert min(counts) >= 0
+        assert 150 < sum(counts) / len(counts) < 250
+
+
+@pytest.mark.django_db
+class TestSeedExpensesCommand:
+    """Tests para el comando de datos sintéticos"""
+
+    def test_seed_and_delete(self):
+        """Test que crea usuarios con gastos y agregados consistentes, y los borra"""
+        call_command(
+            'seed_expenses', users=5, expenses_per_user=40, distribution='constant',
+            budget_ratio=1, seed=1, stdout=StringIO()
+        )
+
+        assert User.objects.filter(username__startswith='seed-').count() == 5
+        assert Budget.objects.count() == 5
+        assert Expense.objects.count() == 200
+        assert Category.objects.exists()
+        assert verify_rollups() == []
+        assert User.objects.get(username='seed-00001').check_password('seed-pass-123')
+
+        call_command('seed_expenses', delete=True, stdout=StringIO())
+        assert not User.objects.exists()
+        assert not Expense.objects.exists()
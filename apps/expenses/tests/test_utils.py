@@ -7,20 +7,28 @@ import pytest
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from django.contrib.auth.models import User
+from django.utils import timezone
 from apps.expenses.models import Category, Expense, Budget
 from apps.expenses.utils.util_dashboard import (
     get_period_dates, 
+    aggregate_period_expenses,
     calculate_dashboard_metrics,
     get_budget_info
 )
 from apps.expenses.utils.util_expense_list import (
     calculate_expense_statistics,
-    detect_active_filters
+    decode_cursor,
+    detect_active_filters,
+    paginate_expenses
 )
 from apps.expenses.utils.util_crud_operations import (
     get_expense_for_user,
     handle_expense_creation
 )
+from apps.expenses.utils.util_benchmark import compare_with_baseline
+from apps.expenses.utils.util_chart_data import prepare_chart_data
+from apps.expenses.utils.util_categories import attach_categories, categories
+from apps.expenses.utils.util_money import money, percentage, to_cents
 from apps.expenses.forms import ExpenseForm, ExpenseFilterForm
 
 
@@ -90,6 +98,27 @@ class TestDashboardUtils:
         assert 'recent_expenses' in metrics
         assert 'categories_summary' in metrics
 
+    @pytest.mark.django_db
+    def test_aggregate_period_expenses_folds_categories_and_days(self):
+        """Test que la consulta agrupada se pliega en categorías y serie diaria"""
+        user = User.objects.create_user(username="testuser")
+        coffee = Category.objects.create(name="Café", color="#8B4513")
+        transport = Category.objects.create(name="Transporte", color="#0000FF")
+        
+        today = date.today()
+        yesterday = today - timedelta(days=1)
+        Expense.objects.create(user=user, category=coffee, amount=Decimal('2.50'), date=yesterday)
+        Expense.objects.create(user=user, category=coffee, amount=Decimal('3.00'), date=today)
+        Expense.objects.create(user=user, category=transport, amount=Decimal('10.00'), date=today)
+        
+        result = aggregate_period_expenses(user, yesterday, today)
+        
+        assert result['total'] == Decimal('15.50')
+        assert result['count'] == 3
+        assert [c['category__name'] for c in result['categories_summary']] == ["Transporte", "Café"]
+        assert result['categories_summary'][1]['total'] == Decimal('5.50')
+        assert result['daily_totals'] == [(yesterday, Decimal('2.50')), (today, Decimal('13.00'))]
+
 
 class TestBudgetUtils:
     """Tests para utilidades de presupuesto"""
@@ -244,6 +273,43 @@ class TestExpenseListUtils:
         assert stats['total_filtered'] == Decimal('40.00')
         assert stats['count_filtered'] == 2
     
+    @pytest.mark.django_db
+    def test_paginate_expenses_keyset(self):
+        """Test paginación keyset con gastos empatados en fecha"""
+        user = User.objects.create_user(username="testuser")
+        category = Category.objects.create(name="Test", color="#FF0000")
+        for _ in range(5):
+            Expense.objects.create(
+                user=user, category=category, amount=Decimal('1.00'), date=date.today()
+            )
+        expenses = Expense.objects.filter(user=user)
+        
+        first, cursor = paginate_expenses(expenses, page_size=2)
+        second, cursor = paginate_expenses(expenses, cursor, page_size=2)
+        third, cursor = paginate_expenses(expenses, cursor, page_size=2)
+        
+        ids = [e.id for e in first + second + third]
+        assert len(ids) == 5
+        assert len(set(ids)) == 5
+        assert cursor is None
+    
+    def test_decode_cursor_invalid(self):
+        """Test que un cursor manipulado no se decodifica"""
+        assert decode_cursor('no-es-un-cursor') is None
+        assert decode_cursor('') is None
+    
+    @pytest.mark.django_db
+    def test_paginate_expenses_invalid_cursor(self):
+        """Test que un cursor manipulado devuelve una página vacía, no la primera"""
+        user = User.objects.create_user(username="testuser")
+        category = Category.objects.create(name="Test", color="#FF0000")
+        Expense.objects.create(user=user, category=category, amount=Decimal('1.00'), date=date.today())
+        
+        page, cursor = paginate_expenses(Expense.objects.filter(user=user), 'no-es-un-cursor')
+        
+        assert page == []
+        assert cursor is None
+    
     def test_detect_active_filters_empty_form(self):
         """Test detección con formulario vacío"""
         form = ExpenseFilterForm({})
@@ -330,6 +396,118 @@ class TestCrudOperations:
         assert form.errors  # Debe tener errores 
 
 
+
+class TestBenchmarkBaseline:
+    """Tests para la comparación de benchmarks con la línea base"""
+    
+    def test_compare_with_baseline(self):
+        """Test que detecta más consultas, tiempo o memoria que la referencia"""
+        baseline = {'f[small]': {'queries': 2, 'time_ms': 10.0, 'peak_mb': 1.0}}
+        
+        within = {'queries': 2, 'time_ms': 16.0, 'peak_mb': 1.2}
+        assert compare_with_baseline('f[small]', within, baseline) == []
+        
+        worse = {'queries': 3, 'time_ms': 30.0, 'peak_mb': 2.0}
+        assert len(compare_with_baseline('f[small]', worse, baseline)) == 3
+        
+        # Sin referencia no hay nada con qué comparar
+        assert compare_with_baseline('f[large]', worse, baseline) == []
+
+
+class TestMoneyUtils:
+    """Tests para la serialización de importes"""
+    
+    def test_money_conversions(self):
+        """Test que los importes se redondean a céntimos sin deriva de float"""
+        assert to_cents(Decimal('0.1') + Decimal('0.2')) == 30
+        assert to_cents(Decimal('10.005')) == 1001
+        assert to_cents(None) == 0
+        assert money(Decimal('1234567.89')) == 1234567.89
+        assert percentage(Decimal('1'), Decimal('3')) == 33.33
+        assert percentage(Decimal('5'), Decimal('0')) == 0.0
+    
+    def test_chart_data_in_cents(self):
+        """Test que los gráficos reciben un único objeto con céntimos enteros"""
+        summary = [{'category__name': 'Comida', 'category__color': '#FF0000', 'total': Decimal('12.34')}]
+        daily = [(date(2025, 1, 2), Decimal('0.30'))]
+        
+        chart_data = prepare_chart_data(summary, daily)['chart_data']
+        
+        assert chart_data == {
+            'categories': ['Comida'],
+            'amounts_cents': [1234],
+            'colors': ['#FF0000'],
+            'dates': ['2025-01-02'],
+            'daily_cents': [30],
+        }
+
+
+@pytest.mark.django_db
+class TestCategoryRegistry:
+    """Tests para el registro de categorías en memoria"""
+    
+    def test_served_from_memory_after_first_load(self, django_assert_num_queries):
+        """Test que tras la primera carga las lecturas no consultan la base de datos"""
+        category = Category.objects.create(name="Café", icon="☕", color="#6F4E37")
+        categories.all()
+        
+        with django_assert_num_queries(0):
+            info = categories.get(category.id)
+            assert [c.name for c in categories.all()] == ["Café"]
+        assert (info.name, info.icon, info.color) == ("Café", "☕", "#6F4E37")
+    
+    def test_save_invalidates_and_changes_version(self):
+        """Test que editar una categoría recarga el registro y cambia su versión"""
+        category = Category.objects.create(name="Café", color="#6F4E37")
+        version = categories.version()
+        
+        category.name = "Cafetería"
+        category.save()
+        
+        assert categories.get(category.id).name == "Cafetería"
+        assert categories.version() != version
+    
+    def test_revalidates_changes_from_other_workers(self, settings):
+        """Test que los cambios sin señales (otro worker) se detectan por el sello"""
+        category = Category.objects.create(name="Café", color="#6F4E37")
+        categories.all()
+        
+        # bulk_create no lanza señales: un id desconocido fuerza la comprobación
+        created = Category.objects.bulk_create([Category(name="Taxi", color="#FFFF00")])[0]
+        created_id = created.id or Category.objects.get(name="Taxi").id
+        assert categories.get(created_id).name == "Taxi"
+        
+        # Con el TTL vencido se compara el sello en la siguiente lectura
+        settings.CATEGORY_REGISTRY_TTL = 0
+        Category.objects.filter(pk=category.pk).update(color="#000000", updated_at=timezone.now())
+        assert categories.get(category.id).color == "#000000"
+    
+    def test_attach_categories_without_join(self, django_assert_num_queries):
+        """Test que los gastos reciben su categoría sin consultar la tabla de categorías"""
+        user = User.objects.create_user(username="testuser")
+        category = Category.objects.create(name="Test", color="#FF0000")
+        Expense.objects.create(user=user, category=category, amount=Decimal('5.00'), date=date.today())
+        categories.all()
+        
+        expenses = list(Expense.objects.filter(user=user))
+        with django_assert_num_queries(0):
+            attach_categories(expenses)
+            assert expenses[0].category.name == "Test"
+    
+    def test_expense_form_category_choices(self):
+        """Test que el formulario valida la categoría contra el registro"""
+        category = Category.objects.create(name="Test", color="#FF0000")
+        data = {'amount': '10.00', 'date': date.today().isoformat()}
+        
+        form = ExpenseForm({**data, 'category': category.id})
+        assert form.is_valid(), form.errors
+        assert form.cleaned_data['category'].name == "Test"
+        assert (category.id, "Test") in list(form.fields['category'].choices)
+        
+        form = ExpenseForm({**data, 'category': category.id + 1000})
+        assert not form.is_valid()
+        assert 'category' in form.errors
+
 # =============================================================================
 # CÓMO EJECUTAR ESTOS TESTS
 # =============================================================================
@@ -6,11 +6,20 @@ Cubre funcionalidades de dashboard, CRUD de gastos, HTMX y autenticación
 import pytest
 from datetime import date, timedelta
 from decimal import Decimal
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.test import Client
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.contrib.messages import get_messages
-from apps.expenses.models import Category, Expense
+from apps.expenses.models import Category, Expense, Budget
+from apps.expenses.utils.util_categories import categories
+from apps.expenses.utils.util_expense_list import EXPENSES_PAGE_SIZE
+
+# Límite de consultas SQL para renderizar el dashboard completo (sin y con caché)
+DASHBOARD_MAX_QUERIES = 6
+DASHBOARD_CACHED_MAX_QUERIES = 3
 
 
 @pytest.mark.django_db
@@ -19,6 +28,7 @@ class TestDashboardView:
     
     def setup_method(self):
         """Configuración inicial para cada test"""
+        caches['dashboard'].clear()
         self.client = Client()
         self.user = User.objects.create_user(
             username="testuser",
@@ -56,6 +66,26 @@ class TestDashboardView:
         assert response.status_code == 200
         assert 'expenses/partials/dashboard_metrics.html' in [t.name for t in response.templates]
     
+    def test_dashboard_htmx_refreshes_budget_and_recent_expenses(self):
+        """Test que el parcial HTMX actualiza también presupuesto y gastos recientes (out-of-band)"""
+        self.client.login(username="testuser", password="testpass123")
+        url = reverse('expenses:dashboard')
+        
+        content = self.client.get(url, HTTP_HX_REQUEST='true').content.decode()
+        assert 'id="budget-status" hx-swap-oob="true"' in content
+        assert 'Configura un presupuesto mensual' in content
+        
+        # El primer presupuesto y un gasto nuevo aparecen sin recargar la página
+        Budget.objects.create(user=self.user, monthly_limit=Decimal('80.00'))
+        Expense.objects.create(
+            user=self.user, category=self.category,
+            amount=Decimal('12.00'), description="Café reciente", date=date.today()
+        )
+        content = self.client.get(url, {'period': 'last_7_days'}, HTTP_HX_REQUEST='true').content.decode()
+        assert 'de €80,00' in content
+        assert 'Café reciente' in content
+        assert 'id="recent-expenses" hx-swap-oob="true"' in content
+    
     def test_dashboard_with_period_filter(self):
         """Test dashboard con filtro de período"""
         self.client.login(username="testuser", password="testpass123")
@@ -85,6 +115,118 @@ class TestDashboardView:
         assert response.status_code == 200
         assert response.context['period_total'] == Decimal('25.00')
         assert response.context['period_expenses_count'] == 1
+    
+    def test_dashboard_query_count(self, django_assert_max_num_queries):
+        """Test que el número de consultas del dashboard no crece con los datos"""
+        self.client.login(username="testuser", password="testpass123")
+        Budget.objects.create(user=self.user, monthly_limit=Decimal('500.00'))
+        
+        # Varias categorías y días para que cualquier consulta por fila se note
+        for i in range(5):
+            category = Category.objects.create(name=f"Categoría {i}", color="#00FF00")
+            Expense.objects.create(
+                user=self.user, category=category,
+                amount=Decimal('10.00'), date=date.today() - timedelta(days=i)
+            )
+        
+        # Registro de categorías ya cargado, como en un worker en marcha
+        categories.all()
+        
+        # sesión + usuario + versión + agregado del período + presupuesto + gastos recientes
+        with django_assert_max_num_queries(DASHBOARD_MAX_QUERIES):
+            response = self.client.get(reverse('expenses:dashboard'), {'period': 'last_30_days'})
+        assert response.status_code == 200
+        
+        # Con caché: solo sesión, usuario y versión de datos
+        with django_assert_max_num_queries(DASHBOARD_CACHED_MAX_QUERIES):
+            self.client.get(
+                reverse('expenses:dashboard'),
+                {'period': 'last_30_days'},
+                HTTP_HX_REQUEST='true'
+            )
+    
+    def test_dashboard_cache_invalidated_on_expense_changes(self):
+        """Test que crear, editar o borrar gastos invalida el dashboard cacheado"""
+        self.client.login(username="testuser", password="testpass123")
+        url = reverse('expenses:dashboard')
+        
+        assert self.client.get(url).context['period_total'] == 0
+        
+        expense = Expense.objects.create(
+            user=self.user, category=self.category,
+            amount=Decimal('25.00'), date=date.today()
+        )
+        assert self.client.get(url).context['period_total'] == Decimal('25.00')
+        
+        expense.amount = Decimal('30.00')
+        expense.save()
+        assert self.client.get(url).context['period_total'] == Decimal('30.00')
+        
+        expense.delete()
+        assert self.client.get(url).context['period_total'] == 0
+    
+    def test_dashboard_htmx_conditional_get(self):
+        """Test que el parcial HTMX responde 304 sin renderizar si no hay cambios"""
+        self.client.login(username="testuser", password="testpass123")
+        url = reverse('expenses:dashboard')
+        
+        response = self.client.get(url, HTTP_HX_REQUEST='true')
+        etag = response['ETag']
+        assert 'HX-Request' in response['Vary']
+        
+        response = self.client.get(url, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert not response.templates
+        
+        # La página completa no usa el ETag del parcial
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+        
+        Expense.objects.create(
+            user=self.user, category=self.category,
+            amount=Decimal('5.00'), date=date.today()
+        )
+        assert self.client.get(url, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=etag).status_code == 200
+    
+    def test_chart_data_endpoint_conditional_get(self):
+        """Test que el JSON de gráficos responde 304 hasta que cambian los datos"""
+        self.client.login(username="testuser", password="testpass123")
+        Budget.objects.create(user=self.user, monthly_limit=Decimal('100.00'))
+        Expense.objects.create(
+            user=self.user, category=self.category,
+            amount=Decimal('25.50'), date=date.today()
+        )
+        url = reverse('expenses:dashboard_chart_data')
+        
+        response = self.client.get(url, {'period': 'current_month'})
+        assert response.status_code == 200
+        payload = response.json()
+        assert payload['chart_data']['amounts_cents'] == [2550]
+        etag = response['ETag']
+        
+        # Sin cambios: 304 sin cuerpo y con una sola consulta además de sesión y usuario
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'period': 'current_month'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.content == b''
+        assert len(queries) <= DASHBOARD_CACHED_MAX_QUERIES
+        
+        # Un gasto nuevo cambia la versión y con ella el ETag
+        Expense.objects.create(
+            user=self.user, category=self.category,
+            amount=Decimal('1.00'), date=date.today()
+        )
+        response = self.client.get(url, {'period': 'current_month'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert response.json()['chart_data']['amounts_cents'] == [2650]
+        
+        # Editar la categoría (admin) también invalida el ETag y el contexto cacheado
+        etag = response['ETag']
+        self.category.color = "#123456"
+        self.category.save()
+        response = self.client.get(url, {'period': 'current_month'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()['chart_data']['colors'] == ["#123456"]
 
 
 @pytest.mark.django_db
@@ -128,6 +270,14 @@ class TestExpenseListView:
         
         assert response.status_code == 200
         assert 'expenses/partials/expense_list_content.html' in [t.name for t in response.templates]
+        
+        # Misma petición con el ETag recibido: 304; con otros filtros: 200
+        etag = response['ETag']
+        url = reverse('expenses:expense_list')
+        assert self.client.get(url, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=etag).status_code == 304
+        assert self.client.get(
+            url, {'search': 'café'}, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=etag
+        ).status_code == 200
     
     def test_expense_list_with_filters(self):
         """Test expense_list con filtros aplicados"""
@@ -155,6 +305,46 @@ class TestExpenseListView:
         expenses = list(response.context['expenses'])
         assert len(expenses) == 1
         assert expenses[0].category == self.category
+    
+    def test_expense_list_infinite_scroll(self):
+        """Test que el listado se pagina por cursor y el endpoint devuelve el resto"""
+        self.client.login(username="testuser", password="testpass123")
+        
+        for i in range(EXPENSES_PAGE_SIZE + 5):
+            Expense.objects.create(
+                user=self.user, category=self.category,
+                amount=Decimal('1.00'), date=date.today() - timedelta(days=i % 3)
+            )
+        
+        response = self.client.get(reverse('expenses:expense_list'))
+        assert len(response.context['expenses']) == EXPENSES_PAGE_SIZE
+        assert response.context['count_filtered'] == EXPENSES_PAGE_SIZE + 5
+        next_cursor = response.context['next_cursor']
+        assert next_cursor
+        
+        more = self.client.get(
+            reverse('expenses:expense_list_more'),
+            {'cursor': next_cursor, 'layout': 'cards'},
+            HTTP_HX_REQUEST='true'
+        )
+        assert more.status_code == 200
+        assert 'expenses/partials/expense_cards.html' in [t.name for t in more.templates]
+        assert len(more.context['expenses']) == 5
+        assert more.context['next_cursor'] is None
+        
+        # Ningún gasto se repite ni se pierde entre páginas
+        seen = [e.id for e in response.context['expenses']] + [e.id for e in more.context['expenses']]
+        assert sorted(seen) == sorted(Expense.objects.filter(user=self.user).values_list('id', flat=True))
+        
+        # Un cursor manipulado no vuelve a servir la primera página
+        tampered = self.client.get(
+            reverse('expenses:expense_list_more'),
+            {'cursor': 'no-es-un-cursor', 'layout': 'cards'},
+            HTTP_HX_REQUEST='true'
+        )
+        assert tampered.status_code == 200
+        assert tampered.context['expenses'] == []
+        assert tampered.context['next_cursor'] is None
 
 
 @pytest.mark.django_db
@@ -0,0 +1,120 @@
+"""
+Tests para la cola de webhooks a n8n
+
+Cubre el encolado transaccional, el envío, los reintentos y el descarte
+"""
+import pytest
+import requests
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.utils import timezone
+from apps.expenses.models import Category, Budget, WebhookOutbox
+from apps.expenses.utils import util_webhooks
+from apps.expenses.utils.util_crud_operations import handle_expense_creation
+from apps.expenses.utils.util_webhooks import enqueue_webhook, process_webhook_outbox
+
+
+class FakeResponse:
+    """Respuesta HTTP mínima para los envíos simulados"""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ''
+
+
+class FakeSession:
+    """Sesión que devuelve las respuestas indicadas en orden y guarda las peticiones"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def post(self, url, json=None, timeout=None):
+        self.calls.append((url, json))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return FakeResponse(response)
+
+
+@pytest.mark.django_db
+class TestWebhookOutbox:
+    """Tests para el encolado y el envío de webhooks"""
+
+    def setup_method(self):
+        """Configuración inicial para cada test"""
+        self.user = User.objects.create_user(username="testuser", email="test@example.com")
+        self.category = Category.objects.create(name="Café", color="#8B4513")
+
+    def _use_session(self, monkeypatch, session):
+        monkeypatch.setattr(util_webhooks, 'get_webhook_session', lambda: session)
+        return session
+
+    def test_expense_creation_enqueues_alert_without_http(self, monkeypatch):
+        """Test que crear un gasto sobre el 90% encola el webhook sin hacer la petición"""
+        session = self._use_session(monkeypatch, FakeSession())
+        Budget.objects.create(user=self.user, monthly_limit=Decimal('100.00'), email_alerts_enabled=True)
+
+        expense, _, is_valid = handle_expense_creation({
+            'category': self.category.id,
+            'amount': '95.00',
+            'date': date.today().isoformat(),
+        }, self.user)
+
+        assert is_valid
+        outbox = WebhookOutbox.objects.get()
+        assert outbox.webhook == 'budget-alert'
+        assert outbox.payload['user_id'] == self.user.id
+        assert outbox.status == WebhookOutbox.STATUS_PENDING
+        assert session.calls == []
+
+    def test_process_sends_pending_webhooks(self, monkeypatch):
+        """Test que el worker envía los webhooks pendientes y los marca como enviados"""
+        session = self._use_session(monkeypatch, FakeSession(200))
+        enqueue_webhook('budget-alert', {'user_id': self.user.id})
+
+        assert process_webhook_outbox() == {WebhookOutbox.STATUS_SENT: 1}
+        outbox = WebhookOutbox.objects.get()
+        assert outbox.status == WebhookOutbox.STATUS_SENT
+        assert outbox.sent_at is not None
+        assert session.calls[0][0].endswith('/webhook/budget-alert')
+
+    def test_failures_retry_with_backoff(self, monkeypatch, settings):
+        """Test que un fallo reprograma el webhook con espera creciente"""
+        settings.WEBHOOK_OUTBOX_BACKOFF_BASE = 30
+        self._use_session(monkeypatch, FakeSession(requests.exceptions.Timeout('timeout'), 503))
+        outbox = enqueue_webhook('budget-alert', {})
+
+        process_webhook_outbox()
+        outbox.refresh_from_db()
+        assert outbox.status == WebhookOutbox.STATUS_PENDING
+        assert outbox.attempts == 1
+        first_delay = outbox.next_attempt_at - timezone.now()
+        assert timedelta(seconds=20) < first_delay <= timedelta(seconds=36)
+
+        # No se reintenta antes de tiempo
+        assert process_webhook_outbox() == {}
+
+        WebhookOutbox.objects.update(next_attempt_at=timezone.now())
+        process_webhook_outbox()
+        outbox.refresh_from_db()
+        assert outbox.attempts == 2
+        assert outbox.next_attempt_at - timezone.now() > timedelta(seconds=45)
+
+    def test_dead_letter_after_max_attempts_or_client_error(self, monkeypatch, settings):
+        """Test que se descarta al agotar los intentos o ante un 4xx no reintentable"""
+        settings.WEBHOOK_OUTBOX_MAX_ATTEMPTS = 1
+        self._use_session(monkeypatch, FakeSession(500))
+        retried = enqueue_webhook('budget-alert', {})
+        process_webhook_outbox()
+
+        settings.WEBHOOK_OUTBOX_MAX_ATTEMPTS = 5
+        self._use_session(monkeypatch, FakeSession(401))
+        rejected = enqueue_webhook('budget-alert', {})
+        process_webhook_outbox()
+
+        for outbox in (retried, rejected):
+            outbox.refresh_from_db()
+            assert outbox.status == WebhookOutbox.STATUS_DEAD
+            assert outbox.last_error.startswith('HTTP ')
@@ -5,8 +5,11 @@ app_name = 'expenses'
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('graficos/', views.dashboard_chart_data, name='dashboard_chart_data'),
     path('gastos/', views.expense_list, name='expense_list'),
+    path('gastos/mas/', views.expense_list_more, name='expense_list_more'),
     path('agregar/', views.add_expense, name='add_expense'),
+    path('importar/', views.import_expenses_view, name='import_expenses'),
     path('eliminar/<int:expense_id>/', views.delete_expense, name='delete_expense'),
     path('editar/<int:expense_id>/', views.edit_expense, name='edit_expense'),
     path('presupuesto/', views.manage_budget, name='manage_budget'),
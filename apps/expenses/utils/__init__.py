@@ -6,6 +6,18 @@ Este paquete contiene utilidades organizadas por responsabilidad:
 - util_chart_data.py: Preparación de datos para gráficos 
 - util_expense_list.py: Filtros y listado de gastos
 - util_crud_operations.py: Operaciones CRUD con HTMX
+- util_rollups.py: Agregados mensuales de gastos por usuario
+- util_cache.py: Versión de datos por usuario y caché del dashboard
+- util_export.py: Exportación de gastos en streaming (NDJSON)
+- util_reports.py: Historiales de la API de reportes con consultas agrupadas
+- util_benchmark.py: Datos temporales y mediciones para los comandos de benchmark
+- util_webhooks.py: Cola de webhooks a n8n con reintentos
+- util_alerts.py: Umbrales del presupuesto y estado de las alertas
+- util_import.py: Importación masiva de gastos desde CSV y OFX
+- util_money.py: Conversión de importes a euros (API, webhooks) y céntimos (gráficos)
+- util_conditional.py: ETags y respuestas 304 a partir de la versión de datos
+- util_categories.py: Registro en memoria de las categorías (sin JOIN en los listados)
+- util_report_snapshots.py: Reportes mensuales precalculados de la API (ReportSnapshot)
 
 Uso recomendado con imports específicos:
     from apps.expenses.utils.util_dashboard import calculate_dashboard_metrics
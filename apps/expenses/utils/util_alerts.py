@@ -0,0 +1,173 @@
+"""
+Utilidades para las alertas de presupuesto
+
+Este módulo contiene funciones especializadas en:
+- Evaluación de los umbrales del presupuesto (alerta, crítico y excedido)
+- Estado persistente por (usuario, mes, umbral) en BudgetAlertState
+- Encolado del webhook de alerta para n8n
+
+Cada umbral se dispara una sola vez al cruzarlo y se rearma cuando el
+gasto del mes vuelve a quedar por debajo. Así un usuario que ya pasó del
+90% no genera un webhook (y un email) por cada gasto nuevo.
+"""
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from ..models import Budget, BudgetAlertState
+from .util_money import money, percentage
+from .util_rollups import get_month_total, month_start
+from .util_webhooks import enqueue_webhook
+
+# Tipo de alerta que recibe n8n por umbral.
+# El crítico mantiene el nombre histórico que usa el workflow de alertas.
+ALERT_TYPES = {
+    BudgetAlertState.LEVEL_WARNING: 'budget_warning',
+    BudgetAlertState.LEVEL_CRITICAL: 'budget_90_percent',
+    BudgetAlertState.LEVEL_EXCEEDED: 'budget_exceeded',
+}
+
+# Umbrales que envían webhook: los tres porcentajes que configura el usuario en su presupuesto
+NOTIFIED_LEVELS = (
+    BudgetAlertState.LEVEL_WARNING,
+    BudgetAlertState.LEVEL_CRITICAL,
+    BudgetAlertState.LEVEL_EXCEEDED,
+)
+
+
+def get_budget_thresholds(budget):
+    """
+    Importes de cada umbral del presupuesto, de menor a mayor
+
+    Args:
+        budget: Objeto Budget
+
+    Returns:
+        list: Tuplas (nivel, importe)
+    """
+    return [
+        (BudgetAlertState.LEVEL_WARNING, budget.get_warning_amount()),
+        (BudgetAlertState.LEVEL_CRITICAL, budget.get_critical_amount()),
+        (BudgetAlertState.LEVEL_EXCEEDED, budget.monthly_limit),
+    ]
+
+
+def _trigger(user_id, month, level):
+    """
+    Marca un umbral como disparado si estaba armado
+
+    La actualización condicional garantiza que, con peticiones
+    concurrentes, solo una de ellas gana y envía el webhook.
+
+    Returns:
+        bool: True si esta llamada ha disparado el umbral
+    """
+    lookup = {'user_id': user_id, 'month': month, 'level': level}
+    now = timezone.now()
+    if BudgetAlertState.objects.filter(**lookup, triggered=False).update(triggered=True, triggered_at=now):
+        return True
+    if BudgetAlertState.objects.filter(**lookup).exists():
+        return False
+
+    try:
+        with transaction.atomic():
+            BudgetAlertState.objects.create(**lookup, triggered=True, triggered_at=now)
+        return True
+    except IntegrityError:
+        # Otra petición creó el estado a la vez y ya disparó la alerta
+        return False
+
+
+def evaluate_budget_alerts(user, date=None, month_total=None, budget=None):
+    """
+    Evalúa los umbrales del presupuesto para el mes de la fecha indicada
+
+    Dispara los umbrales recién cruzados y rearma los que han dejado de
+    estarlo. Si se dispara algún umbral con webhook en el mes actual, se
+    encola un único webhook con el más alto.
+
+    Args:
+        user: Usuario
+        date: Cualquier fecha del mes a evaluar (por defecto hoy)
+        month_total: Total del mes, si ya se conoce (si no, se lee de los agregados)
+        budget: Presupuesto del usuario, si ya se ha cargado
+
+    Returns:
+        str: Nivel notificado o None si no se ha encolado ningún webhook
+    """
+    if budget is None:
+        budget = Budget.objects.filter(user=user).first()
+
+    # Sin presupuesto o sin alertas por email no hay nada que evaluar
+    if budget is None or not budget.email_alerts_enabled or budget.monthly_limit <= 0:
+        return None
+
+    today = timezone.localdate()
+    month = month_start(date or today)
+    if month_total is None:
+        month_total = get_month_total(user, month)
+
+    states = dict(
+        BudgetAlertState.objects.filter(user=user, month=month).values_list('level', 'triggered')
+    )
+
+    newly_triggered = []
+    rearm = []
+    for level, amount in get_budget_thresholds(budget):
+        if month_total >= amount:
+            if not states.get(level) and _trigger(user.id, month, level):
+                newly_triggered.append(level)
+        elif states.get(level):
+            rearm.append(level)
+
+    if rearm:
+        BudgetAlertState.objects.filter(user=user, month=month, level__in=rearm).update(
+            triggered=False,
+            triggered_at=None
+        )
+
+    # Solo se avisa del mes en curso: editar un mes pasado no envía emails
+    notified = [level for level in newly_triggered if level in NOTIFIED_LEVELS]
+    if not notified or month != month_start(today):
+        return None
+
+    level = notified[-1]
+    send_webhook_to_n8n(user, budget, month_total, percentage(month_total, budget.monthly_limit), level)
+    return level
+
+
+def send_webhook_to_n8n(user, budget, current_spending, percentage_used, level=BudgetAlertState.LEVEL_CRITICAL):
+    """
+    Encola el webhook de alerta de presupuesto para n8n
+
+    No hace la petición HTTP: guarda el webhook en WebhookOutbox y lo envía
+    en segundo plano el comando process_webhook_outbox, con reintentos.
+
+    Args:
+        user: Usuario que superó el límite
+        budget: Objeto Budget del usuario
+        current_spending: Gasto actual del mes
+        percentage_used: Porcentaje usado del presupuesto
+        level: Umbral cruzado (warning, critical o exceeded)
+
+    Returns:
+        WebhookOutbox: Webhook encolado
+    """
+
+    if level == BudgetAlertState.LEVEL_EXCEEDED:
+        message = f'Has superado tu presupuesto mensual ({percentage_used:.1f}% gastado)'
+    else:
+        message = f'Has alcanzado el {percentage_used:.1f}% de tu presupuesto mensual'
+
+    payload = {
+        'user_id': user.id,
+        'user_name': user.get_full_name() or user.username,
+        'user_email': user.email,
+        'budget_limit': money(budget.monthly_limit),
+        'current_spending': money(current_spending),
+        'percentage': round(float(percentage_used), 2),
+        'alert_type': ALERT_TYPES[level],
+        'message': message,
+        'timestamp': timezone.now().isoformat()
+    }
+
+    return enqueue_webhook('budget-alert', payload)
@@ -0,0 +1,191 @@
+"""
+Utilidades para los comandos de benchmark
+
+Este módulo contiene funciones especializadas en:
+- Creación de un usuario temporal con N gastos (bulk_create + agregados)
+- Ejecución dentro de una transacción que siempre se deshace
+- Medición de tiempo, pico de memoria Python (tracemalloc) y RSS máximo
+- Perfil de una función (consultas, tiempo y memoria) y comparación con
+  una línea base guardada en JSON
+"""
+
+import json
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from ..models import Expense
+from .util_rollups import rebuild_rollups
+
+
+class _Rollback(Exception):
+    """Fuerza el rollback de la transacción del benchmark"""
+
+
+@contextmanager
+def rolled_back():
+    """
+    Ejecuta el bloque dentro de una transacción que se deshace al salir
+
+    Así los datos generados para el benchmark no quedan en la base de datos.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def create_benchmark_user(size, categories, days=1500):
+    """
+    Crea un usuario temporal con size gastos repartidos en los últimos días
+
+    Los gastos se insertan con bulk_create (sin señales) y después se
+    reconstruyen los agregados mensuales del usuario.
+
+    Args:
+        size: Número de gastos
+        categories: Lista de categorías a repartir
+        days: Días hacia atrás en los que se reparten los gastos
+
+    Returns:
+        User: Usuario creado
+    """
+    user = User.objects.create_user(username=f'benchmark-{time.time_ns()}')
+    today = date.today()
+    batch = []
+    for i in range(size):
+        batch.append(Expense(
+            user=user,
+            category=categories[i % len(categories)],
+            amount=Decimal(i % 5000) / 100 + Decimal('0.50'),
+            description=f'Gasto {i}',
+            date=today - timedelta(days=i % days)
+        ))
+        if len(batch) >= 5000:
+            Expense.objects.bulk_create(batch)
+            batch = []
+    Expense.objects.bulk_create(batch)
+    rebuild_rollups([user.id])
+    return user
+
+
+def max_rss_mb():
+    """RSS máximo del proceso en MB (ru_maxrss está en KB en Linux y en bytes en macOS)"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return max_rss / divisor
+
+
+def measure(func):
+    """
+    Ejecuta func midiendo tiempo, pico de memoria Python y crecimiento del RSS máximo
+
+    El RSS máximo nunca baja: si se miden varias variantes en el mismo
+    proceso, el crecimiento solo es comparable midiendo primero la que
+    menos memoria usa.
+
+    Args:
+        func: Función sin argumentos a medir
+
+    Returns:
+        tuple: (resultado, segundos, pico_python_mb, crecimiento_rss_mb)
+    """
+    rss_before = max_rss_mb()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024, max_rss_mb() - rss_before
+
+
+def profile_call(func, rounds=5):
+    """
+    Perfil de una función: consultas SQL, mejor tiempo y pico de memoria
+
+    La primera ejecución cuenta las consultas y mide la memoria; el tiempo
+    es el mejor de rounds ejecuciones, que es la medida menos ruidosa.
+
+    Args:
+        func: Función sin argumentos a medir
+        rounds: Número de ejecuciones cronometradas
+
+    Returns:
+        dict: queries, time_ms y peak_mb
+    """
+    with CaptureQueriesContext(connection) as queries:
+        _, _, peak_mb, _ = measure(func)
+
+    best = min(measure_time(func) for _ in range(rounds))
+    return {
+        'queries': len(queries.captured_queries),
+        'time_ms': round(best * 1000, 3),
+        'peak_mb': round(peak_mb, 3),
+    }
+
+
+def measure_time(func):
+    """Segundos que tarda func (sin tracemalloc, que ralentiza la ejecución)"""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def load_baseline(path):
+    """Línea base guardada con save_baseline, o {} si el fichero no existe"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    """Guarda los resultados como nueva línea base (ordenados para diffs legibles)"""
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare_with_baseline(name, result, baseline, time_tolerance=1.5, memory_tolerance=1.25,
+                          time_slack_ms=2.0, memory_slack_mb=0.05):
+    """
+    Compara un resultado de profile_call con su línea base
+
+    Las consultas deben ser como mucho las de la línea base. El tiempo y
+    la memoria admiten un margen relativo y otro absoluto, para que las
+    funciones muy rápidas o que apenas reservan memoria no fallen por ruido.
+
+    Args:
+        name: Clave del benchmark en la línea base
+        result: Resultado de profile_call
+        baseline: dict cargado con load_baseline
+        time_tolerance: Factor máximo sobre el tiempo de referencia
+        memory_tolerance: Factor máximo sobre el pico de memoria de referencia
+        time_slack_ms: Margen absoluto de tiempo en milisegundos
+        memory_slack_mb: Margen absoluto de memoria en MB
+
+    Returns:
+        list: Regresiones encontradas (vacía si no hay, o si no hay referencia)
+    """
+    reference = baseline.get(name)
+    if reference is None:
+        return []
+
+    regressions = []
+    if result['queries'] > reference['queries']:
+        regressions.append(f"{name}: {result['queries']} consultas (referencia {reference['queries']})")
+    if result['time_ms'] > reference['time_ms'] * time_tolerance + time_slack_ms:
+        regressions.append(f"{name}: {result['time_ms']:.1f} ms (referencia {reference['time_ms']:.1f} ms)")
+    if result['peak_mb'] > reference['peak_mb'] * memory_tolerance + memory_slack_mb:
+        regressions.append(f"{name}: {result['peak_mb']:.2f} MB (referencia {reference['peak_mb']:.2f} MB)")
+    return regressions
@@ -0,0 +1,258 @@
+"""
+Utilidades de caché por usuario
+
+Este módulo contiene funciones especializadas en:
+- Versión de datos por usuario (UserActivity.data_version)
+- Invalidación por escritura: cada cambio de gastos o presupuesto sube la versión
+- Fecha del último gasto y alertas activadas por usuario (listado de usuarios activos)
+- Caché del contexto del dashboard indexada por (usuario, período, versión,
+  versión de categorías)
+- Datos de la respuesta JSON de gráficos del dashboard
+
+La versión vive en la base de datos y no en la caché para que sea la misma
+en todos los workers, aunque cada uno tenga su propia caché en memoria.
+Con el bus de invalidación conectado (apps.core.invalidation) cada worker
+recuerda además la versión leída de cada usuario y la descarta cuando
+cualquier proceso la sube, ahorrando esa consulta en cada petición.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, F, Max, OuterRef, Subquery, Value, When
+from django.utils import timezone
+from apps.core.invalidation import LocalCache, publish
+from apps.core.metrics import record_cache
+from ..models import Budget, Expense, UserActivity
+from .util_categories import categories
+
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+
+# Períodos que se cachean (cualquier otro valor se calcula sin caché)
+CACHEABLE_PERIODS = {'current_month', 'last_month', 'last_7_days', 'last_30_days', 'current_year'}
+
+# Tema del bus de invalidación para la versión de datos de un usuario (clave: user_id)
+USER_DATA_TOPIC = 'user_data'
+
+# (versión, updated_at) por user_id, solo mientras el bus está conectado
+data_stamps = LocalCache(USER_DATA_TOPIC)
+
+
+def _initial_activity(user_id):
+    """
+    Campos desnormalizados de un registro de actividad nuevo, leídos de los datos actuales
+
+    Returns:
+        dict: last_expense_date y email_alerts_enabled
+    """
+    return {
+        'last_expense_date': Expense.objects.filter(user_id=user_id).aggregate(last=Max('date'))['last'],
+        'email_alerts_enabled': Budget.objects.filter(user_id=user_id, email_alerts_enabled=True).exists(),
+    }
+
+
+def read_data_stamp(user_id):
+    """
+    Versión de datos y fecha del último cambio de un usuario, sin crear el registro
+
+    Se sirve de memoria mientras el bus de invalidación está conectado;
+    si no, es una consulta por PK.
+
+    Args:
+        user_id: ID del usuario
+
+    Returns:
+        tuple: (versión, datetime) o None si el usuario no tiene registro de actividad
+    """
+    stamp = data_stamps.get(user_id)
+    if stamp is None:
+        generation = data_stamps.generation
+        stamp = UserActivity.objects.filter(user_id=user_id).values_list('data_version', 'updated_at').first()
+        if stamp is not None:
+            data_stamps.set(user_id, stamp, generation)
+    return stamp
+
+
+def get_data_stamp(user):
+    """
+    Obtiene la versión de los datos del usuario y la fecha de su último cambio
+
+    Si el usuario aún no tiene registro de actividad se crea con versión 0,
+    así cualquier entrada cacheada tiene una fila que invalidar.
+
+    Args:
+        user: Usuario
+
+    Returns:
+        tuple: (versión de datos, datetime del último cambio)
+    """
+    stamp = read_data_stamp(user.pk)
+    if stamp is None:
+        activity, _ = UserActivity.objects.get_or_create(user=user, defaults=_initial_activity(user.pk))
+        stamp = (activity.data_version, activity.updated_at)
+    return stamp
+
+
+def get_data_version(user):
+    """
+    Obtiene la versión actual de los datos del usuario
+
+    Args:
+        user: Usuario
+
+    Returns:
+        int: Versión de datos
+    """
+    return get_data_stamp(user)[0]
+
+
+def bump_data_version(user_id, create=True, expense_date=None, refresh_expense_date=False, alerts_enabled=None):
+    """
+    Incrementa la versión de datos del usuario, invalidando sus entradas de caché
+
+    En la misma actualización mantiene los campos desnormalizados de
+    UserActivity que usa el listado de usuarios activos, y publica el
+    cambio en el bus de invalidación para el resto de workers.
+
+    Args:
+        user_id: ID del usuario
+        create: Crear el registro si no existe. Debe ser False en los borrados,
+                donde el usuario puede estar eliminándose en cascada.
+        expense_date: Fecha de un gasto creado o editado (sube last_expense_date si es posterior)
+        refresh_expense_date: Recalcular last_expense_date desde los gastos
+                              (borrados o gastos movidos a una fecha anterior)
+        alerts_enabled: Nuevo valor de email_alerts_enabled (None = sin cambios)
+    """
+    changes = {
+        'data_version': F('data_version') + 1,
+        'updated_at': timezone.now(),
+    }
+    if refresh_expense_date:
+        changes['last_expense_date'] = Subquery(
+            Expense.objects.filter(user_id=user_id).order_by('-date').values('date')[:1]
+        )
+    elif expense_date is not None:
+        changes['last_expense_date'] = Case(
+            When(last_expense_date__gte=expense_date, then=F('last_expense_date')),
+            default=Value(expense_date)
+        )
+    if alerts_enabled is not None:
+        changes['email_alerts_enabled'] = alerts_enabled
+
+    updated = UserActivity.objects.filter(user_id=user_id).update(**changes)
+    if not updated and create:
+        try:
+            with transaction.atomic():
+                # El gasto o presupuesto ya está guardado: los campos se leen de la base de datos
+                UserActivity.objects.create(user_id=user_id, data_version=1, **_initial_activity(user_id))
+        except IntegrityError:
+            # Otra petición creó el registro a la vez
+            UserActivity.objects.filter(user_id=user_id).update(**changes)
+
+    publish(USER_DATA_TOPIC, user_id)
+
+
+def rebuild_user_activity(user_ids=None):
+    """
+    Recalcula last_expense_date y email_alerts_enabled desde gastos y presupuestos
+
+    Para datos cargados sin señales (bulk_create, loaddata). Crea los
+    registros que falten a los usuarios con gastos o presupuesto.
+
+    Args:
+        user_ids: Lista de IDs de usuario (None = todos)
+
+    Returns:
+        int: Registros actualizados
+    """
+    expenses = Expense.objects.all()
+    budgets = Budget.objects.all()
+    activities = UserActivity.objects.all()
+    if user_ids is not None:
+        expenses = expenses.filter(user_id__in=user_ids)
+        budgets = budgets.filter(user_id__in=user_ids)
+        activities = activities.filter(user_id__in=user_ids)
+
+    existing = set(activities.values_list('user_id', flat=True))
+    missing = (
+        set(expenses.values_list('user_id', flat=True).distinct()) | set(budgets.values_list('user_id', flat=True))
+    ) - existing
+    UserActivity.objects.bulk_create(
+        [UserActivity(user_id=user_id) for user_id in missing], batch_size=1000, ignore_conflicts=True
+    )
+
+    updated = activities.update(
+        last_expense_date=Subquery(
+            Expense.objects.filter(user_id=OuterRef('user_id')).order_by('-date').values('date')[:1]
+        ),
+        email_alerts_enabled=Exists(
+            Budget.objects.filter(user_id=OuterRef('user_id'), email_alerts_enabled=True)
+        ),
+        updated_at=timezone.now()
+    )
+    publish(USER_DATA_TOPIC)
+    return updated
+
+
+def dashboard_cache_key(user, period, start_date, end_date, version):
+    """
+    Construye la clave de caché del dashboard
+
+    Incluye las fechas del período para que 'current_month' o 'last_7_days'
+    cambien de entrada al cambiar el día, y la versión de las categorías
+    porque el contexto guarda sus nombres y colores.
+    """
+    return (
+        f"dashboard:{user.pk}:{period}:{start_date:%Y%m%d}:{end_date:%Y%m%d}"
+        f":v{version}:c{categories.version()}"
+    )
+
+
+def get_cached_dashboard_context(user, period, version=None):
+    """
+    Devuelve el contexto del dashboard desde la caché o lo calcula y lo guarda
+
+    Args:
+        user: Usuario actual
+        period: Período seleccionado
+        version: Versión de datos ya leída (o None para leerla)
+
+    Returns:
+        dict: Context completo para el template del dashboard
+    """
+    # Importar aquí para evitar imports circulares
+    from .util_dashboard import get_dashboard_context, get_period_dates
+
+    if period not in CACHEABLE_PERIODS:
+        return get_dashboard_context(user, period)
+
+    if version is None:
+        version = get_data_version(user)
+    start_date, end_date, _ = get_period_dates(period)
+    key = dashboard_cache_key(user, period, start_date, end_date, version)
+    cache = caches[DASHBOARD_CACHE_ALIAS]
+
+    context = cache.get(key)
+    record_cache(DASHBOARD_CACHE_ALIAS, context is not None)
+    if context is None:
+        context = get_dashboard_context(user, period)
+        cache.set(key, context, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 600))
+
+    return context
+
+
+def chart_payload(context):
+    """
+    Datos de la respuesta JSON de gráficos a partir del contexto del dashboard
+
+    Args:
+        context: Contexto del dashboard (ver get_cached_dashboard_context)
+
+    Returns:
+        dict: period, period_label y chart_data (céntimos)
+    """
+    return {
+        'period': context['selected_period'],
+        'period_label': context['period_label'],
+        'chart_data': context['chart_data'],
+    }
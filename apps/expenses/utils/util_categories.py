@@ -0,0 +1,234 @@
+"""
+Registro en memoria de las categorías
+
+Este módulo contiene funciones especializadas en:
+- Copia inmutable por proceso de las categorías (id → nombre, icono, color)
+- Revalidación barata contra la base de datos (número de filas y último updated_at)
+- Asignación de la categoría a los gastos sin JOIN con la tabla de categorías
+- Versión de las categorías para las claves de caché y los ETags
+
+Las categorías son pocas y casi nunca cambian, pero aparecen en cada fila
+del listado, en los gráficos, en los formularios y en la API. Cada proceso
+las lee una vez y las sirve desde memoria; las consultas de gastos solo
+leen category_id.
+
+Invalidación:
+- En el proceso que edita una categoría (admin), al instante (señales)
+- En el resto de workers, al recibir la notificación del bus de
+  invalidación (apps.core.invalidation, tema 'categories')
+- Sin bus conectado, en la siguiente revalidación: como mucho cada
+  CATEGORY_REGISTRY_TTL segundos se compara el sello de la tabla y, si ha
+  cambiado, se recarga. Con el bus conectado la revalidación se espacia
+  hasta INVALIDATION_BUS_MAX_AGE. Un id desconocido fuerza también la
+  comprobación.
+
+Las ediciones con QuerySet.update() no cambian updated_at ni lanzan
+señales, así que no se detectan hasta que cambie otra categoría.
+"""
+
+import threading
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+from django.conf import settings
+from django.db.models import Count, Max
+from apps.core.invalidation import max_age, publish, subscribe
+from ..models import Category, Expense
+
+DEFAULT_REGISTRY_TTL = 5
+
+# Tema del bus de invalidación para cualquier cambio de categorías
+CATEGORIES_TOPIC = 'categories'
+
+
+class CategoryInfo(NamedTuple):
+    """Datos de una categoría tal y como los necesitan las vistas y la API"""
+
+    id: int
+    name: str
+    icon: str
+    color: str
+    description: str
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.name
+
+    def to_model(self):
+        """
+        Construye una instancia de Category sin consultar la base de datos
+
+        La instancia se marca como ya guardada para que sirva como valor de
+        ForeignKey y en las plantillas (category.name, category.color).
+
+        Returns:
+            Category: Instancia con los campos del registro
+        """
+        category = Category(**self._asdict())
+        category._state.adding = False
+        category._state.db = 'default'
+        return category
+
+
+class _Snapshot(NamedTuple):
+    """Estado del registro en un momento dado (se sustituye entero al recargar)"""
+
+    by_id: MappingProxyType
+    ordered: tuple
+    stamp: tuple
+    checked_at: float
+
+
+class CategoryRegistry:
+    """
+    Copia por proceso de las categorías, inmutable y segura entre hilos
+
+    Las lecturas no toman ningún lock: usan la instantánea actual, que se
+    reemplaza de una vez al recargar.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read_stamp():
+        """Sello de la tabla de categorías (una consulta agregada sobre pocas filas)"""
+        stamp = Category.objects.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+        return stamp['count'], stamp['last_modified']
+
+    @staticmethod
+    def _ttl():
+        return max_age(getattr(settings, 'CATEGORY_REGISTRY_TTL', DEFAULT_REGISTRY_TTL))
+
+    def _load(self):
+        """Lee todas las categorías (una consulta) y publica una instantánea nueva"""
+        rows = list(
+            Category.objects.order_by('name').values_list('id', 'name', 'icon', 'color', 'description', 'updated_at')
+        )
+        ordered = tuple(CategoryInfo(*row[:-1]) for row in rows)
+        # Mismo sello que _read_stamp, calculado sobre las filas leídas
+        stamp = (len(rows), max((row[-1] for row in rows), default=None))
+        self._snapshot = _Snapshot(
+            by_id=MappingProxyType({info.id: info for info in ordered}),
+            ordered=ordered,
+            stamp=stamp,
+            checked_at=time.monotonic(),
+        )
+        return self._snapshot
+
+    def _current(self, force_check=False):
+        """
+        Devuelve la instantánea vigente, cargándola o revalidándola si toca
+
+        Args:
+            force_check: Comparar el sello aunque no haya pasado el TTL
+
+        Returns:
+            _Snapshot: Instantánea actual
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and not force_check and time.monotonic() - snapshot.checked_at < self._ttl():
+            return snapshot
+
+        with self._lock:
+            # Otro hilo puede haberla recargado mientras se esperaba el lock
+            if self._snapshot is not snapshot:
+                return self._snapshot
+            if snapshot is None:
+                return self._load()
+
+            if self._read_stamp() != snapshot.stamp:
+                return self._load()
+            self._snapshot = snapshot._replace(checked_at=time.monotonic())
+            return self._snapshot
+
+    def invalidate(self, key=None):
+        """Descarta la instantánea: la siguiente lectura recarga las categorías"""
+        with self._lock:
+            self._snapshot = None
+
+    def publish_change(self):
+        """Invalida el registro en este proceso y, al confirmar, en el resto de workers"""
+        publish(CATEGORIES_TOPIC)
+
+    def all(self):
+        """
+        Todas las categorías ordenadas por nombre
+
+        Returns:
+            tuple: CategoryInfo ordenados por nombre
+        """
+        return self._current().ordered
+
+    def get(self, category_id):
+        """
+        Busca una categoría por id
+
+        Un id desconocido puede ser una categoría creada en otro worker:
+        se comprueba el sello antes de darlo por inexistente.
+
+        Args:
+            category_id: ID de la categoría
+
+        Returns:
+            CategoryInfo o None si no existe
+        """
+        info = self._current().by_id.get(category_id)
+        if info is None and category_id is not None:
+            info = self._current(force_check=True).by_id.get(category_id)
+        return info
+
+    def version(self):
+        """
+        Versión de las categorías para claves de caché y ETags
+
+        Returns:
+            str: Número de categorías y marca de tiempo del último cambio
+        """
+        count, last_modified = self._current().stamp
+        return f"{count}.{int(last_modified.timestamp() * 1_000_000) if last_modified else 0}"
+
+    def last_modified(self):
+        """
+        Fecha de la última edición de categorías
+
+        Returns:
+            datetime o None si no hay categorías
+        """
+        return self._current().stamp[1]
+
+
+# Registro compartido por todo el proceso
+categories = CategoryRegistry()
+subscribe(CATEGORIES_TOPIC, categories.invalidate)
+
+
+def attach_categories(expenses):
+    """
+    Asigna a cada gasto su categoría desde el registro, sin consultar la base de datos
+
+    Sustituye a select_related('category'): después, expense.category
+    devuelve la instancia del registro en lugar de lanzar una consulta.
+
+    Args:
+        expenses: Lista de gastos (ya evaluada)
+
+    Returns:
+        La misma lista de gastos
+    """
+    field = Expense._meta.get_field('category')
+    instances = {}
+    for expense in expenses:
+        category = instances.get(expense.category_id)
+        if category is None:
+            info = categories.get(expense.category_id)
+            if info is None:
+                # Categoría borrada mientras se leían los gastos: carga normal
+                continue
+            category = instances[expense.category_id] = info.to_model()
+        field.set_cached_value(expense, category)
+    return expenses
@@ -0,0 +1,155 @@
+"""
+Utilidades para peticiones GET condicionales (ETag / 304)
+
+Este módulo contiene funciones especializadas en:
+- Sellos de datos baratos: versión de datos de un usuario o de todos
+  (UserActivity), sin leer gastos
+- Construcción de ETags a partir de esos sellos y de los parámetros de la petición
+- Respuesta 304 antes de renderizar plantillas o serializar
+- Cabeceras ETag, Last-Modified, Cache-Control y Vary de las respuestas
+
+Cada cambio de gastos o presupuesto sube UserActivity.data_version (ver
+util_cache.bump_data_version), así que el sello cambia con cualquier dato
+que aparezca en las respuestas del usuario. Las respuestas que muestran
+categorías añaden además la versión del registro de categorías
+(util_categories).
+"""
+
+import hashlib
+from datetime import datetime, time
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from ..models import UserActivity
+from .util_cache import read_data_stamp
+
+
+def make_etag(*parts):
+    """
+    Construye un ETag fuerte a partir de varias partes
+
+    Las partes se resumen con un hash para que el ETag sea corto y no
+    muestre parámetros de la petición.
+
+    Args:
+        *parts: Valores que identifican la respuesta (se convierten a texto)
+
+    Returns:
+        str: ETag entre comillas
+    """
+    key = ':'.join(str(part) for part in parts)
+    return '"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def query_fingerprint(params):
+    """
+    Representación estable de la query string (orden de parámetros indiferente)
+
+    Args:
+        params: QueryDict de la petición
+
+    Returns:
+        str: Parámetros ordenados
+    """
+    return '&'.join(f'{key}={value}' for key, values in sorted(params.lists()) for value in values)
+
+
+def get_user_stamp(user_id):
+    """
+    Versión de datos y fecha del último cambio de un usuario (una consulta por
+    PK, o ninguna con el bus de invalidación conectado)
+
+    Args:
+        user_id: ID del usuario
+
+    Returns:
+        tuple: (versión, datetime) o None si el usuario no tiene registro de actividad
+    """
+    return read_data_stamp(user_id)
+
+
+def get_global_stamp():
+    """
+    Sello de los datos de todos los usuarios en una sola consulta
+
+    La suma de versiones crece con cualquier cambio y el número de filas
+    cambia al crear o borrar usuarios.
+
+    Returns:
+        tuple: (texto del sello, datetime del último cambio o None)
+    """
+    stamp = UserActivity.objects.aggregate(
+        versions=Sum('data_version'),
+        users=Count('id'),
+        last_modified=Max('updated_at')
+    )
+    return f"{stamp['users']}:{stamp['versions'] or 0}", stamp['last_modified']
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Responde 304 si la copia del cliente sigue siendo válida
+
+    Args:
+        request: Petición (de Django o de DRF)
+        etag: ETag de la respuesta actual
+        last_modified: datetime del último cambio (o None)
+
+    Returns:
+        HttpResponseNotModified con sus cabeceras, o None si hay que generar la respuesta
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None, vary=None):
+    """
+    Añade ETag, Last-Modified y Cache-Control a una respuesta
+
+    Cache-Control es private, no-cache: el navegador (o n8n) guarda la
+    respuesta pero la revalida siempre con el servidor.
+
+    Args:
+        response: Respuesta HTTP
+        etag: ETag de la respuesta
+        last_modified: datetime del último cambio (o None)
+        vary: Cabeceras de la petición que cambian la respuesta (p. ej. ['HX-Request'])
+
+    Returns:
+        La misma respuesta
+    """
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    if vary:
+        patch_vary_headers(response, vary)
+    return response
+
+
+def today_stamp():
+    """Fecha de hoy para los ETags de respuestas con ventanas relativas (últimos 30 días, ...)"""
+    return timezone.localdate().isoformat()
+
+
+def daily_last_modified(*updated_at):
+    """
+    Last-Modified de una respuesta que depende también del día actual
+
+    Las ventanas relativas cambian a medianoche aunque no cambien los datos,
+    así que la fecha de modificación es como pronto el inicio de hoy. Así
+    un cliente que solo envía If-Modified-Since no recibe un 304 del día anterior.
+
+    Args:
+        *updated_at: datetimes del último cambio de cada fuente de datos
+                     (p. ej. gastos y categorías; los None se ignoran)
+
+    Returns:
+        datetime: El mayor entre los updated_at y el inicio del día actual
+    """
+    start_of_day = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    return max([start_of_day, *(value for value in updated_at if value)])
@@ -11,11 +11,9 @@ Este módulo contiene funciones especializadas en:
 from django.shortcuts import render
 from django.contrib import messages
 from django.shortcuts import redirect
-from django.utils import timezone
-from django.db.models import Sum
-from django.conf import settings
-import requests
-from ..models import Expense, Budget
+from django.db import transaction
+from ..models import Expense
+from .util_categories import attach_categories
 
 def get_expense_for_user(expense_id, user):
     """
@@ -32,9 +30,11 @@ def get_expense_for_user(expense_id, user):
         Expense.DoesNotExist: Si el gasto no existe o no pertenece al usuario
     """
     try:
-        return Expense.objects.get(id=expense_id, user=user)
+        expense = Expense.objects.get(id=expense_id, user=user)
     except Expense.DoesNotExist:
         raise Expense.DoesNotExist("El gasto no existe o no tienes permisos para acceder a él")
+    # La categoría sale del registro en memoria, sin otra consulta
+    return attach_categories([expense])[0]
 
 
 def handle_expense_creation(form_data, user):
@@ -53,12 +53,11 @@ def handle_expense_creation(form_data, user):
     form = ExpenseForm(form_data)
     
     if form.is_valid():
-        expense = form.save(commit=False)
-        expense.user = user
-        expense.save()
-        
-        # Verificar alerta de presupuesto del 90%
-        check_budget_alert(user)
+        # El gasto y el webhook de alerta (si lo hay, ver signals) se guardan juntos
+        with transaction.atomic():
+            expense = form.save(commit=False)
+            expense.user = user
+            expense.save()
         
         return expense, form, True
     
@@ -81,7 +80,9 @@ def handle_expense_form_update(expense, form_data):
     form = ExpenseForm(form_data, instance=expense)
     
     if form.is_valid():
-        updated_expense = form.save()
+        # La edición reevalúa las alertas del mes (ver signals) en la misma transacción
+        with transaction.atomic():
+            updated_expense = form.save()
         return updated_expense, form, True
     
     return expense, form, False
@@ -110,8 +111,9 @@ def handle_expense_deletion(expense_id, user):
             'date': expense.date
         }
         
-        # Eliminar el gasto
-        expense.delete()
+        # Eliminar el gasto (rearma las alertas si el mes baja del umbral, ver signals)
+        with transaction.atomic():
+            expense.delete()
         
         return expense_data, True, None
         
@@ -274,93 +276,3 @@ def create_htmx_delete_response(request, context):
     """
     return render(request, 'expenses/partials/expense_list_content.html', context)
 
-
-def check_budget_alert(user):
-    """
-    Verifica si el usuario ha alcanzado o superado el 90% de su presupuesto
-    y envía webhook a n8n si es necesario
-    
-    Args:
-        user: Usuario actual
-    """
-    
-    try:
-        # Obtener el presupuesto del usuario
-        budget = Budget.objects.get(user=user)
-        
-        # Solo proceder si tiene alertas habilitadas
-        if not budget.email_alerts_enabled:
-            return
-        
-        # Calcular gastos del mes actual
-        now = timezone.now()
-        current_month_expenses = Expense.objects.filter(
-            user=user,
-            date__year=now.year,
-            date__month=now.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Calcular porcentaje
-        percentage = (current_month_expenses / budget.monthly_limit) * 100
-        
-        # Verificar si alcanzó o superó el 90%
-        if percentage >= 90:
-            send_webhook_to_n8n(user, budget, current_month_expenses, percentage)
-            
-    except Budget.DoesNotExist:
-        # Usuario no tiene presupuesto configurado
-        pass
-
-
-def send_webhook_to_n8n(user, budget, current_spending, percentage):
-    """
-    Envía webhook a n8n con los datos de alerta de presupuesto
-    
-    Args:
-        user: Usuario que superó el límite
-        budget: Objeto Budget del usuario
-        current_spending: Gasto actual del mes
-        percentage: Porcentaje usado del presupuesto
-    """
-    
-    # Construir URL del webhook específico
-    # Usar URL interna para comunicación Docker, fallback a URL base
-    base_url = getattr(settings, 'N8N_INTERNAL_URL', settings.N8N_BASE_URL)
-    webhook_url = f"{base_url}/webhook/budget-alert"
-    
-    payload = {
-        'user_id': user.id,
-        'user_name': user.get_full_name() or user.username,
-        'user_email': user.email,
-        'budget_limit': float(budget.monthly_limit),
-        'current_spending': float(current_spending or 0),
-        'percentage': round(float(percentage), 2),
-        'alert_type': 'budget_90_percent',
-        'message': f'Has alcanzado el {percentage:.1f}% de tu presupuesto mensual',
-        'timestamp': timezone.now().isoformat()
-    }
-    
-    try:
-        # Headers con Bearer Token para autenticación
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {settings.N8N_WEBHOOK_TOKEN}'
-        }
-        
-        response = requests.post(
-            webhook_url,
-            json=payload,
-            timeout=10,  # Timeout de 10 segundos
-            headers=headers
-        )
-        
-        # Log del resultado (opcional)
-        if response.status_code == 200:
-            print(f"[SUCCESS] Webhook enviado exitosamente para {user.username}")
-        else:
-            print(f"[WARNING] Error en webhook: {response.status_code} - {response.text}")
-            
-    except requests.exceptions.RequestException as e:
-        # No fallar si el webhook falla - solo logging
-        print(f"[ERROR] Error enviando webhook: {e}")
-        pass 
\ No newline at end of file
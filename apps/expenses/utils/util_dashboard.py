@@ -8,8 +8,11 @@ Este módulo contiene toda la lógica relacionada con:
 """
 
 from datetime import datetime, timedelta
-from django.db.models import Sum
+from decimal import Decimal
+from django.db.models import Count, Sum
 from ..models import Expense, Budget
+from .util_categories import attach_categories, categories
+from .util_rollups import get_month_total
 
 
 def get_period_dates(period):
@@ -60,29 +63,81 @@ def get_period_dates(period):
     return start_date, end_date, period_label
 
 
-def calculate_dashboard_metrics(user, start_date, end_date, period=None):
+def aggregate_period_expenses(user, start_date, end_date):
     """
-    Calcula todas las métricas del dashboard para el período especificado
+    Agrega los gastos del período en una sola consulta agrupada por día y categoría
+    
+    El total, el número de gastos, el resumen por categorías y la serie diaria
+    se obtienen plegando en Python las filas (día, categoría), que como mucho
+    son días del período x categorías usadas. Nombre y color de cada
+    categoría salen del registro en memoria, sin JOIN.
     
     Args:
         user: Usuario actual
         start_date: Fecha de inicio del período
         end_date: Fecha de fin del período
-        period: Período seleccionado (para ajustar cálculo de promedio diario)
     
     Returns:
-        dict: Diccionario con todas las métricas calculadas
+        dict: total, count, categories_summary (lista ordenada por total desc)
+              y daily_totals (lista de (fecha, total) ordenada por fecha)
     """
-    # Filtrar gastos por el período seleccionado
-    period_expenses = Expense.objects.filter(
+    rows = Expense.objects.filter(
         user=user,
         date__gte=start_date,
         date__lte=end_date
-    ).select_related('category')
+    ).values(
+        'date', 'category_id'
+    ).annotate(
+        total=Sum('amount'),
+        count=Count('id')
+    ).order_by()
     
-    # Calcular métricas básicas del período
-    period_total = period_expenses.aggregate(total=Sum('amount'))['total'] or 0
-    period_expenses_count = period_expenses.count()
+    total = Decimal('0')
+    count = 0
+    summary = {}
+    daily = {}
+    
+    for row in rows:
+        total += row['total']
+        count += row['count']
+        
+        category = summary.get(row['category_id'])
+        if category is None:
+            info = categories.get(row['category_id'])
+            category = summary[row['category_id']] = {
+                'category__name': info.name if info else '',
+                'category__color': info.color if info else '',
+                'total': Decimal('0'),
+            }
+        category['total'] += row['total']
+        
+        daily[row['date']] = daily.get(row['date'], Decimal('0')) + row['total']
+    
+    return {
+        'total': total,
+        'count': count,
+        'categories_summary': sorted(summary.values(), key=lambda c: c['total'], reverse=True),
+        'daily_totals': sorted(daily.items()),
+    }
+
+
+def calculate_dashboard_metrics(user, start_date, end_date, period=None):
+    """
+    Calcula todas las métricas del dashboard para el período especificado
+    
+    Args:
+        user: Usuario actual
+        start_date: Fecha de inicio del período
+        end_date: Fecha de fin del período
+        period: Período seleccionado (para ajustar cálculo de promedio diario)
+    
+    Returns:
+        dict: Diccionario con todas las métricas calculadas
+    """
+    # Total, número de gastos, categorías y serie diaria en una única consulta
+    aggregates = aggregate_period_expenses(user, start_date, end_date)
+    period_total = aggregates['total']
+    period_expenses_count = aggregates['count']
     
     # Calcular promedio diario
     # Para el mes actual, usar solo los días transcurridos hasta hoy
@@ -97,19 +152,15 @@ def calculate_dashboard_metrics(user, start_date, end_date, period=None):
     period_avg_daily = period_total / period_days if period_days > 0 else 0
     
     # Gastos recientes del usuario actual (independiente del período)
-    recent_expenses = Expense.objects.filter(user=user).select_related('category').order_by('-date')[:10]
-    
-    # Gastos por categoría en el período seleccionado
-    categories_summary = period_expenses.values('category__name', 'category__color').annotate(
-        total=Sum('amount')
-    ).order_by('-total')
+    recent_expenses = attach_categories(list(Expense.objects.filter(user=user).order_by('-date')[:10]))
     
     return {
         'period_total': period_total,
         'period_expenses_count': period_expenses_count,
         'period_avg_daily': period_avg_daily,
         'recent_expenses': recent_expenses,
-        'categories_summary': categories_summary,
+        'categories_summary': aggregates['categories_summary'],
+        'daily_totals': aggregates['daily_totals'],
         # Para compatibilidad con template existente
         'monthly_total': period_total,
         'monthly_expenses_count': period_expenses_count,
@@ -137,15 +188,8 @@ def get_dashboard_context(user, period):
     # Calcular métricas
     metrics = calculate_dashboard_metrics(user, start_date, end_date, period)
     
-    # Filtrar gastos del período para los gráficos
-    period_expenses = Expense.objects.filter(
-        user=user,
-        date__gte=start_date,
-        date__lte=end_date
-    ).select_related('category')
-    
-    # Preparar datos de gráficos
-    chart_data = prepare_chart_data(metrics['categories_summary'], period_expenses)
+    # Preparar datos de gráficos a partir de los agregados ya calculados
+    chart_data = prepare_chart_data(metrics['categories_summary'], metrics['daily_totals'])
     
     # Combinar todo el context
     context = {
@@ -162,13 +206,19 @@ def get_dashboard_context(user, period):
     return context
 
 
-def get_budget_info(user, current_month_total):
+def get_budget_info(user, current_month_total=None):
     """
     Obtiene información del presupuesto del usuario de forma sencilla
+    
+    Si no se indica current_month_total se lee el total del mes actual
+    de la tabla de agregados mensuales.
     """
     try:
         budget = Budget.objects.get(user=user)
         
+        if current_month_total is None:
+            current_month_total = get_month_total(user, datetime.now().date())
+        
         # Calcular datos básicos
         percentage_used = budget.get_percentage_used(current_month_total)
         remaining_amount = budget.get_remaining_amount(current_month_total)
@@ -5,12 +5,23 @@ Este módulo contiene funciones especializadas en:
 - Aplicación de filtros a gastos
 - Cálculo de estadísticas de gastos
 - Detección de filtros activos
+- Paginación por cursor (keyset) sobre (date, created_at, id)
 - Context completo para listado de gastos
 """
 
-from django.db.models import Sum
+import base64
+from datetime import date, datetime
+from django.db.models import Count, Q, Sum
+from django.http import QueryDict
 from ..models import Expense
 from ..forms import ExpenseFilterForm
+from .util_categories import attach_categories
+
+# Número de gastos por página del listado (scroll infinito)
+EXPENSES_PAGE_SIZE = 50
+
+# Orden estable del listado: el id desempata gastos con misma fecha y creación
+EXPENSE_LIST_ORDERING = ('-date', '-created_at', '-id')
 
 
 def apply_expense_filters(expenses, filter_form):
@@ -70,7 +81,7 @@ def apply_expense_filters(expenses, filter_form):
 
 def calculate_expense_statistics(expenses):
     """
-    Calcula estadísticas de un QuerySet de gastos
+    Calcula estadísticas de un QuerySet de gastos en una sola consulta
     
     Args:
         expenses: QuerySet de gastos
@@ -78,15 +89,119 @@ def calculate_expense_statistics(expenses):
     Returns:
         dict: Estadísticas calculadas
     """
-    total_filtered = expenses.aggregate(total=Sum('amount'))['total'] or 0
-    count_filtered = expenses.count()
+    statistics = expenses.aggregate(total=Sum('amount'), count=Count('id'))
     
     return {
-        'total_filtered': total_filtered,
-        'count_filtered': count_filtered,
+        'total_filtered': statistics['total'] or 0,
+        'count_filtered': statistics['count'] or 0,
     }
 
 
+def encode_cursor(expense):
+    """
+    Codifica la posición de un gasto en el listado como cursor opaco
+    
+    Args:
+        expense: Último gasto de la página actual
+    
+    Returns:
+        str: Cursor en base64 url-safe
+    """
+    raw = f"{expense.date.isoformat()}|{expense.created_at.isoformat()}|{expense.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodifica un cursor generado por encode_cursor
+    
+    Args:
+        cursor: Cursor recibido en la petición
+    
+    Returns:
+        tuple: (date, created_at, id) o None si el cursor no es válido
+    """
+    if not cursor:
+        return None
+    try:
+        raw_date, raw_created_at, raw_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return date.fromisoformat(raw_date), datetime.fromisoformat(raw_created_at), int(raw_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def paginate_expenses(expenses, cursor=None, page_size=EXPENSES_PAGE_SIZE):
+    """
+    Devuelve una página del listado a partir de un cursor (paginación keyset)
+    
+    En lugar de OFFSET se filtra por la posición del último gasto visto, así
+    cada página cuesta lo mismo sin importar cuánto historial tenga el usuario
+    y el índice (user, date, created_at, id) sirve el orden directamente.
+    
+    El OR del cursor por sí solo no acota el recorrido del índice: la
+    condición redundante date <= última fecha hace que PostgreSQL empiece
+    el range scan en la posición del cursor en lugar de leer (y descartar)
+    todas las filas de las páginas anteriores.
+    
+    La categoría de cada gasto se toma del registro en memoria
+    (util_categories) en lugar de un JOIN.
+    
+    Un cursor que no se puede decodificar devuelve una página vacía: volver
+    a la primera página repetiría en el scroll infinito los gastos ya mostrados.
+    
+    Args:
+        expenses: QuerySet de gastos ya filtrado
+        cursor: Cursor de la página anterior (None para la primera)
+        page_size: Número de gastos por página
+    
+    Returns:
+        tuple: (lista_de_gastos, next_cursor o None si no hay más)
+    """
+    expenses = expenses.order_by(*EXPENSE_LIST_ORDERING)
+    
+    position = decode_cursor(cursor)
+    if cursor and position is None:
+        return [], None
+    if position:
+        last_date, last_created_at, last_id = position
+        expenses = expenses.filter(
+            Q(date__lte=last_date),
+            Q(date__lt=last_date) |
+            Q(date=last_date, created_at__lt=last_created_at) |
+            Q(date=last_date, created_at=last_created_at, id__lt=last_id)
+        )
+    
+    # Pedir uno más para saber si existe otra página
+    page = list(expenses[:page_size + 1])
+    has_more = len(page) > page_size
+    page = attach_categories(page[:page_size])
+    
+    next_cursor = encode_cursor(page[-1]) if has_more else None
+    return page, next_cursor
+
+
+def build_next_page_query(request_params, next_cursor):
+    """
+    Construye la query string de la siguiente página conservando los filtros
+    
+    Args:
+        request_params: Parámetros GET de la petición
+        next_cursor: Cursor de la siguiente página
+    
+    Returns:
+        str: Query string codificada o '' si no hay más páginas
+    """
+    if not next_cursor:
+        return ''
+    
+    query = QueryDict(mutable=True)
+    for key, value in (request_params or {}).items():
+        if key not in ('cursor', 'layout') and value:
+            query[key] = value
+    query['cursor'] = next_cursor
+    return query.urlencode()
+
+
 def detect_active_filters(filter_form):
     """
     Detecta si hay filtros activos en el formulario
@@ -110,19 +225,20 @@ def detect_active_filters(filter_form):
     ])
 
 
-def get_expense_list_context(user, request_params):
+def get_filtered_expenses(user, request_params):
     """
-    Función principal que genera el contexto completo para expense_list
+    Construye el QuerySet de gastos del usuario con los filtros de la petición
     
     Args:
         user: Usuario actual
         request_params: Parámetros GET de la petición
     
     Returns:
-        dict: Context completo para el template
+        tuple: (expenses, filter_form, active_period_info, period_dates)
     """
     # Obtener todos los gastos del usuario
-    expenses = Expense.objects.filter(user=user).select_related('category')
+    # Sin JOIN con categorías: la página se completa con el registro en memoria
+    expenses = Expense.objects.filter(user=user)
     
     # Inicializar formulario de filtros
     filter_form = ExpenseFilterForm(request_params or None)
@@ -130,18 +246,39 @@ def get_expense_list_context(user, request_params):
     # Aplicar filtros
     expenses, active_period_info, period_dates = apply_expense_filters(expenses, filter_form)
     
-    # Ordenar por fecha (más recientes primero)
-    expenses = expenses.order_by('-date')
+    return expenses, filter_form, active_period_info, period_dates
+
+
+def get_expense_list_context(user, request_params):
+    """
+    Función principal que genera el contexto completo para expense_list
+    
+    Solo se renderiza la primera página; las siguientes se cargan con
+    get_expense_page_context al hacer scroll.
+    
+    Args:
+        user: Usuario actual
+        request_params: Parámetros GET de la petición
+    
+    Returns:
+        dict: Context completo para el template
+    """
+    expenses, filter_form, active_period_info, period_dates = get_filtered_expenses(user, request_params)
     
-    # Calcular estadísticas
+    # Calcular estadísticas sobre todo el resultado (una sola consulta)
     statistics = calculate_expense_statistics(expenses)
     
+    # Primera página del listado
+    page, next_cursor = paginate_expenses(expenses)
+    
     # Detectar filtros activos
     has_filters = detect_active_filters(filter_form)
     
     # Construir contexto
     context = {
-        'expenses': expenses,
+        'expenses': page,
+        'next_cursor': next_cursor,
+        'next_page_query': build_next_page_query(request_params, next_cursor),
         'has_filters': has_filters,
         'active_period_info': active_period_info,
         'period_dates': period_dates,
@@ -149,4 +286,25 @@ def get_expense_list_context(user, request_params):
         **statistics,  # total_filtered, count_filtered
     }
     
-    return context 
\ No newline at end of file
+    return context
+
+
+def get_expense_page_context(user, request_params):
+    """
+    Genera el contexto de una página siguiente del listado (scroll infinito)
+    
+    Args:
+        user: Usuario actual
+        request_params: Parámetros GET de la petición (incluye 'cursor')
+    
+    Returns:
+        dict: Context con la página de gastos y el cursor siguiente
+    """
+    expenses, _, _, _ = get_filtered_expenses(user, request_params)
+    page, next_cursor = paginate_expenses(expenses, request_params.get('cursor'))
+    
+    return {
+        'expenses': page,
+        'next_cursor': next_cursor,
+        'next_page_query': build_next_page_query(request_params, next_cursor),
+    }
@@ -0,0 +1,112 @@
+"""
+Utilidades para la exportación de gastos en streaming
+
+Este módulo contiene funciones especializadas en:
+- Lectura de gastos por lotes con QuerySet.iterator()
+- Conversión de cada fila al mismo formato que ExpenseSerializer
+- Generación de NDJSON (un objeto JSON por línea) con memoria constante
+
+Las filas se leen con values() en lugar de instancias del modelo y
+serializers de DRF: el coste por gasto es un dict y una línea de texto,
+y nunca hay más de chunk_size filas en memoria. La categoría se toma del
+registro en memoria (util_categories) en lugar de un JOIN.
+"""
+
+import json
+
+from rest_framework import serializers
+from ..models import Expense
+from .util_categories import categories
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = (
+    'id', 'amount', 'description', 'date', 'location', 'created_at', 'updated_at',
+    'category_id',
+)
+
+# Campos de DRF reutilizados para formatear igual que ExpenseSerializer
+# (importes como string y fechas con la zona horaria configurada)
+_amount_field = Expense._meta.get_field('amount')
+_amount_repr = serializers.DecimalField(
+    max_digits=_amount_field.max_digits,
+    decimal_places=_amount_field.decimal_places
+)
+_date_repr = serializers.DateField()
+_datetime_repr = serializers.DateTimeField()
+
+
+def category_to_dict(category_id):
+    """
+    Categoría en el formato de CategorySerializer, leída del registro
+
+    Args:
+        category_id: ID de la categoría
+
+    Returns:
+        dict: id, name, icon, color y description (o None si no existe)
+    """
+    info = categories.get(category_id)
+    return info._asdict() if info else None
+
+
+def expense_row_to_dict(row):
+    """
+    Convierte una fila de values(*EXPORT_FIELDS) al formato de ExpenseSerializer
+
+    Args:
+        row: dict devuelto por el QuerySet
+
+    Returns:
+        dict: Gasto con la categoría anidada
+    """
+    return {
+        'id': row['id'],
+        'amount': _amount_repr.to_representation(row['amount']),
+        'description': row['description'],
+        'date': _date_repr.to_representation(row['date']),
+        'location': row['location'],
+        'category': category_to_dict(row['category_id']),
+        'created_at': _datetime_repr.to_representation(row['created_at']),
+        'updated_at': _datetime_repr.to_representation(row['updated_at']),
+    }
+
+
+def iter_user_expenses(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Recorre los gastos del usuario por lotes, del más reciente al más antiguo
+
+    Args:
+        user: Usuario
+        chunk_size: Filas leídas de la base de datos en cada lote
+
+    Yields:
+        dict: Gasto en formato de ExpenseSerializer
+    """
+    rows = Expense.objects.filter(user=user).order_by('-date', '-created_at', '-id').values(*EXPORT_FIELDS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield expense_row_to_dict(row)
+
+
+def iter_ndjson(records, lines_per_chunk=100):
+    """
+    Serializa una secuencia de dicts como NDJSON
+
+    Agrupa varias líneas en cada bloque para no enviar un write()
+    por gasto al servidor WSGI.
+
+    Args:
+        records: Iterable de dicts
+        lines_per_chunk: Líneas por bloque devuelto
+
+    Yields:
+        bytes: Bloque de líneas JSON terminadas en '\\n'
+    """
+    buffer = []
+    for record in records:
+        buffer.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        if len(buffer) >= lines_per_chunk:
+            yield ('\n'.join(buffer) + '\n').encode('utf-8')
+            buffer = []
+    if buffer:
+        yield ('\n'.join(buffer) + '\n').encode('utf-8')
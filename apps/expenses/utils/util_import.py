@@ -0,0 +1,454 @@
+"""
+Utilidades para la importación masiva de gastos
+
+Este módulo contiene funciones especializadas en:
+- Lectura en streaming de extractos bancarios en CSV y OFX
+- Normalización de importes y fechas en los formatos habituales
+- Validación de cada fila con las mismas reglas que Expense
+- Descarte de movimientos ya importados (volver a subir el mismo extracto)
+- Inserción por lotes con bulk_create
+
+bulk_create no lanza las señales de Expense, así que por cada lote se
+actualizan a mano los agregados mensuales (una actualización por mes y
+categoría), la versión de datos del usuario, los reportes mensuales de
+meses cerrados y las alertas de presupuesto.
+"""
+
+import csv
+import re
+from collections import Counter
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from django.db.models import Count
+from ..models import Expense
+from .util_alerts import evaluate_budget_alerts
+from .util_cache import bump_data_version
+from .util_categories import categories
+from .util_money import CENT
+from .util_report_snapshots import mark_snapshots_stale
+from .util_rollups import apply_bulk_deltas, month_start
+
+IMPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 50
+
+# Nombres de columna reconocidos en los CSV (en minúsculas y sin tildes)
+CSV_COLUMNS = {
+    'date': ('fecha', 'date', 'fecha operacion', 'fecha valor', 'f. valor', 'f. operacion'),
+    'amount': ('importe', 'amount', 'cantidad', 'monto'),
+    'description': ('concepto', 'descripcion', 'description', 'detalle', 'movimiento'),
+    'category': ('categoria', 'category'),
+    'location': ('ubicacion', 'location', 'lugar'),
+}
+
+_AMOUNT_FIELD = Expense._meta.get_field('amount')
+MAX_AMOUNT = Decimal(10) ** (_AMOUNT_FIELD.max_digits - _AMOUNT_FIELD.decimal_places)
+DESCRIPTION_MAX_LENGTH = Expense._meta.get_field('description').max_length
+LOCATION_MAX_LENGTH = Expense._meta.get_field('location').max_length
+
+_ACCENTS = str.maketrans('áéíóúÁÉÍÓÚ', 'aeiouAEIOU')
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+class ImportRowError(ValueError):
+    """Fila del fichero que no se puede importar"""
+
+
+def _normalize_header(name):
+    """Pasa un nombre de columna a minúsculas, sin tildes ni espacios sobrantes"""
+    return (name or '').strip().lower().translate(_ACCENTS)
+
+
+def parse_amount(value):
+    """
+    Convierte un importe de extracto bancario a Decimal
+
+    Acepta '12.50', '12,50', '1.234,56', '1,234.56', '-8,90 €'. Si aparecen
+    los dos separadores, el último es el decimal.
+
+    Args:
+        value: Texto del importe
+
+    Returns:
+        Decimal: Importe con signo (siempre finito)
+
+    Raises:
+        ImportRowError: si el importe no es válido o no es finito
+    """
+    cleaned = (value or '').replace('€', '').replace('EUR', '').replace(' ', '').replace('\xa0', '')
+    if ',' in cleaned and '.' in cleaned:
+        if cleaned.rfind(',') > cleaned.rfind('.'):
+            cleaned = cleaned.replace('.', '').replace(',', '.')
+        else:
+            cleaned = cleaned.replace(',', '')
+    else:
+        cleaned = cleaned.replace(',', '.')
+
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        raise ImportRowError(f'Importe no válido: {value!r}')
+    # Decimal acepta 'NaN', 'sNaN' e 'Infinity', que no son importes
+    if not amount.is_finite():
+        raise ImportRowError(f'Importe no válido: {value!r}')
+    return amount
+
+
+def parse_date(value):
+    """
+    Convierte una fecha de extracto bancario a date
+
+    Acepta YYYY-MM-DD, DD/MM/YYYY, DD-MM-YYYY, DD/MM/YY y YYYYMMDD (OFX,
+    con o sin hora a continuación).
+
+    Args:
+        value: Texto de la fecha
+
+    Returns:
+        date: Fecha
+
+    Raises:
+        ImportRowError: si la fecha no es válida
+    """
+    value = (value or '').strip()
+    try:
+        if len(value) == 10 and value[4] == '-':
+            return date.fromisoformat(value)
+        if len(value) >= 8 and value[:8].isdigit():
+            return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+        parts = re.split(r'[/.-]', value)
+        if len(parts) == 3:
+            day, month, year = (int(part) for part in parts)
+            if year < 100:
+                year += 2000
+            return date(year, month, day)
+    except ValueError:
+        pass
+    raise ImportRowError(f'Fecha no válida: {value!r}')
+
+
+def iter_csv_rows(stream):
+    """
+    Recorre un CSV de extracto bancario fila a fila
+
+    Detecta el separador (',', ';' o tabulador) en la cabecera y traduce
+    los nombres de columna a date, amount, description, category y location.
+
+    Args:
+        stream: Fichero de texto abierto
+
+    Yields:
+        tuple: (número de línea, dict con las columnas reconocidas)
+
+    Raises:
+        ImportRowError: si faltan las columnas de fecha o importe
+    """
+    header_line = stream.readline()
+    delimiter = max((';', ',', '\t'), key=header_line.count)
+    header = next(csv.reader([header_line], delimiter=delimiter))
+
+    aliases = {alias: key for key, names in CSV_COLUMNS.items() for alias in names}
+    columns = {}
+    for index, name in enumerate(header):
+        key = aliases.get(_normalize_header(name))
+        if key and key not in columns:
+            columns[key] = index
+
+    missing = [key for key in ('date', 'amount') if key not in columns]
+    if missing:
+        raise ImportRowError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+
+    for line_number, values in enumerate(csv.reader(stream, delimiter=delimiter), start=2):
+        if not any(values):
+            continue
+        yield line_number, {
+            key: values[index] if index < len(values) else ''
+            for key, index in columns.items()
+        }
+
+
+def iter_ofx_rows(stream, chunk_size=64 * 1024):
+    """
+    Recorre las transacciones (STMTTRN) de un fichero OFX
+
+    Funciona con OFX 1.x (SGML, sin etiquetas de cierre) y 2.x (XML),
+    leyendo el fichero por bloques.
+
+    Args:
+        stream: Fichero de texto abierto
+        chunk_size: Caracteres leídos en cada bloque
+
+    Yields:
+        tuple: (número de transacción, dict con date, amount y description)
+    """
+    transaction_number = 0
+    current = None
+    buffer = ''
+
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        # Procesar solo hasta la última etiqueta completa del buffer
+        cut = buffer.rfind('<') if chunk else len(buffer)
+        for closing, tag, value in _OFX_TAG.findall(buffer[:cut]):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    transaction_number += 1
+                    yield transaction_number, current
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+        buffer = buffer[cut:]
+        if not chunk:
+            break
+
+
+def ofx_to_expense_row(transaction_row):
+    """
+    Traduce una transacción OFX al formato de fila de iter_csv_rows
+
+    La descripción usa NAME y, si existe, MEMO.
+    """
+    description = ' - '.join(
+        part for part in (transaction_row.get('NAME'), transaction_row.get('MEMO')) if part
+    )
+    return {
+        'date': transaction_row.get('DTPOSTED', ''),
+        'amount': transaction_row.get('TRNAMT', ''),
+        'description': description,
+    }
+
+
+def iter_import_rows(stream, file_format):
+    """
+    Recorre las filas de un extracto en CSV u OFX con un formato común
+
+    Args:
+        stream: Fichero de texto abierto
+        file_format: 'csv' u 'ofx'
+
+    Yields:
+        tuple: (número de línea o transacción, dict de columnas)
+    """
+    if file_format == 'ofx':
+        for number, transaction_row in iter_ofx_rows(stream):
+            yield number, ofx_to_expense_row(transaction_row)
+    else:
+        yield from iter_csv_rows(stream)
+
+
+def detect_format(filename):
+    """Deduce el formato del fichero por su extensión ('ofx' o 'csv')"""
+    return 'ofx' if filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+
+def build_category_map():
+    """
+    Diccionario nombre de categoría → id, con nombres en minúsculas y sin tildes
+
+    Se construye una sola vez por importación desde el registro de
+    categorías en lugar de buscar la categoría de cada fila.
+    """
+    return {_normalize_header(info.name): info.id for info in categories.all()}
+
+
+def build_expense(user_id, row, category_map, default_category_id=None, debits_only=False):
+    """
+    Valida una fila y construye el Expense sin guardarlo
+
+    Aplica las reglas de Expense: importe mayor que cero, con como mucho
+    dos decimales (no se redondea) y dentro de max_digits, categoría
+    existente y longitudes máximas.
+
+    Args:
+        user_id: ID del usuario
+        row: dict con date, amount y opcionalmente description, category y location
+        category_map: Resultado de build_category_map
+        default_category_id: Categoría para las filas sin categoría reconocida
+        debits_only: Importar solo cargos (importe negativo) como gastos
+
+    Returns:
+        Expense: Gasto listo para bulk_create, o None si la fila se omite (abono)
+
+    Raises:
+        ImportRowError: si la fila no es válida
+    """
+    amount = parse_amount(row['amount'])
+    if debits_only:
+        if amount >= 0:
+            return None
+        amount = -amount
+    else:
+        amount = abs(amount)
+
+    # Antes de cuantizar: con importes enormes (p. ej. '1e30') quantize excede la precisión
+    if amount >= MAX_AMOUNT:
+        raise ImportRowError(f'Importe demasiado grande: {row["amount"]!r}')
+    try:
+        quantized = amount.quantize(CENT)
+    except InvalidOperation:
+        raise ImportRowError(f'Importe no válido: {row["amount"]!r}')
+    if amount != quantized:
+        raise ImportRowError(f'El importe tiene más de dos decimales: {row["amount"]!r}')
+    amount = quantized
+    if amount <= 0:
+        raise ImportRowError('El monto debe ser mayor que cero.')
+
+    category_name = row.get('category')
+    category_id = category_map.get(_normalize_header(category_name)) if category_name else None
+    if category_id is None:
+        category_id = default_category_id
+    if category_id is None:
+        raise ImportRowError(f'Categoría desconocida: {category_name!r}' if category_name else 'Falta la categoría')
+
+    return Expense(
+        user_id=user_id,
+        category_id=category_id,
+        amount=amount,
+        date=parse_date(row['date']),
+        description=(row.get('description') or '').strip()[:DESCRIPTION_MAX_LENGTH] or None,
+        location=(row.get('location') or '').strip()[:LOCATION_MAX_LENGTH] or None,
+    )
+
+
+def duplicate_key(expense):
+    """Clave con la que se reconoce un movimiento ya importado: fecha, importe y descripción"""
+    return expense.date, expense.amount, expense.description
+
+
+def _existing_counts(user_id, expenses):
+    """
+    Cuenta los gastos ya guardados del usuario por clave de duplicado
+
+    Una consulta agrupada acotada al rango de fechas del lote (índice
+    user, date).
+
+    Returns:
+        Counter: duplicate_key → número de gastos guardados
+    """
+    dates = [expense.date for expense in expenses]
+    rows = (
+        Expense.objects
+        .filter(user_id=user_id, date__gte=min(dates), date__lte=max(dates))
+        .values_list('date', 'amount', 'description')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    return Counter({(day, amount, description): count for day, amount, description, count in rows})
+
+
+def _drop_duplicates(user_id, expenses, seen, created):
+    """
+    Quita del lote los movimientos que ya estaban guardados antes de importar
+
+    Se comparan multiplicidades, no solo la clave: dos cafés iguales el
+    mismo día en el extracto se importan los dos la primera vez, y ninguno
+    al volver a subirlo. Un extracto que solapa con uno anterior solo añade
+    los movimientos nuevos.
+
+    Args:
+        user_id: ID del usuario
+        expenses: Gastos válidos del lote
+        seen: Counter de claves vistas en el fichero hasta ahora (se actualiza)
+        created: Counter de claves creadas por esta importación (se actualiza)
+
+    Returns:
+        tuple: (gastos a guardar, número de duplicados descartados)
+    """
+    existing = _existing_counts(user_id, expenses)
+    new_expenses = []
+    for expense in expenses:
+        key = duplicate_key(expense)
+        seen[key] += 1
+        # Guardados antes de empezar esta importación
+        if seen[key] <= existing[key] - created[key]:
+            continue
+        created[key] += 1
+        new_expenses.append(expense)
+    return new_expenses, len(expenses) - len(new_expenses)
+
+
+def _save_batch(user, expenses):
+    """
+    Guarda un lote de gastos y actualiza agregados, caché y alertas una vez
+
+    Returns:
+        int: Gastos creados
+    """
+    deltas = {}
+    for expense in expenses:
+        key = (month_start(expense.date), expense.category_id)
+        amount, count = deltas.get(key, (Decimal('0'), 0))
+        deltas[key] = (amount + expense.amount, count + 1)
+
+    with transaction.atomic():
+        Expense.objects.bulk_create(expenses, batch_size=len(expenses))
+        months = apply_bulk_deltas(user.id, deltas)
+        bump_data_version(user.id, expense_date=max(expense.date for expense in expenses))
+        mark_snapshots_stale(user.id, months)
+        for month in sorted(months):
+            evaluate_budget_alerts(user, month)
+
+    return len(expenses)
+
+
+def import_expenses(user, rows, default_category=None, debits_only=False, batch_size=IMPORT_BATCH_SIZE,
+                    skip_duplicates=True):
+    """
+    Importa gastos en lotes a partir de filas ya leídas del fichero
+
+    Las filas no válidas se omiten y se informan (hasta MAX_REPORTED_ERRORS).
+    Cada lote se guarda en su propia transacción: si la importación se
+    interrumpe, los lotes anteriores quedan guardados y consistentes.
+
+    Los movimientos que ya existían (misma fecha, importe y descripción)
+    se descartan, así que volver a subir un extracto, o uno que solapa con
+    otro anterior, no duplica gastos.
+
+    Args:
+        user: Usuario al que se asignan los gastos
+        rows: Iterable de (número de línea, dict de columnas)
+        default_category: Categoría para filas sin categoría reconocida (o None)
+        debits_only: Importar solo cargos (importes negativos)
+        batch_size: Gastos por lote
+        skip_duplicates: Descartar los movimientos ya guardados
+
+    Returns:
+        dict: created, skipped, duplicates, error_count y errors (lista de (línea, mensaje))
+    """
+    category_map = build_category_map()
+    default_category_id = default_category.id if default_category else None
+    result = {'created': 0, 'skipped': 0, 'duplicates': 0, 'error_count': 0, 'errors': []}
+    seen, created = Counter(), Counter()
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+
+        batch = []
+        for line_number, row in chunk:
+            try:
+                expense = build_expense(user.id, row, category_map, default_category_id, debits_only)
+            except ImportRowError as e:
+                result['error_count'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append((line_number, str(e)))
+                continue
+            if expense is None:
+                result['skipped'] += 1
+            else:
+                batch.append(expense)
+
+        if batch and skip_duplicates:
+            batch, duplicates = _drop_duplicates(user.id, batch, seen, created)
+            result['duplicates'] += duplicates
+        if batch:
+            result['created'] += _save_batch(user, batch)
+
+    return result
@@ -0,0 +1,73 @@
+"""
+Utilidades para serializar importes de dinero
+
+Este módulo es la única capa de conversión de importes para la salida:
+- API de reportes y webhooks a n8n: números JSON en euros
+- Gráficos del dashboard: céntimos enteros
+
+Los importes se suman siempre como Decimal (en SQL o en Python) y solo se
+convierten al final, una vez por valor. Un Decimal redondeado a céntimos
+convertido a float se escribe en JSON con los mismos dígitos (repr de
+float es el decimal más corto que lo representa), así que no hay deriva
+de redondeo mientras no se opere después con el float.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+
+def quantize_money(value):
+    """
+    Redondea un importe a céntimos
+
+    Args:
+        value: Decimal, int o None (None se trata como 0)
+
+    Returns:
+        Decimal: Importe con dos decimales
+    """
+    return Decimal(value or 0).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_cents(value):
+    """
+    Convierte un importe a céntimos enteros (exacto, sin pasar por float)
+
+    Args:
+        value: Decimal, int o None
+
+    Returns:
+        int: Céntimos
+    """
+    return int(quantize_money(value) * HUNDRED)
+
+
+def money(value):
+    """
+    Importe en euros listo para JSON (API y webhooks)
+
+    Args:
+        value: Decimal, int o None
+
+    Returns:
+        float: Importe redondeado a céntimos
+    """
+    return float(quantize_money(value))
+
+
+def percentage(part, total):
+    """
+    Porcentaje de part sobre total calculado en Decimal
+
+    Args:
+        part: Importe parcial
+        total: Importe total (0 o None devuelve 0)
+
+    Returns:
+        float: Porcentaje con dos decimales
+    """
+    if not total:
+        return 0.0
+    return float((Decimal(part) / Decimal(total) * HUNDRED).quantize(CENT, rounding=ROUND_HALF_UP))
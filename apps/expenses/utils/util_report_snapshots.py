@@ -0,0 +1,247 @@
+"""
+Utilidades para los reportes mensuales precalculados (ReportSnapshot)
+
+Este módulo contiene funciones especializadas en:
+- Generación por lotes de la respuesta de /api/users/{id}/complete/ para un
+  mes cerrado, con las mismas consultas agrupadas que el endpoint batch
+- Compresión con gzip y guardado con un único upsert por lote
+- Detección de las peticiones que puede servir un reporte precalculado
+- Respuesta HTTP con los bytes guardados (comprimidos si el cliente acepta gzip)
+- Marcado como desactualizados cuando un cambio tardío toca un mes cerrado
+  y regeneración de cada uno por una sola petición (el resto sirve los
+  bytes anteriores mientras tanto)
+
+El workflow mensual de n8n pide ?months=1 para todos los usuarios activos
+a la vez; con los reportes generados antes (build_monthly_reports) cada
+petición es una lectura por clave y no serializa nada.
+
+Los totales de toda la vida del reporte (primer y último gasto, total)
+corresponden al momento de generarlo (metadata.generated_at): los gastos
+del mes en curso no lo desactualizan.
+"""
+
+import gzip
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+from ..api.serializers import UserReportSerializer
+from ..models import ReportSnapshot
+from .util_conditional import make_etag, not_modified, set_validators
+from .util_reports import iter_complete_histories
+from .util_rollups import month_start
+
+SNAPSHOT_BATCH_SIZE = 200
+SNAPSHOT_FIELDS = ('payload', 'size', 'stale', 'built_at')
+
+
+def month_window(month):
+    """
+    Ventana de historial de un mes completo (formato de parse_history_window)
+
+    Args:
+        month: Cualquier fecha del mes
+
+    Returns:
+        dict: start, end y updated_since
+    """
+    start = month_start(month)
+    end = month_start(start + timedelta(days=32)) - timedelta(days=1)
+    return {'start': start, 'end': end, 'updated_since': None}
+
+
+def last_closed_month():
+    """Primer día del mes anterior al actual"""
+    return month_start(month_start(timezone.localdate()) - timedelta(days=1))
+
+
+def snapshot_month(window):
+    """
+    Mes precalculado que corresponde a una ventana de la petición
+
+    Solo ventanas de un mes completo ya cerrado y sin updated_since
+    (p. ej. ?months=1 o ?from=2025-03-01&to=2025-03-31).
+
+    Args:
+        window: dict de parse_history_window
+
+    Returns:
+        date: Primer día del mes, o None si la petición se calcula en vivo
+    """
+    start = window.get('start')
+    if start is None or window.get('updated_since') or start.day != 1:
+        return None
+    if window.get('end') != month_window(start)['end'] or start >= month_start(timezone.localdate()):
+        return None
+    return start
+
+
+def encode_report(body):
+    """
+    Renderiza el reporte como la API (JSONRenderer de DRF) y lo comprime
+
+    Returns:
+        tuple: (bytes comprimidos, tamaño sin comprimir)
+    """
+    content = JSONRenderer().render(body)
+    return gzip.compress(content, compresslevel=6), len(content)
+
+
+def build_snapshots(users, month, batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Genera y guarda los reportes de un mes para varios usuarios
+
+    Cada lote usa las consultas agrupadas de iter_complete_histories y un
+    único bulk_create con upsert sobre (user, month).
+
+    Args:
+        users: Lista de usuarios con presupuesto (con select_related('budget')), ordenada por id
+        month: Primer día del mes
+        batch_size: Usuarios por lote
+
+    Returns:
+        int: Reportes guardados
+    """
+    window = month_window(month)
+    saved = 0
+    for offset in range(0, len(users), batch_size):
+        batch = users[offset:offset + batch_size]
+        built_at = timezone.now()
+        snapshots = []
+        for user, history in iter_complete_histories(batch, window):
+            body = {
+                **UserReportSerializer(user).data,
+                'complete_history': history,
+                'metadata': {
+                    'generated_at': built_at.isoformat(),
+                    'api_version': '1.0',
+                    'data_complete': False,
+                },
+            }
+            payload, size = encode_report(body)
+            snapshots.append(ReportSnapshot(
+                user=user, month=month, payload=payload, size=size, stale=False, built_at=built_at
+            ))
+        ReportSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['user', 'month'],
+            update_fields=list(SNAPSHOT_FIELDS)
+        )
+        saved += len(snapshots)
+    return saved
+
+
+def get_snapshot(user_id, month):
+    """
+    Devuelve el reporte guardado de un usuario y mes, si lo hay
+
+    Un reporte desactualizado lo regenera una sola petición: las demás
+    (el resto del fan-out de n8n, o un reintento simultáneo) encuentran la
+    fila bloqueada y sirven los bytes anteriores mientras tanto. Si el
+    reporte no existe (el comando todavía no se ha ejecutado) no se genera
+    aquí: la petición se calcula en vivo sin escribir nada.
+
+    Args:
+        user_id: ID del usuario
+        month: Primer día del mes
+
+    Returns:
+        ReportSnapshot, o None si hay que calcular la respuesta en vivo
+    """
+    snapshot = ReportSnapshot.objects.filter(user_id=user_id, month=month).first()
+    if snapshot is None or not snapshot.stale:
+        return snapshot
+    return _refresh_stale_snapshot(snapshot)
+
+
+def _refresh_stale_snapshot(snapshot):
+    """
+    Regenera un reporte desactualizado si ninguna otra petición lo está haciendo
+
+    Args:
+        snapshot: ReportSnapshot marcado como stale
+
+    Returns:
+        ReportSnapshot regenerado, el mismo snapshot si otro proceso lo tiene
+        bloqueado, o None si el usuario ya no tiene presupuesto
+    """
+    with transaction.atomic():
+        locked = (
+            ReportSnapshot.objects
+            .select_for_update(skip_locked=True)
+            .filter(pk=snapshot.pk, stale=True)
+            .first()
+        )
+        if locked is None:
+            # Otra petición lo está regenerando (o ya lo ha hecho): servir los bytes anteriores
+            return snapshot
+
+        user = User.objects.filter(pk=snapshot.user_id, budget__isnull=False).select_related('budget').first()
+        if user is None:
+            return None
+        build_snapshots([user], snapshot.month)
+    return ReportSnapshot.objects.get(pk=snapshot.pk)
+
+
+def snapshot_etag(snapshot):
+    """ETag del reporte: cambia cada vez que se regenera"""
+    return make_etag('report-snapshot', snapshot.user_id, snapshot.month, snapshot.built_at.timestamp())
+
+
+def snapshot_response(request, snapshot):
+    """
+    Respuesta HTTP con los bytes del reporte
+
+    Si el cliente acepta gzip se envían tal cual con Content-Encoding: gzip;
+    si no, se descomprimen.
+
+    Args:
+        request: Petición (de Django o de DRF)
+        snapshot: ReportSnapshot
+
+    Returns:
+        HttpResponse (o 304 si la copia del cliente sigue siendo válida)
+    """
+    etag = snapshot_etag(snapshot)
+    response = not_modified(request, etag, snapshot.built_at)
+    if response is not None:
+        return response
+
+    payload = bytes(snapshot.payload)
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = HttpResponse(payload, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(payload), content_type='application/json')
+    response['X-Report-Snapshot'] = f"{snapshot.month:%Y-%m}"
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return set_validators(response, etag, snapshot.built_at)
+
+
+def mark_snapshots_stale(user_id=None, months=None):
+    """
+    Marca como desactualizados los reportes afectados por un cambio
+
+    Los meses no cerrados se ignoran: todavía no tienen reporte.
+
+    Args:
+        user_id: ID del usuario (None = todos, p. ej. al renombrar una categoría)
+        months: Fechas de los meses afectados (None = todos los del usuario)
+
+    Returns:
+        int: Reportes marcados
+    """
+    snapshots = ReportSnapshot.objects.filter(stale=False)
+    if user_id is not None:
+        snapshots = snapshots.filter(user_id=user_id)
+    if months is not None:
+        current_month = month_start(timezone.localdate())
+        months = {month_start(month) for month in months if month_start(month) < current_month}
+        if not months:
+            return 0
+        snapshots = snapshots.filter(month__in=months)
+    return snapshots.update(stale=True)
@@ -0,0 +1,306 @@
+"""
+Utilidades para los historiales de la API de reportes
+
+Este módulo contiene funciones especializadas en:
+- Resúmenes de historial (mensuales, por categoría y totales) para varios
+  usuarios a la vez, con un número fijo de consultas agrupadas
+- Recorrido de los gastos de varios usuarios en una sola consulta
+- Construcción del bloque complete_history de cada usuario
+
+El número de consultas no depende del número de usuarios: cada tipo de
+resumen es una única consulta agrupada por user_id. Los importes se suman
+como Decimal y solo se convierten al construir la respuesta (util_money).
+Las filas llevan category_id y el nombre sale del registro de categorías
+(util_categories), sin JOIN.
+"""
+
+from decimal import Decimal
+from datetime import timedelta
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+from ..models import Expense, MonthlyUserSpend, MonthlyUserCategorySpend
+from .util_categories import categories
+from .util_export import EXPORT_CHUNK_SIZE, EXPORT_FIELDS, expense_row_to_dict
+from .util_money import money, percentage
+
+
+
+def is_month_aligned(start, end):
+    """
+    Indica si la ventana cubre meses completos
+
+    Args:
+        start: Inicio de la ventana (o None)
+        end: Fin de la ventana (o None)
+
+    Returns:
+        bool: True si empieza en día 1 y termina en último día de mes
+    """
+    starts_on_month = start is None or start.day == 1
+    ends_on_month = end is None or (end + timedelta(days=1)).day == 1
+    return starts_on_month and ends_on_month
+
+
+def _window_month_rows(user_ids, start, end):
+    """
+    Filas (user_id, mes, category_id, total, count) de la ventana
+
+    Si la ventana cubre meses completos se leen de MonthlyUserCategorySpend.
+    Si corta algún mes se agrupan los gastos en SQL para no contar los días
+    que quedan fuera.
+    """
+    if is_month_aligned(start, end):
+        rows = MonthlyUserCategorySpend.objects.filter(user_id__in=user_ids, count__gt=0)
+        if start:
+            rows = rows.filter(month__gte=start)
+        if end:
+            rows = rows.filter(month__lte=end)
+        return rows.values_list('user_id', 'month', 'category_id', 'total', 'count')
+
+    expenses = Expense.objects.filter(user_id__in=user_ids)
+    if start:
+        expenses = expenses.filter(date__gte=start)
+    if end:
+        expenses = expenses.filter(date__lte=end)
+    return expenses.annotate(month=TruncMonth('date')).values(
+        'user_id', 'month', 'category_id'
+    ).annotate(
+        total=Sum('amount'),
+        count=Count('id')
+    ).order_by().values_list('user_id', 'month', 'category_id', 'total', 'count')
+
+
+def build_history_summaries(user_ids, start=None, end=None):
+    """
+    Calcula los resúmenes de historial de varios usuarios
+
+    Usa tres consultas agrupadas sea cual sea el número de usuarios:
+    límites de fechas, totales de toda la vida y filas mes/categoría
+    de la ventana.
+
+    Args:
+        user_ids: IDs de los usuarios
+        start: Inicio de la ventana (o None)
+        end: Fin de la ventana (o None)
+
+    Returns:
+        dict: {user_id: {'first', 'last', 'total', 'count', 'window_total',
+               'window_count', 'months', 'categories'}} con importes Decimal.
+               Los usuarios sin gastos no aparecen.
+    """
+    summaries = {}
+
+    bounds = Expense.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+        first=Min('date'),
+        last=Max('date')
+    ).order_by()
+    for row in bounds:
+        summaries[row['user_id']] = {
+            'first': row['first'],
+            'last': row['last'],
+            'total': Decimal('0'),
+            'count': 0,
+            'window_total': Decimal('0'),
+            'window_count': 0,
+            'months': {},
+            'categories': {},
+        }
+
+    lifetime = MonthlyUserSpend.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+        total=Sum('total'),
+        count=Sum('count')
+    ).order_by()
+    for row in lifetime:
+        summary = summaries.get(row['user_id'])
+        if summary is not None:
+            summary['total'] = row['total'] or Decimal('0')
+            summary['count'] = row['count'] or 0
+
+    for user_id, month, category_id, total, count in _window_month_rows(user_ids, start, end):
+        summary = summaries.get(user_id)
+        if summary is None:
+            continue
+        info = categories.get(category_id)
+        cat_name = info.name if info else str(category_id)
+
+        month_summary = summary['months'].setdefault(
+            month, {'total': Decimal('0'), 'count': 0, 'categories': {}}
+        )
+        month_summary['total'] += total
+        month_summary['count'] += count
+        month_summary['categories'][cat_name] = month_summary['categories'].get(cat_name, Decimal('0')) + total
+
+        category = summary['categories'].setdefault(cat_name, {'total': Decimal('0'), 'count': 0})
+        category['total'] += total
+        category['count'] += count
+
+        summary['window_total'] += total
+        summary['window_count'] += count
+
+    return summaries
+
+
+def iter_expenses_by_user(user_ids, start=None, end=None, updated_since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Recorre los gastos de varios usuarios con una sola consulta
+
+    Los gastos se leen ordenados por usuario y se agrupan al vuelo, así que
+    solo se mantienen en memoria los gastos de un usuario cada vez.
+
+    Args:
+        user_ids: IDs de los usuarios
+        start: Inicio de la ventana (o None)
+        end: Fin de la ventana (o None)
+        updated_since: Solo gastos creados o editados desde entonces (o None)
+        chunk_size: Filas leídas de la base de datos en cada lote
+
+    Yields:
+        tuple: (user_id, lista de gastos en formato ExpenseSerializer)
+    """
+    expenses = Expense.objects.filter(user_id__in=user_ids)
+    if start:
+        expenses = expenses.filter(date__gte=start)
+    if end:
+        expenses = expenses.filter(date__lte=end)
+    if updated_since:
+        expenses = expenses.filter(updated_at__gte=updated_since)
+
+    rows = expenses.order_by('user_id', '-date', '-created_at', '-id').values('user_id', *EXPORT_FIELDS)
+
+    current_user_id = None
+    current = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        if row['user_id'] != current_user_id:
+            if current:
+                yield current_user_id, current
+            current_user_id = row['user_id']
+            current = []
+        current.append(expense_row_to_dict(row))
+    if current:
+        yield current_user_id, current
+
+
+def empty_history(window_info):
+    """
+    Historial de un usuario sin gastos
+
+    Args:
+        window_info: dict con from, to y updated_since de la ventana
+
+    Returns:
+        dict: Bloque complete_history vacío
+    """
+    return {
+        'first_expense': None,
+        'last_expense': None,
+        'total_months_active': 0,
+        'total_expenses': 0,
+        'total_expense_count': 0,
+        'window': {**window_info, 'total': 0, 'count': 0},
+        'all_expenses': [],
+        'monthly_summaries': {},
+        'categories_summary': {}
+    }
+
+
+def format_history(summary, expenses, window_info):
+    """
+    Construye el bloque complete_history a partir de un resumen
+
+    Args:
+        summary: Resumen del usuario (ver build_history_summaries) o None
+        expenses: Lista de gastos serializados de la ventana
+        window_info: dict con from, to y updated_since de la ventana
+
+    Returns:
+        dict: Bloque complete_history con importes en euros (ver util_money)
+    """
+    if summary is None:
+        return empty_history(window_info)
+
+    first_expense = summary['first']
+    last_expense = summary['last']
+    months_diff = (last_expense.year - first_expense.year) * 12 + (last_expense.month - first_expense.month)
+
+    monthly_summaries = {}
+    for month in sorted(summary['months'], reverse=True):
+        month_summary = summary['months'][month]
+        monthly_summaries[f"{month:%Y-%m}"] = {
+            'total': money(month_summary['total']),
+            'count': month_summary['count'],
+            'categories': {
+                cat_name: money(total) for cat_name, total in month_summary['categories'].items()
+            }
+        }
+
+    window_total = summary['window_total']
+    categories_summary = {}
+    for cat_name, category in sorted(summary['categories'].items(), key=lambda item: -item[1]['total']):
+        categories_summary[cat_name] = {
+            'total': money(category['total']),
+            'count': category['count'],
+            'percentage': percentage(category['total'], window_total)
+        }
+
+    return {
+        'first_expense': first_expense.isoformat(),
+        'last_expense': last_expense.isoformat(),
+        'total_months_active': months_diff + 1,
+        'total_expenses': money(summary['total']),
+        'total_expense_count': summary['count'],
+        'window': {**window_info, 'total': money(window_total), 'count': summary['window_count']},
+        'all_expenses': expenses,
+        'monthly_summaries': monthly_summaries,
+        'categories_summary': categories_summary
+    }
+
+
+def window_info(window):
+    """
+    Describe la ventana solicitada para incluirla en la respuesta
+
+    Args:
+        window: dict con start, end y updated_since (o None)
+
+    Returns:
+        dict: from, to y updated_since en formato ISO (o None)
+    """
+    window = window or {}
+    return {
+        'from': window['start'].isoformat() if window.get('start') else None,
+        'to': window['end'].isoformat() if window.get('end') else None,
+        'updated_since': window['updated_since'].isoformat() if window.get('updated_since') else None,
+    }
+
+
+def iter_complete_histories(users, window=None):
+    """
+    Genera el bloque complete_history de cada usuario
+
+    Calcula primero los resúmenes de todos los usuarios y después recorre
+    sus gastos en una única consulta ordenada.
+
+    Args:
+        users: Lista de usuarios, ordenada por id
+        window: dict con start, end y updated_since (o None)
+
+    Yields:
+        tuple: (user, complete_history)
+    """
+    window = window or {}
+    info = window_info(window)
+    user_ids = [user.id for user in users]
+    summaries = build_history_summaries(user_ids, window.get('start'), window.get('end'))
+
+    expense_groups = iter_expenses_by_user(
+        [user_id for user_id in user_ids if user_id in summaries],
+        window.get('start'), window.get('end'), window.get('updated_since')
+    )
+    pending = next(expense_groups, None)
+
+    for user in users:
+        expenses = []
+        if pending is not None and pending[0] == user.id:
+            expenses = pending[1]
+            pending = next(expense_groups, None)
+        yield user, format_history(summaries.get(user.id), expenses, info)
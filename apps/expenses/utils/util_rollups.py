@@ -0,0 +1,244 @@
+"""
+Utilidades para las tablas de agregados mensuales
+
+Este módulo contiene funciones especializadas en:
+- Mantenimiento incremental de MonthlyUserSpend y MonthlyUserCategorySpend
+- Lectura de totales mensuales sin agregar sobre Expense
+- Reconstrucción y verificación de los agregados desde cero
+"""
+
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from ..models import Expense, MonthlyUserSpend, MonthlyUserCategorySpend
+
+
+def month_start(value):
+    """
+    Normaliza una fecha al primer día de su mes
+
+    Args:
+        value: date a normalizar
+
+    Returns:
+        date: Primer día del mes
+    """
+    return value.replace(day=1)
+
+
+def _bump(model, lookup, amount, count):
+    """
+    Suma amount/count a la fila de agregados indicada, creándola si no existe
+
+    Las restas nunca crean filas: si la fila no existe (p. ej. durante el
+    borrado en cascada de un usuario) no hay nada que descontar.
+    """
+    updated = model.objects.filter(**lookup).update(
+        total=F('total') + amount,
+        count=F('count') + count
+    )
+    if updated or count < 0:
+        return
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, total=amount, count=count)
+    except IntegrityError:
+        # Otra petición creó la fila a la vez: aplicar la suma sobre ella
+        model.objects.filter(**lookup).update(
+            total=F('total') + amount,
+            count=F('count') + count
+        )
+
+
+def apply_expense_delta(user_id, category_id, date, amount, count):
+    """
+    Aplica un cambio (positivo o negativo) a los agregados de un mes
+
+    Args:
+        user_id: ID del usuario
+        category_id: ID de la categoría
+        date: Fecha del gasto
+        amount: Importe a sumar (negativo para restar)
+        count: Número de gastos a sumar (1 o -1)
+    """
+    month = month_start(date)
+    _bump(MonthlyUserSpend, {'user_id': user_id, 'month': month}, amount, count)
+    _bump(
+        MonthlyUserCategorySpend,
+        {'user_id': user_id, 'month': month, 'category_id': category_id},
+        amount,
+        count
+    )
+
+
+def apply_expense_change(old, new):
+    """
+    Actualiza los agregados a partir del estado anterior y posterior de un gasto
+
+    Args:
+        old: dict con user_id, category_id, date y amount anteriores (o None si es nuevo)
+        new: dict con user_id, category_id, date y amount actuales (o None si se borró)
+    """
+    if old and new and all(old[key] == new[key] for key in ('user_id', 'category_id', 'date', 'amount')):
+        return
+
+    if old:
+        apply_expense_delta(old['user_id'], old['category_id'], old['date'], -old['amount'], -1)
+    if new:
+        apply_expense_delta(new['user_id'], new['category_id'], new['date'], new['amount'], 1)
+
+
+def apply_bulk_deltas(user_id, deltas):
+    """
+    Suma a los agregados los gastos insertados en bloque (bulk_create no lanza señales)
+
+    Hace una actualización por (mes, categoría) y otra por mes, en lugar de
+    una por gasto.
+
+    Args:
+        user_id: ID del usuario
+        deltas: dict {(mes, category_id): (importe, número de gastos)}
+
+    Returns:
+        set: Meses afectados (primer día de cada mes)
+    """
+    monthly = {}
+    for (month, category_id), (amount, count) in deltas.items():
+        _bump(
+            MonthlyUserCategorySpend,
+            {'user_id': user_id, 'month': month, 'category_id': category_id},
+            amount,
+            count
+        )
+        total, total_count = monthly.get(month, (Decimal('0'), 0))
+        monthly[month] = (total + amount, total_count + count)
+
+    for month, (amount, count) in monthly.items():
+        _bump(MonthlyUserSpend, {'user_id': user_id, 'month': month}, amount, count)
+
+    return set(monthly)
+
+
+def get_month_total(user, date):
+    """
+    Obtiene el total gastado por el usuario en el mes de la fecha indicada
+
+    Args:
+        user: Usuario
+        date: Cualquier fecha del mes a consultar
+
+    Returns:
+        Decimal: Total del mes (0 si no hay gastos)
+    """
+    total = MonthlyUserSpend.objects.filter(
+        user=user,
+        month=month_start(date)
+    ).values_list('total', flat=True).first()
+    return total if total is not None else Decimal('0')
+
+
+def _raw_month_rows(user_ids=None):
+    """Agrega los gastos originales por usuario, mes y categoría"""
+    expenses = Expense.objects.all()
+    if user_ids is not None:
+        expenses = expenses.filter(user_id__in=user_ids)
+
+    return expenses.annotate(month=TruncMonth('date')).values(
+        'user_id', 'month', 'category_id'
+    ).annotate(
+        total=Sum('amount'),
+        count=Count('id')
+    ).order_by()
+
+
+def rebuild_rollups(user_ids=None, batch_size=1000):
+    """
+    Reconstruye los agregados mensuales desde los gastos originales
+
+    Args:
+        user_ids: Lista de IDs de usuario a reconstruir (None = todos)
+        batch_size: Tamaño de lote para bulk_create
+
+    Returns:
+        tuple: (filas_mensuales, filas_por_categoria) creadas
+    """
+    monthly = {}
+    category_rows = []
+
+    for row in _raw_month_rows(user_ids).iterator():
+        key = (row['user_id'], row['month'])
+        total, count = monthly.get(key, (Decimal('0'), 0))
+        monthly[key] = (total + row['total'], count + row['count'])
+        category_rows.append(MonthlyUserCategorySpend(
+            user_id=row['user_id'],
+            month=row['month'],
+            category_id=row['category_id'],
+            total=row['total'],
+            count=row['count']
+        ))
+
+    monthly_rows = [
+        MonthlyUserSpend(user_id=user_id, month=month, total=total, count=count)
+        for (user_id, month), (total, count) in monthly.items()
+    ]
+
+    with transaction.atomic():
+        monthly_qs = MonthlyUserSpend.objects.all()
+        category_qs = MonthlyUserCategorySpend.objects.all()
+        if user_ids is not None:
+            monthly_qs = monthly_qs.filter(user_id__in=user_ids)
+            category_qs = category_qs.filter(user_id__in=user_ids)
+        monthly_qs.delete()
+        category_qs.delete()
+
+        MonthlyUserSpend.objects.bulk_create(monthly_rows, batch_size=batch_size)
+        MonthlyUserCategorySpend.objects.bulk_create(category_rows, batch_size=batch_size)
+
+    return len(monthly_rows), len(category_rows)
+
+
+def verify_rollups(user_ids=None):
+    """
+    Compara los agregados guardados con los calculados desde los gastos
+
+    Args:
+        user_ids: Lista de IDs de usuario a verificar (None = todos)
+
+    Returns:
+        list: Diferencias encontradas como tuplas (clave, esperado, guardado)
+    """
+    expected = {}
+    for row in _raw_month_rows(user_ids).iterator():
+        key = (row['user_id'], row['month'], row['category_id'])
+        expected[key] = (row['total'], row['count'])
+
+    stored = {}
+    category_qs = MonthlyUserCategorySpend.objects.filter(count__gt=0)
+    monthly_qs = MonthlyUserSpend.objects.filter(count__gt=0)
+    if user_ids is not None:
+        category_qs = category_qs.filter(user_id__in=user_ids)
+        monthly_qs = monthly_qs.filter(user_id__in=user_ids)
+
+    for row in category_qs.values('user_id', 'month', 'category_id', 'total', 'count').iterator():
+        key = (row['user_id'], row['month'], row['category_id'])
+        stored[key] = (row['total'], row['count'])
+
+    expected_monthly = {}
+    for (user_id, month, _), (total, count) in expected.items():
+        prev_total, prev_count = expected_monthly.get((user_id, month), (Decimal('0'), 0))
+        expected_monthly[(user_id, month)] = (prev_total + total, prev_count + count)
+
+    stored_monthly = {
+        (row['user_id'], row['month']): (row['total'], row['count'])
+        for row in monthly_qs.values('user_id', 'month', 'total', 'count').iterator()
+    }
+
+    mismatches = []
+    for expected_rows, stored_rows in ((expected, stored), (expected_monthly, stored_monthly)):
+        for key in expected_rows.keys() | stored_rows.keys():
+            if expected_rows.get(key) != stored_rows.get(key):
+                mismatches.append((key, expected_rows.get(key), stored_rows.get(key)))
+
+    return mismatches
@@ -0,0 +1,204 @@
+"""
+Utilidades para el envío de webhooks a n8n
+
+Este módulo contiene funciones especializadas en:
+- Encolar webhooks en WebhookOutbox dentro de la transacción actual
+- Reclamar lotes de webhooks pendientes (varios workers a la vez)
+- Enviarlos con una sesión HTTP reutilizable
+- Reintentos con backoff exponencial y descarte tras el máximo de intentos
+
+La petición del usuario solo inserta una fila. El envío lo hace el
+comando process_webhook_outbox en un proceso aparte.
+"""
+
+import logging
+import random
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from apps.core.metrics import record_webhook
+from ..models import WebhookOutbox
+
+logger = logging.getLogger(__name__)
+
+# Tiempo que un worker reserva un webhook reclamado antes de que otro pueda reintentarlo
+CLAIM_LEASE = timedelta(minutes=2)
+
+# Respuestas 4xx que sí merece la pena reintentar
+RETRYABLE_CLIENT_ERRORS = {408, 409, 425, 429}
+
+_session = None
+
+
+def enqueue_webhook(webhook, payload):
+    """
+    Guarda un webhook para enviarlo en segundo plano
+
+    Debe llamarse dentro de la misma transacción que el cambio que lo
+    origina: si la transacción se deshace, el webhook tampoco se envía.
+
+    Args:
+        webhook: Ruta del webhook en n8n (p. ej. 'budget-alert')
+        payload: dict serializable a JSON
+
+    Returns:
+        WebhookOutbox: Fila creada
+    """
+    return WebhookOutbox.objects.create(webhook=webhook, payload=payload)
+
+
+def get_webhook_session():
+    """
+    Sesión HTTP compartida por todos los envíos del proceso
+
+    Reutiliza las conexiones TCP/TLS con n8n entre webhooks y lleva ya
+    la cabecera de autenticación Bearer.
+
+    Returns:
+        requests.Session: Sesión configurada
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {settings.N8N_WEBHOOK_TOKEN}'
+        })
+        _session = session
+    return _session
+
+
+def webhook_url(webhook):
+    """
+    Construye la URL del webhook
+
+    Usa la URL interna para comunicación Docker, con la URL base como alternativa.
+    """
+    base_url = getattr(settings, 'N8N_INTERNAL_URL', settings.N8N_BASE_URL)
+    return f"{base_url}/webhook/{webhook}"
+
+
+def retry_delay(attempts):
+    """
+    Espera antes del siguiente intento (backoff exponencial con jitter)
+
+    Args:
+        attempts: Intentos fallidos hasta ahora (1 tras el primer fallo)
+
+    Returns:
+        timedelta: Tiempo hasta el siguiente intento
+    """
+    base = settings.WEBHOOK_OUTBOX_BACKOFF_BASE
+    delay = min(base * 2 ** (attempts - 1), settings.WEBHOOK_OUTBOX_BACKOFF_MAX)
+    # Jitter del ±20% para que los reintentos de muchos webhooks no coincidan
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_pending_webhooks(batch_size=50):
+    """
+    Reclama un lote de webhooks pendientes cuyo próximo intento ya ha llegado
+
+    Los webhooks reclamados se aplazan CLAIM_LEASE: si el worker muere a
+    mitad de envío, otro los reintentará al vencer la reserva. En PostgreSQL
+    SKIP LOCKED permite varios workers sin que se pisen.
+
+    Args:
+        batch_size: Máximo de webhooks a reclamar
+
+    Returns:
+        list: Webhooks reclamados, los más antiguos primero
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            WebhookOutbox.objects.select_for_update(skip_locked=True).filter(
+                status=WebhookOutbox.STATUS_PENDING,
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at').values_list('id', flat=True)[:batch_size]
+        )
+        WebhookOutbox.objects.filter(id__in=ids).update(next_attempt_at=now + CLAIM_LEASE)
+    return list(WebhookOutbox.objects.filter(id__in=ids).order_by('created_at'))
+
+
+def deliver_webhook(outbox):
+    """
+    Envía un webhook y registra el resultado
+
+    - 2xx: se marca como enviado
+    - Error de red, timeout, 5xx o 4xx reintentable: se reprograma con backoff
+    - Otros 4xx o máximo de intentos alcanzado: se descarta (dead letter)
+
+    Args:
+        outbox: WebhookOutbox reclamado
+
+    Returns:
+        str: Estado final del webhook
+    """
+    outbox.attempts += 1
+    retryable = True
+    start = time.perf_counter()
+
+    try:
+        response = get_webhook_session().post(
+            webhook_url(outbox.webhook),
+            json=outbox.payload,
+            timeout=settings.WEBHOOK_TIMEOUT
+        )
+        if 200 <= response.status_code < 300:
+            outbox.status = WebhookOutbox.STATUS_SENT
+            outbox.sent_at = timezone.now()
+            outbox.last_error = ''
+            outbox.save(update_fields=['status', 'sent_at', 'attempts', 'last_error'])
+            record_webhook(outbox.webhook, 'sent', time.perf_counter() - start)
+            logger.info("Webhook %s #%s enviado", outbox.webhook, outbox.pk)
+            return outbox.status
+
+        error = f"HTTP {response.status_code}: {response.text[:500]}"
+        retryable = response.status_code >= 500 or response.status_code in RETRYABLE_CLIENT_ERRORS
+    except requests.exceptions.RequestException as e:
+        error = str(e)[:500]
+    elapsed = time.perf_counter() - start
+
+    outbox.last_error = error
+    if retryable and outbox.attempts < settings.WEBHOOK_OUTBOX_MAX_ATTEMPTS:
+        outbox.next_attempt_at = timezone.now() + retry_delay(outbox.attempts)
+        record_webhook(outbox.webhook, 'retry', elapsed)
+        logger.warning(
+            "Webhook %s #%s falló (intento %s), se reintentará: %s",
+            outbox.webhook, outbox.pk, outbox.attempts, error
+        )
+    else:
+        outbox.status = WebhookOutbox.STATUS_DEAD
+        record_webhook(outbox.webhook, 'dead', elapsed)
+        logger.error(
+            "Webhook %s #%s descartado tras %s intentos: %s",
+            outbox.webhook, outbox.pk, outbox.attempts, error
+        )
+
+    outbox.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error'])
+    return outbox.status
+
+
+def process_webhook_outbox(batch_size=50):
+    """
+    Reclama y envía un lote de webhooks pendientes
+
+    Args:
+        batch_size: Máximo de webhooks a procesar
+
+    Returns:
+        dict: Número de webhooks por estado final
+    """
+    results = {}
+    for outbox in claim_pending_webhooks(batch_size):
+        status = deliver_webhook(outbox)
+        results[status] = results.get(status, 0) + 1
+    return results
@@ -1,11 +1,29 @@
+import io
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET
 from django.contrib import messages
 from .models import Expense, Budget
-from .forms import ExpenseForm, BudgetForm
+from .forms import ExpenseForm, BudgetForm, ExpenseImportForm
 # Imports específicos de utils modularizados
-from .utils.util_dashboard import get_dashboard_context
-from .utils.util_expense_list import get_expense_list_context
+from .utils.util_cache import (
+    CACHEABLE_PERIODS,
+    chart_payload,
+    get_cached_dashboard_context,
+    get_data_stamp
+)
+from .utils.util_categories import categories
+from .utils.util_conditional import (
+    daily_last_modified,
+    make_etag,
+    not_modified,
+    query_fingerprint,
+    set_validators,
+    today_stamp
+)
+from .utils.util_expense_list import get_expense_list_context, get_expense_page_context
 from .utils.util_crud_operations import (
     get_expense_for_user,
     handle_expense_creation,
@@ -19,6 +37,7 @@ from .utils.util_crud_operations import (
     create_htmx_edit_response,
     create_htmx_delete_response
 )
+from .utils.util_import import ImportRowError, detect_format, import_expenses, iter_import_rows
 
 
 @login_required
@@ -26,18 +45,58 @@ def dashboard(request):
     """
     Muestra el dashboard principal con métricas de gastos
     Maneja filtros de período con HTMX
+    
+    Las peticiones HTMX llevan ETag: si los datos del usuario no han
+    cambiado se responde 304 sin renderizar.
     """
     # Obtener el período seleccionado del filtro
     period = request.GET.get('period', 'current_month')
-    
-    # Obtener todo el contexto del dashboard usando las funciones auxiliares
-    context = get_dashboard_context(request.user, period)
+    version, last_modified = get_data_stamp(request.user)
     
     # Si es una petición HTMX, devolver solo las métricas
     if request.headers.get('HX-Request'):
-        return render(request, 'expenses/partials/dashboard_metrics.html', context)
+        etag = make_etag(
+            'dashboard-metrics', request.user.pk, period, today_stamp(), version, categories.version()
+        )
+        last_modified = daily_last_modified(last_modified, categories.last_modified())
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            # Contexto cacheado por usuario, período y versión de datos
+            context = get_cached_dashboard_context(request.user, period, version)
+            response = render(request, 'expenses/partials/dashboard_metrics.html', context)
+        return set_validators(response, etag, last_modified, vary=['HX-Request'])
     
-    return render(request, 'expenses/dashboard.html', context)
+    context = get_cached_dashboard_context(request.user, period, version)
+    response = render(request, 'expenses/dashboard.html', context)
+    patch_vary_headers(response, ['HX-Request'])
+    return response
+
+
+@login_required
+@require_GET
+def dashboard_chart_data(request):
+    """
+    Devuelve en JSON las series de los gráficos del dashboard
+    
+    dashboard.js la pide tras cada cambio de gastos para actualizar los
+    gráficos sin recargar la página. El ETag sale de la versión de datos del
+    usuario: si no ha cambiado se responde 304 sin calcular nada.
+    """
+    period = request.GET.get('period', 'current_month')
+    if period not in CACHEABLE_PERIODS:
+        period = 'current_month'
+    
+    version, last_modified = get_data_stamp(request.user)
+    etag = make_etag(
+        'dashboard-charts', request.user.pk, period, today_stamp(), version, categories.version()
+    )
+    last_modified = daily_last_modified(last_modified, categories.last_modified())
+    
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        context = get_cached_dashboard_context(request.user, period, version)
+        response = set_validators(JsonResponse(chart_payload(context)), etag, last_modified)
+    return response
 
 
 @login_required
@@ -45,16 +104,43 @@ def expense_list(request):
     """
     Muestra la lista de gastos del usuario con filtros
     Maneja tanto peticiones normales como HTMX
-    """
-    # Obtener todo el contexto usando las funciones auxiliares
-    context = get_expense_list_context(request.user, request.GET)
     
+    Las peticiones HTMX llevan ETag (versión de datos y filtros): si no ha
+    cambiado nada se responde 304 sin consultar los gastos.
+    """
     # ¿Es una petición HTMX? Devolver solo contenido parcial
     if request.headers.get('HX-Request'):
-        return render(request, 'expenses/partials/expense_list_content.html', context)
+        version, last_modified = get_data_stamp(request.user)
+        etag = make_etag(
+            'expense-list', request.user.pk, query_fingerprint(request.GET), today_stamp(), version,
+            categories.version()
+        )
+        last_modified = daily_last_modified(last_modified, categories.last_modified())
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            context = get_expense_list_context(request.user, request.GET)
+            response = render(request, 'expenses/partials/expense_list_content.html', context)
+        return set_validators(response, etag, last_modified, vary=['HX-Request'])
     
     # Petición normal: devolver página completa
-    return render(request, 'expenses/expense_list.html', context)
+    context = get_expense_list_context(request.user, request.GET)
+    response = render(request, 'expenses/expense_list.html', context)
+    patch_vary_headers(response, ['HX-Request'])
+    return response
+
+
+@login_required
+def expense_list_more(request):
+    """
+    Devuelve la siguiente página del listado para el scroll infinito HTMX
+    Renderiza filas de tabla o tarjetas móviles según el parámetro 'layout'
+    """
+    context = get_expense_page_context(request.user, request.GET)
+    
+    if request.GET.get('layout') == 'cards':
+        return render(request, 'expenses/partials/expense_cards.html', context)
+    
+    return render(request, 'expenses/partials/expense_rows.html', context)
 
 
 @login_required
@@ -222,4 +308,39 @@ def manage_budget(request):
     })
 
 
-
+@login_required
+def import_expenses_view(request):
+    """
+    Importa gastos desde un extracto bancario (CSV u OFX) subido por el usuario
+    Las filas se insertan por lotes; las no válidas se omiten y se listan
+    """
+    result = None
+    
+    if request.method == 'POST':
+        form = ExpenseImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            file_format = form.cleaned_data['file_format']
+            if file_format == 'auto':
+                file_format = detect_format(upload.name)
+            
+            # Leer el fichero subido como texto sin cargarlo entero en memoria
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace', newline='')
+            try:
+                result = import_expenses(
+                    request.user,
+                    iter_import_rows(stream, file_format),
+                    default_category=form.cleaned_data['default_category'],
+                    debits_only=form.cleaned_data['debits_only']
+                )
+            except ImportRowError as e:
+                form.add_error('file', str(e))
+            else:
+                messages.success(request, f"{result['created']} gastos importados")
+    else:
+        form = ExpenseImportForm()
+    
+    return render(request, 'expenses/import_expenses.html', {
+        'form': form,
+        'result': result
+    })
@@ -0,0 +1,23 @@
+"""
+Configuración de gunicorn
+
+Con PROMETHEUS_MULTIPROC_DIR definido, cada worker guarda sus métricas en
+ficheros de ese directorio. Al morir un worker se marcan sus ficheros
+como muertos para que /metrics no siga sumando sus valores de gauges en vivo.
+
+Cada worker arranca el listener del bus de invalidación (LISTEN/NOTIFY de
+PostgreSQL, ver apps/core/invalidation.py) una vez cargada la aplicación.
+"""
+
+import os
+
+
+def post_worker_init(worker):
+    from apps.core.invalidation import start_listener
+    start_listener()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -39,6 +39,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # El primero, para que el tiempo medido incluya al resto de middlewares
+    'apps.core.middleware.RequestMetricsMiddleware',
+    'apps.core.middleware.PrometheusMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -103,6 +106,53 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Configuración de caché
+# 'dashboard' guarda el contexto calculado del dashboard por (usuario, período, versión).
+# En memoria local por defecto (LocMemCache ya expulsa por LRU al llegar a MAX_ENTRIES).
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '600'))
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dashboard',
+        'TIMEOUT': DASHBOARD_CACHE_TIMEOUT,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('DASHBOARD_CACHE_MAX_ENTRIES', '1000')),
+        },
+    },
+}
+
+# Registro de categorías en memoria por proceso (apps.expenses.utils.util_categories):
+# segundos entre comprobaciones de cambios hechos desde otros workers
+CATEGORY_REGISTRY_TTL = float(os.getenv('CATEGORY_REGISTRY_TTL', '5'))
+
+# Bus de invalidación entre workers con LISTEN/NOTIFY (apps.core.invalidation), solo con
+# PostgreSQL. Con el listener conectado las cachés en memoria se revalidan como mucho
+# cada INVALIDATION_BUS_MAX_AGE segundos; sin él vuelven a su TTL
+INVALIDATION_BUS = os.getenv('INVALIDATION_BUS', 'True').lower() == 'true'
+INVALIDATION_BUS_MAX_AGE = float(os.getenv('INVALIDATION_BUS_MAX_AGE', '60'))
+
+# Cola de webhooks a n8n (WebhookOutbox, ver process_webhook_outbox)
+WEBHOOK_TIMEOUT = int(os.getenv('WEBHOOK_TIMEOUT', '10'))
+WEBHOOK_OUTBOX_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_OUTBOX_MAX_ATTEMPTS', '8'))
+WEBHOOK_OUTBOX_BACKOFF_BASE = int(os.getenv('WEBHOOK_OUTBOX_BACKOFF_BASE', '30'))
+WEBHOOK_OUTBOX_BACKOFF_MAX = int(os.getenv('WEBHOOK_OUTBOX_BACKOFF_MAX', '3600'))
+
+# Métricas por petición (apps.core.middleware.RequestMetricsMiddleware):
+# fracción de peticiones medidas (0 = desactivado) y cabecera Server-Timing.
+# Server-Timing expone a cualquier cliente el tiempo en base de datos y el
+# número de consultas: desactivada salvo que se pida (activa en local.py)
+REQUEST_METRICS_SAMPLE_RATE = float(os.getenv('REQUEST_METRICS_SAMPLE_RATE', '0.1'))
+REQUEST_METRICS_SERVER_TIMING = os.getenv('REQUEST_METRICS_SERVER_TIMING', 'False').lower() == 'true'
+
+# Métricas Prometheus en /metrics (apps.core.metrics). Con varios workers de
+# gunicorn hay que definir la variable de entorno PROMETHEUS_MULTIPROC_DIR.
+# Si METRICS_TOKEN no está vacío, /metrics exige 'Authorization: Bearer <token>'.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # Configuración de autenticación
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
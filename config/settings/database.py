@@ -0,0 +1,79 @@
+"""
+Conexión a PostgreSQL compartida por local.py y production.py
+
+Con psycopg 3 y psycopg-pool instalados (ver requirements.txt) cada
+proceso mantiene un pool de conexiones (OPTIONS['pool'] de Django 5.1+):
+las peticiones toman una conexión abierta y la devuelven al terminar, en
+lugar de abrir una nueva con su handshake TCP y de autenticación. Con
+CONN_HEALTH_CHECKS el pool comprueba cada conexión antes de entregarla.
+
+Sin psycopg-pool (p. ej. con psycopg2) se usan conexiones persistentes
+por worker (CONN_MAX_AGE) con CONN_HEALTH_CHECKS.
+
+Variables de entorno:
+    DB_POOL=True              # usar el pool si está disponible
+    DB_POOL_MIN_SIZE=1        # conexiones abiertas siempre por proceso
+    DB_POOL_MAX_SIZE=4        # máximo de conexiones por proceso
+    DB_POOL_TIMEOUT=10        # segundos esperando una conexión libre
+    DB_POOL_MAX_IDLE=300      # segundos antes de cerrar conexiones sobrantes ociosas
+    DB_POOL_MAX_LIFETIME=1800 # segundos antes de reciclar una conexión
+    DB_CONN_MAX_AGE=60        # sin pool: segundos que se reutiliza una conexión
+
+Cada worker de gunicorn tiene su propio pool: el total de conexiones es
+como mucho workers x DB_POOL_MAX_SIZE (más el worker de webhooks), que
+debe quedar por debajo de max_connections de PostgreSQL.
+"""
+
+import os
+
+try:
+    import psycopg_pool
+except ImportError:
+    psycopg_pool = None
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+def pool_available():
+    """Indica si psycopg-pool está instalado (y con él psycopg 3)"""
+    return psycopg_pool is not None
+
+
+def postgres_database(name, user, password, host, port):
+    """
+    Configuración de DATABASES['default'] para PostgreSQL con pool o conexiones persistentes
+
+    Args:
+        name, user, password, host, port: Datos de conexión
+
+    Returns:
+        dict: Entrada de DATABASES
+    """
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': name,
+        'USER': user,
+        'PASSWORD': password,
+        'HOST': host,
+        'PORT': port,
+        # Comprobar la conexión (del pool o persistente) antes de reutilizarla
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+    if os.getenv('DB_POOL', 'True').lower() == 'true' and pool_available():
+        # Con pool, CONN_MAX_AGE debe ser 0: cerrar la conexión la devuelve al pool
+        database['OPTIONS'] = {
+            'pool': {
+                'min_size': _env_int('DB_POOL_MIN_SIZE', 1),
+                'max_size': _env_int('DB_POOL_MAX_SIZE', 4),
+                'timeout': _env_int('DB_POOL_TIMEOUT', 10),
+                'max_idle': _env_int('DB_POOL_MAX_IDLE', 300),
+                'max_lifetime': _env_int('DB_POOL_MAX_LIFETIME', 1800),
+            },
+        }
+    else:
+        database['CONN_MAX_AGE'] = _env_int('DB_CONN_MAX_AGE', 60)
+
+    return database
@@ -4,6 +4,7 @@ Configuraciones de Django para el entorno de desarrollo local.
 
 import os
 from .base import *
+from .database import postgres_database
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -11,15 +12,15 @@ DEBUG = True
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '0.0.0.0', 'web']
 
 # Base de datos para desarrollo local
+# Pool de conexiones (psycopg 3) o conexiones persistentes, ver database.py
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('DB_NAME', 'gastos_hormiga_dev'),
-        'USER': os.getenv('DB_USER', 'postgres'),
-        'PASSWORD': os.getenv('DB_PASSWORD', 'postgres'),
-        'HOST': os.getenv('DB_HOST', 'localhost'),
-        'PORT': os.getenv('DB_PORT', '5432'),
-    }
+    'default': postgres_database(
+        os.getenv('DB_NAME', 'gastos_hormiga_dev'),
+        os.getenv('DB_USER', 'postgres'),
+        os.getenv('DB_PASSWORD', 'postgres'),
+        os.getenv('DB_HOST', 'localhost'),
+        os.getenv('DB_PORT', '5432'),
+    )
 }
 
 # Configuraciones de desarrollo
@@ -43,9 +44,18 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'apps.core.request_metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
+# En desarrollo se miden todas las peticiones
+REQUEST_METRICS_SAMPLE_RATE = float(os.getenv('REQUEST_METRICS_SAMPLE_RATE', '1.0'))
+REQUEST_METRICS_SERVER_TIMING = os.getenv('REQUEST_METRICS_SERVER_TIMING', 'True').lower() == 'true'
+
 # Django Debug Toolbar (opcional para desarrollo)
 if DEBUG:
     try:
@@ -4,6 +4,7 @@ Configuraciones de Django para el entorno de producción.
 
 import os
 from .base import *
+from .database import postgres_database
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
@@ -11,15 +12,15 @@ DEBUG = False
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '').split(',')
 
 # Base de datos para producción
+# Pool de conexiones (psycopg 3) o conexiones persistentes, ver database.py
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('DB_NAME'),
-        'USER': os.getenv('DB_USER'),
-        'PASSWORD': os.getenv('DB_PASSWORD'),
-        'HOST': os.getenv('DB_HOST', 'localhost'),
-        'PORT': os.getenv('DB_PORT', '5432'),
-    }
+    'default': postgres_database(
+        os.getenv('DB_NAME'),
+        os.getenv('DB_USER'),
+        os.getenv('DB_PASSWORD'),
+        os.getenv('DB_HOST', 'localhost'),
+        os.getenv('DB_PORT', '5432'),
+    )
 }
 
 # Configuraciones de seguridad para producción
@@ -41,6 +42,22 @@ CSRF_COOKIE_SECURE = os.getenv('CSRF_COOKIE_SECURE', 'True').lower() == 'true'
 SESSION_COOKIE_HTTPONLY = True
 CSRF_COOKIE_HTTPONLY = True
 
+# Caché del dashboard en disco: compartida por los workers de gunicorn,
+# acotada a MAX_ENTRIES ficheros y con expulsión LRU (sin necesidad de Redis)
+CACHES['dashboard'] = {
+    'BACKEND': 'apps.core.cache.BoundedFileBasedCache',
+    'LOCATION': os.getenv('DASHBOARD_CACHE_DIR', '/app/cache/dashboard'),
+    'TIMEOUT': DASHBOARD_CACHE_TIMEOUT,
+    'OPTIONS': {
+        'MAX_ENTRIES': int(os.getenv('DASHBOARD_CACHE_MAX_ENTRIES', '5000')),
+        'CULL_FREQUENCY': 4,
+    },
+}
+
+# Server-Timing revela tiempos de base de datos y número de consultas a
+# cualquier cliente: nunca en producción (las métricas siguen en el log)
+REQUEST_METRICS_SERVER_TIMING = False
+
 # Configuración de email para producción
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST')
@@ -59,6 +76,11 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
             'style': '{',
         },
+        # Las métricas por petición ya son JSON: una línea por petición, sin prefijo
+        'json': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'file': {
@@ -72,6 +94,11 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
+        'metrics': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
     },
     'root': {
         'handlers': ['console', 'file'],
@@ -83,6 +110,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'apps.core.request_metrics': {
+            'handlers': ['metrics'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""
+Prueba de carga de Hormigah con un cliente HTTP en Python puro
+
+Cada usuario virtual inicia sesión con uno de los usuarios generados por
+`python manage.py seed_expenses` y repite un escenario ponderado:
+
+    dashboard           GET  /
+    expense_list        GET  /gastos/
+    add_expense         POST /agregar/
+    api_active_users    GET  /api/users/active/
+    api_user_complete   GET  /api/users/<id>/complete/
+
+Al terminar muestra, por endpoint, peticiones, errores, throughput y
+latencias p50/p95/p99.
+
+Uso:
+    python scripts/loadtest.py --base-url http://localhost:8000 --users 20 --duration 60
+    python scripts/loadtest.py --users 50 --seed-users 1000 --json resultados.json
+
+Solo necesita `requests` (ya está en requirements.txt).
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import requests
+
+# Peso relativo de cada endpoint en el escenario
+SCENARIO = {
+    'dashboard': 30,
+    'expense_list': 25,
+    'add_expense': 15,
+    'api_active_users': 5,
+    'api_user_complete': 25,
+}
+
+_CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+_CATEGORY_OPTION = re.compile(r'<option value="(\d+)"')
+
+
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Stats:
+    """Latencias y errores por endpoint, compartidos entre hilos"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, elapsed, ok):
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+
+    def summary(self, duration):
+        """Resumen por endpoint con latencias en milisegundos"""
+        rows = {}
+        names = sorted(self.latencies)
+        all_latencies = []
+        for name in names:
+            values = sorted(self.latencies[name])
+            all_latencies.extend(values)
+            rows[name] = self._row(values, self.errors[name], duration)
+        all_latencies.sort()
+        rows['TOTAL'] = self._row(all_latencies, sum(self.errors.values()), duration)
+        return rows
+
+    @staticmethod
+    def _row(values, errors, duration):
+        return {
+            'requests': len(values),
+            'errors': errors,
+            'rps': round(len(values) / duration, 2) if duration else 0,
+            'p50_ms': round(percentile(values, 50) * 1000, 1),
+            'p95_ms': round(percentile(values, 95) * 1000, 1),
+            'p99_ms': round(percentile(values, 99) * 1000, 1),
+            'max_ms': round((values[-1] if values else 0) * 1000, 1),
+        }
+
+
+class VirtualUser:
+    """Usuario virtual con su propia sesión HTTP (cookies de sesión y CSRF)"""
+
+    def __init__(self, args, username, stats, rng):
+        self.args = args
+        self.username = username
+        self.stats = stats
+        self.rng = rng
+        self.session = requests.Session()
+        self.api_headers = {'Authorization': f'Bearer {args.api_token}'}
+        self.categories = []
+        self.user_ids = []
+
+    def url(self, path):
+        return self.args.base_url.rstrip('/') + path
+
+    def request(self, name, method, path, **kwargs):
+        """Hace la petición y registra su latencia (los fallos de red cuentan como error)"""
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self.url(path), timeout=self.args.timeout, allow_redirects=False, **kwargs
+            )
+            # Consumir el cuerpo completo, también en las respuestas en streaming
+            content = response.content
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, content, ok = None, b'', False
+        self.stats.record(name, time.perf_counter() - start, ok)
+        return response, content
+
+    def login(self):
+        """Inicia sesión con el formulario de Django y carga las categorías"""
+        page = self.session.get(self.url('/accounts/login/'), timeout=self.args.timeout)
+        token = _CSRF_INPUT.search(page.text)
+        response = self.session.post(
+            self.url('/accounts/login/'),
+            data={
+                'username': self.username,
+                'password': self.args.password,
+                'csrfmiddlewaretoken': token.group(1) if token else '',
+            },
+            headers={'Referer': self.url('/accounts/login/')},
+            timeout=self.args.timeout,
+            allow_redirects=False
+        )
+        if response.status_code != 302:
+            raise RuntimeError(f'No se pudo iniciar sesión como {self.username}')
+
+        form = self.session.get(self.url('/agregar/'), timeout=self.args.timeout)
+        self.categories = _CATEGORY_OPTION.findall(form.text)
+
+        users = self.session.get(
+            self.url('/api/users/active/'), headers=self.api_headers, timeout=self.args.timeout
+        )
+        if users.ok:
+            self.user_ids = [user['id'] for user in users.json().get('users', [])]
+
+    def dashboard(self):
+        self.request('dashboard', 'GET', '/')
+
+    def expense_list(self):
+        self.request('expense_list', 'GET', '/gastos/')
+
+    def add_expense(self):
+        if not self.categories:
+            return
+        self.request('add_expense', 'POST', '/agregar/', data={
+            'category': self.rng.choice(self.categories),
+            'amount': f'{self.rng.uniform(1, 15):.2f}',
+            'date': date.today().isoformat(),
+            'description': 'Prueba de carga',
+            'csrfmiddlewaretoken': self.session.cookies.get('csrftoken', ''),
+        }, headers={'Referer': self.url('/agregar/'), 'HX-Request': 'true'})
+
+    def api_active_users(self):
+        self.request('api_active_users', 'GET', '/api/users/active/', headers=self.api_headers)
+
+    def api_user_complete(self):
+        if not self.user_ids:
+            return
+        user_id = self.rng.choice(self.user_ids)
+        self.request(
+            'api_user_complete', 'GET', f'/api/users/{user_id}/complete/?months=1', headers=self.api_headers
+        )
+
+    def run(self, deadline):
+        names = list(SCENARIO)
+        weights = list(SCENARIO.values())
+        while time.monotonic() < deadline:
+            getattr(self, self.rng.choices(names, weights=weights)[0])()
+            if self.args.think_time:
+                time.sleep(self.rng.uniform(0, 2 * self.args.think_time))
+
+
+def print_summary(rows, duration):
+    """Tabla de resultados por endpoint"""
+    header = f"{'endpoint':<20}{'reqs':>8}{'errs':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(f'\nDuración: {duration:.1f}s (latencias en ms)')
+    print(header)
+    print('-' * len(header))
+    for name, row in rows.items():
+        print(
+            f"{name:<20}{row['requests']:>8}{row['errors']:>6}{row['rps']:>9}"
+            f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de Hormigah')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--users', type=int, default=10, help='Usuarios virtuales concurrentes')
+    parser.add_argument('--duration', type=float, default=60, help='Segundos de prueba')
+    parser.add_argument('--seed-users', type=int, default=100,
+                        help='Usuarios creados con seed_expenses entre los que elegir')
+    parser.add_argument('--prefix', default='seed', help='Prefijo usado en seed_expenses')
+    parser.add_argument('--password', default='seed-pass-123', help='Contraseña usada en seed_expenses')
+    parser.add_argument('--api-token', default='dev-api-token-123', help='Token Bearer de la API (N8N_API_TOKEN)')
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help='Espera media entre peticiones de cada usuario virtual (s)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Timeout por petición (s)')
+    parser.add_argument('--json', help='Guardar el resumen en este fichero JSON')
+    args = parser.parse_args()
+
+    stats = Stats()
+    virtual_users = []
+    for i in range(args.users):
+        username = f'{args.prefix}-{i % args.seed_users + 1:05d}'
+        user = VirtualUser(args, username, stats, random.Random(i))
+        try:
+            user.login()
+        except (requests.RequestException, RuntimeError) as e:
+            print(f'Error preparando {username}: {e}', file=sys.stderr)
+            return 1
+        virtual_users.append(user)
+
+    print(f'{len(virtual_users)} usuarios virtuales durante {args.duration:.0f}s contra {args.base_url}')
+    start = time.monotonic()
+    deadline = start + args.duration
+    with ThreadPoolExecutor(max_workers=len(virtual_users)) as executor:
+        for future in [executor.submit(user.run, deadline) for user in virtual_users]:
+            future.result()
+    duration = time.monotonic() - start
+
+    rows = stats.summary(duration)
+    print_summary(rows, duration)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'duration_s': round(duration, 2), 'users': len(virtual_users), 'endpoints': rows}, f, indent=2)
+
+    return 1 if rows['TOTAL']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,14 +7,27 @@
 Chart.defaults.font.family = 'Nunito, system-ui, sans-serif';
 Chart.defaults.color = '#6B7280';
 
-// Event listener para auto-refresh del dashboard
+// Gráficos creados y URL de sus datos (ver initDashboardCharts)
+const dashboardCharts = {
+    category: null,
+    trend: null,
+    url: null
+};
+
+// Event listeners para actualizar los gráficos sin recargar la página
 document.addEventListener('DOMContentLoaded', function() {
-    // Listener para recargar página después de agregar gasto en dashboard
+    // Tras agregar, editar o eliminar un gasto
     document.body.addEventListener('refreshDashboard', function() {
-        setTimeout(function() {
-            window.location.reload();
-        }, 1500); // Esperar 1.5 segundos para ver el mensaje
+        refreshDashboardCharts();
     });
+
+    // Al cambiar el período del filtro
+    const periodSelect = document.querySelector('#dashboard-filter select[name="period"]');
+    if (periodSelect) {
+        periodSelect.addEventListener('change', function() {
+            refreshDashboardCharts();
+        });
+    }
 });
 
 /**
@@ -25,7 +38,7 @@ function initCategoryChart(data) {
     const categoryCtx = document.getElementById('categoryChart');
     if (!categoryCtx) return;
     
-    new Chart(categoryCtx.getContext('2d'), {
+    return new Chart(categoryCtx.getContext('2d'), {
         type: 'doughnut',
         data: {
             labels: data.categories,
@@ -70,7 +83,7 @@ function initTrendChart(data) {
     const trendCtx = document.getElementById('trendChart');
     if (!trendCtx) return;
     
-    new Chart(trendCtx.getContext('2d'), {
+    return new Chart(trendCtx.getContext('2d'), {
         type: 'line',
         data: {
             labels: data.dates,
@@ -132,25 +145,97 @@ function initTrendChart(data) {
     });
 }
 
+/**
+ * Pasa importes en céntimos enteros a euros
+ * @param {number[]} cents - Importes en céntimos
+ * @returns {number[]} Importes en euros
+ */
+function centsToEuros(cents) {
+    return (cents || []).map(function(value) { return value / 100; });
+}
+
 /**
  * Inicializa todos los gráficos del dashboard
- * @param {Object} chartData - Todos los datos de gráficos
+ * @param {Object} chartData - Datos de gráficos del servidor (importes en céntimos)
+ * @param {string} url - URL del endpoint JSON de gráficos
  */
-function initDashboardCharts(chartData) {
+function initDashboardCharts(chartData, url) {
+    dashboardCharts.url = url;
+
     // Inicializar gráfico de categorías si hay datos
     if (chartData.categories && chartData.categories.length > 0) {
-        initCategoryChart({
+        dashboardCharts.category = initCategoryChart({
             categories: chartData.categories,
-            amounts: chartData.amounts,
+            amounts: centsToEuros(chartData.amounts_cents),
             colors: chartData.colors
         });
     }
     
     // Inicializar gráfico de tendencia si hay datos
     if (chartData.dates && chartData.dates.length > 0) {
-        initTrendChart({
+        dashboardCharts.trend = initTrendChart({
             dates: chartData.dates,
-            amounts: chartData.dailyAmounts
+            amounts: centsToEuros(chartData.daily_cents)
         });
     }
-} 
\ No newline at end of file
+}
+
+/**
+ * Pide las series al servidor y actualiza los gráficos en el sitio
+ *
+ * El servidor responde con ETag y el navegador revalida su copia, así que
+ * si los datos no han cambiado la respuesta es un 304 sin cuerpo. Las
+ * métricas, el presupuesto y los gastos recientes los actualiza HTMX con
+ * el parcial de #dashboard-metrics (mismo período y mismo evento).
+ */
+function refreshDashboardCharts() {
+    if (!dashboardCharts.url) return;
+
+    const periodSelect = document.querySelector('#dashboard-filter select[name="period"]');
+    const period = periodSelect ? periodSelect.value : 'current_month';
+
+    fetch(dashboardCharts.url + '?period=' + encodeURIComponent(period), {
+        credentials: 'same-origin',
+        headers: { 'Accept': 'application/json' }
+    })
+        .then(function(response) {
+            if (!response.ok) throw new Error('HTTP ' + response.status);
+            return response.json();
+        })
+        .then(function(payload) {
+            updateDashboardCharts(payload.chart_data);
+        })
+        .catch(function(error) {
+            console.error('Error al actualizar los gráficos:', error);
+        });
+}
+
+/**
+ * Sustituye los datos de los gráficos existentes
+ * @param {Object} chartData - Datos de gráficos (importes en céntimos)
+ */
+function updateDashboardCharts(chartData) {
+    const hasCategories = chartData.categories.length > 0;
+    const hasDates = chartData.dates.length > 0;
+
+    // Si un gráfico tiene que aparecer o desaparecer, el HTML cambia: recargar
+    if (hasCategories !== (dashboardCharts.category !== null) || hasDates !== (dashboardCharts.trend !== null)) {
+        window.location.reload();
+        return;
+    }
+
+    if (dashboardCharts.category) {
+        const chart = dashboardCharts.category;
+        chart.data.labels = chartData.categories;
+        chart.data.datasets[0].data = centsToEuros(chartData.amounts_cents);
+        chart.data.datasets[0].backgroundColor = chartData.colors;
+        chart.update();
+    }
+
+    if (dashboardCharts.trend) {
+        const chart = dashboardCharts.trend;
+        chart.data.labels = chartData.dates;
+        chart.data.datasets[0].data = centsToEuros(chartData.daily_cents);
+        chart.update();
+    }
+}
@@ -28,7 +28,8 @@ def test_budget_webhook():
     Esta función simula exactamente lo que Django hace cuando:
     1. Un usuario agrega un gasto
     2. Django calcula que superó el 90% del presupuesto
-    3. Django llama a send_webhook_to_n8n() desde util_crud_operations.py
+    3. Django encola el webhook con send_webhook_to_n8n() desde util_alerts.py
+       y el worker (process_webhook_outbox) lo envía a n8n
     """
     
     # URL del webhook de n8n (TEST URL para "Listen for test event")
@@ -137,7 +138,10 @@ Este test simula un usuario que:
 FLUJO REAL EN PRODUCCION:
 1. Usuario agrega gasto real en Django
 2. Django calcula: gasto_actual / presupuesto * 100
-3. Si >= 90%: Django llama send_webhook_to_n8n()
+3. Cada umbral (porcentaje de alerta del presupuesto, 90% y 100%) encola un
+   webhook con send_webhook_to_n8n() la primera vez que se cruza en el mes:
+   alert_type budget_warning, budget_90_percent (el que simula este script) o
+   budget_exceeded. Si un gasto cruza varios a la vez, solo se envía el más alto
 4. n8n recibe webhook y envia email al usuario
-5. Usuario recibe alerta: "Has superado el 90% de tu presupuesto"
+5. Usuario recibe alerta: "Has alcanzado el 93.1% de tu presupuesto mensual"
 """ 
\ No newline at end of file